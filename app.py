@@ -171,9 +171,14 @@ def render_qa_section():
         
         with st.spinner("Thinking..."):
             if len(selected_forms) == 1:
-                result = st.session_state.agent.ask(question, selected_forms[0])
-                
-                st.success(f"**Answer:** {result.answer}")
+                # Stream so the answer shows before evidence and reasoning finish
+                answer_slot = st.empty()
+                for event in st.session_state.agent.ask_stream(question, selected_forms[0]):
+                    if event["type"] == "field" and event["name"] == "answer":
+                        answer_slot.success(f"**Answer:** {event['value']}")
+                    elif event["type"] == "result":
+                        result = event["result"]
+                answer_slot.success(f"**Answer:** {result.answer}")
                 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -26,6 +26,7 @@ except ImportError:
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.agent import IntelligentFormAgent, ProcessedForm
+from src.templates import TemplateLibrary, default_template_path
 
 
 def get_console():
@@ -69,7 +70,12 @@ def print_panel(content: str, title: str = None):
 
 def cmd_process(args):
     """Process forms and extract fields."""
-    agent = IntelligentFormAgent(api_key=args.api_key, verbose=args.verbose)
+    template_library = TemplateLibrary(default_template_path()) if args.templates else None
+    agent = IntelligentFormAgent(
+        api_key=args.api_key,
+        verbose=args.verbose,
+        template_library=template_library
+    )
     
     forms = []
     for file_path in args.files:
@@ -105,9 +111,21 @@ def cmd_ask(args):
     
     # Ask question
     if len(forms) == 1:
-        result = agent.ask(args.question, forms[0])
+        if args.stream:
+            # Show the answer as soon as it is complete, before evidence and reasoning
+            answered = False
+            for event in agent.ask_stream(args.question, forms[0]):
+                if event["type"] == "field" and event["name"] == "answer":
+                    print_panel(event["value"], title="Answer")
+                    answered = True
+                elif event["type"] == "result":
+                    result = event["result"]
+            if not answered:
+                print_panel(result.answer, title="Answer")
+        else:
+            result = agent.ask(args.question, forms[0])
+            print_panel(result.answer, title="Answer")
         
-        print_panel(result.answer, title="Answer")
         print_output(f"Confidence: {result.confidence:.1%}", "green" if result.confidence > 0.7 else "yellow")
         
         if result.evidence:
@@ -240,12 +258,16 @@ Examples:
     process_parser = subparsers.add_parser("process", help="Process forms and extract fields")
     process_parser.add_argument("files", nargs="+", help="Form files to process")
     process_parser.add_argument("--output", "-o", help="Output JSON file")
+    process_parser.add_argument("--templates", action="store_true",
+                                help="Learn repetitive layouts and extract matching forms locally")
     process_parser.set_defaults(func=cmd_process)
     
     # Ask command
     ask_parser = subparsers.add_parser("ask", help="Ask a question about forms")
     ask_parser.add_argument("--files", "-f", nargs="+", required=True, help="Form files")
     ask_parser.add_argument("--question", "-q", required=True, help="Question to ask")
+    ask_parser.add_argument("--stream", action="store_true",
+                           help="Print the answer as soon as it is generated")
     ask_parser.set_defaults(func=cmd_ask)
     
     # Summarize command
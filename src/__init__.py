@@ -6,8 +6,13 @@ An LLM-powered system for intelligent form processing.
 
 __version__ = "2.0.0"
 
-from src.agent import IntelligentFormAgent, ProcessedForm, create_agent
-from src.llm_client import ClaudeClient, get_llm_client
+from src.agent import IntelligentFormAgent, ProcessedForm, FormProcessingError, create_agent
+from src.llm_client import (
+    ClaudeClient,
+    AsyncClaudeClient,
+    get_llm_client,
+    get_async_llm_client
+)
 from src.tools import (
     ExtractionResult,
     QAResult,
@@ -18,9 +23,12 @@ from src.tools import (
 __all__ = [
     "IntelligentFormAgent",
     "ProcessedForm", 
+    "FormProcessingError",
     "create_agent",
     "ClaudeClient",
+    "AsyncClaudeClient",
     "get_llm_client",
+    "get_async_llm_client",
     "ExtractionResult",
     "QAResult",
     "SummaryResult",
@@ -7,13 +7,31 @@ Uses a state machine architecture for flexible, multi-step reasoning.
 
 import os
 import json
-from typing import Dict, List, Any, Optional, TypedDict, Annotated, Sequence
-from dataclasses import dataclass, field, asdict
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, TypedDict, Annotated, Sequence, Iterator
+from dataclasses import dataclass, field, asdict, replace
 from datetime import datetime
 from enum import Enum
 
-from src.llm_client import BaseLLMClient, ClaudeClient, get_llm_client
+from src.llm_client import (
+    BaseLLMClient,
+    AsyncBaseLLMClient,
+    ClaudeClient,
+    get_llm_client,
+    get_async_llm_client
+)
 from src.document_processor import DocumentProcessor, ExtractedDocument
+from src.cache import ResponseCache, hash_file
+from src.rate_limiter import RateLimiter, RequestSlots
+from src.retrieval import BM25Index
+from src.field_lookup import match_field
+from src.form_store import BaseFormStore, SQLiteFormStore, form_key
+from src.templates import TemplateLibrary
+from src.classifier import FormTypeClassifier
+from src.intent_router import IntentRouter
+from src.model_router import ModelRouter
 from src.tools import (
     FieldExtractionTool,
     QuestionAnsweringTool, 
@@ -67,14 +85,36 @@ class ProcessedForm:
     tables: List[List[List[str]]]
     metadata: Dict[str, Any]
     processed_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    chunk_index: Dict[str, Any] = field(default_factory=dict, repr=False)
     
     def to_dict(self) -> Dict:
-        return asdict(self)
+        """Form data for export; the passage index is kept only in the form store."""
+        data = asdict(replace(self, chunk_index={}))
+        del data["chunk_index"]
+        return data
     
     def to_json(self) -> str:
         return json.dumps(self.to_dict(), indent=2, default=str)
 
 
+class FormProcessingError(Exception):
+    """
+    Raised when forms in a batch fail to process.
+    
+    results holds every form's outcome in input order (ProcessedForm or
+    exception), so successful work is not lost; failures maps each failed
+    path to its exception. The first failure is the __cause__.
+    """
+    
+    def __init__(self, results: List[Any], failures: Dict[str, Exception]):
+        self.results = results
+        self.failures = failures
+        super().__init__(
+            f"{len(failures)} of {len(results)} forms failed: "
+            + "; ".join(f"{path}: {error}" for path, error in list(failures.items())[:3])
+        )
+
+
 # ============================================================================
 # Main Agent Class
 # ============================================================================
@@ -108,11 +148,26 @@ class IntelligentFormAgent:
         print(summary.summary)
     """
     
+    # Most recently used form paths listed by get_stats
+    STATS_RECENT_FORMS = 20
+    
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: str = "claude-sonnet-4-20250514",
-        verbose: bool = False
+        verbose: bool = False,
+        form_store: Optional[BaseFormStore] = None,
+        llm_client: Optional[BaseLLMClient] = None,
+        async_llm_client: Optional[AsyncBaseLLMClient] = None,
+        response_cache: Optional[ResponseCache] = None,
+        max_workers: int = 4,
+        max_concurrent_llm_calls: int = 4,
+        field_lookup_threshold: Optional[float] = 0.85,
+        template_library: Optional[TemplateLibrary] = None,
+        form_classifier: Optional[FormTypeClassifier] = None,
+        intent_router: Optional[IntentRouter] = None,
+        model_router: Optional[ModelRouter] = None,
+        rate_limiter: Optional[RateLimiter] = None
     ):
         """
         Initialize the agent.
@@ -121,29 +176,205 @@ class IntelligentFormAgent:
             api_key: Anthropic API key (or set ANTHROPIC_API_KEY env var)
             model: Claude model to use
             verbose: Whether to print debug information
+            form_store: Store for processed forms (defaults to SQLite on disk)
+            llm_client: Pre-built LLM client (overrides api_key/model)
+            async_llm_client: Pre-built async LLM client for the a* methods
+                (without one, async calls run the sync client in worker threads)
+            response_cache: Cache for deterministic LLM responses, shared by
+                the sync and async clients the agent creates
+            max_workers: Threads used by process_forms
+            max_concurrent_llm_calls: Cap on in-flight LLM requests across threads and event loops
+            field_lookup_threshold: Minimum name similarity for ask() to answer
+                a "What is the <field>?" question straight from the extracted
+                fields (None always calls the LLM)
+            template_library: Learns the layouts of repetitive form types from
+                LLM extractions and extracts matching forms locally (None
+                always extracts with the LLM)
+            form_classifier: Local form-type classifier; its prediction picks
+                the template to try and is passed to the extraction prompt
+                (see train_classifier)
+            intent_router: Local task router for run_workflow (defaults to
+                IntentRouter(); the LLM decides only below its min_confidence)
+            model_router: Picks a model per tool call by tool and input size,
+                and retries low-confidence extractions on a stronger model
+                (None uses model for every call)
+            rate_limiter: Throttle shared by the sync and async clients the
+                agent creates (defaults to RateLimiter.from_env())
         """
-        self.llm = get_llm_client("claude", api_key=api_key, model=model)
+        # One limiter for both clients, so they draw on one RPM/TPM and
+        # concurrency budget and a throttle on either slows both
+        if rate_limiter is None and llm_client is None:
+            rate_limiter = RateLimiter.from_env()
+        self.llm = llm_client or get_llm_client(
+            "claude", api_key=api_key, model=model, response_cache=response_cache,
+            rate_limiter=rate_limiter
+        )
+        if async_llm_client is None and llm_client is None:
+            async_llm_client = get_async_llm_client(
+                "claude", api_key=api_key, model=model, response_cache=response_cache,
+                rate_limiter=rate_limiter
+            )
+        self.async_llm = async_llm_client
+        self.model = getattr(self.llm, "model", model)
         self.doc_processor = DocumentProcessor()
         self.verbose = verbose
         
+        # Concurrency; tools take a slot for each LLM request they make
+        self.max_workers = max_workers
+        self.max_concurrent_llm_calls = max(1, max_concurrent_llm_calls)
+        self._llm_slots = RequestSlots(self.max_concurrent_llm_calls)
+        self._stats_lock = threading.Lock()
+        
         # Initialize tools
-        self.tools = get_all_tools(self.llm)
+        self.model_router = model_router
+        self.tools = get_all_tools(self.llm, self.async_llm, model_router, self._llm_slots)
         self.extraction_tool = self.tools["extract_fields"]
         self.qa_tool = self.tools["answer_question"]
         self.summary_tool = self.tools["summarize_document"]
         self.analysis_tool = self.tools["analyze_documents"]
         
-        # Document cache
-        self._processed_forms: Dict[str, ProcessedForm] = {}
+        # Processed form store, keyed by content hash, model and prompt version
+        self.form_store = form_store if form_store is not None else SQLiteFormStore()
+        
+        # Local answers for plain field lookups
+        self.field_lookup_threshold = field_lookup_threshold
+        
+        # Local extraction for learned form layouts
+        self.template_library = template_library
+        
+        # Local form-type prediction before extraction
+        self.form_classifier = form_classifier
+        
+        # Local task routing for workflows
+        self.intent_router = intent_router or IntentRouter()
         
         # Statistics
         self.total_llm_calls = 0
+        self.local_answers = 0
     
     def _log(self, message: str):
         """Log a message if verbose mode is on."""
         if self.verbose:
             print(f"[Agent] {message}")
     
+    def _count_llm_call(self, calls: int = 1):
+        """Increment the LLM call counter (thread-safe)."""
+        with self._stats_lock:
+            self.total_llm_calls += calls
+    
+    def _form_key(self, file_path: str) -> str:
+        """Store key for a file under the current model and extraction prompt."""
+        return form_key(hash_file(file_path), self.model, FieldExtractionTool.PROMPT_VERSION)
+    
+    def _get_stored_form(self, key: str, file_path: str) -> Optional[ProcessedForm]:
+        """Load a previously processed form, re-pointed at file_path."""
+        cached = self.form_store.get(key)
+        if cached is None:
+            return None
+        self._log(f"Returning cached form: {file_path}")
+        return ProcessedForm(**{**cached, "file_path": file_path})
+    
+    def _build_form(
+        self,
+        key: str,
+        file_path: str,
+        extracted: ExtractedDocument,
+        extraction_result: ExtractionResult
+    ) -> ProcessedForm:
+        """Assemble a ProcessedForm from extraction output and store it."""
+        self._log(f"Extracted {len(extraction_result.fields)} fields, "
+                  f"form type: {extraction_result.form_type}, "
+                  f"confidence: {extraction_result.confidence:.1%}")
+        
+        form = ProcessedForm(
+            file_path=file_path,
+            file_type=extracted.file_type,
+            raw_text=extracted.raw_text,
+            extracted_fields=extraction_result.fields,
+            form_type=extraction_result.form_type,
+            extraction_confidence=extraction_result.confidence,
+            tables=extracted.tables,
+            metadata={
+                **extracted.metadata,
+                "extraction_reasoning": extraction_result.reasoning,
+                "extraction_chunks": extraction_result.chunks,
+                "extraction_conflicts": extraction_result.conflicts,
+                "extraction_template": extraction_result.template,
+                "extraction_model": extraction_result.model
+            },
+            chunk_index=BM25Index.from_document(extracted).to_dict()
+        )
+        
+        # Cache it, with the passage index for later questions
+        self.form_store.put(key, {**form.to_dict(), "chunk_index": form.chunk_index})
+        
+        return form
+    
+    def _predict_form_type(self, extracted: ExtractedDocument) -> Optional[str]:
+        """Classify the document locally and record the prediction in its metadata."""
+        if self.form_classifier is None:
+            return None
+        form_type = self.form_classifier.classify(extracted.raw_text)
+        extracted.metadata["predicted_form_type"] = form_type
+        self._log(f"Predicted form type: {form_type}")
+        return form_type
+    
+    def _template_extraction(
+        self,
+        extracted: ExtractedDocument,
+        form_type: Optional[str] = None
+    ) -> Optional[ExtractionResult]:
+        """Extract fields with a learned template, if one fits the document."""
+        if self.template_library is None:
+            return None
+        result = self.template_library.match(extracted, form_type)
+        if result is not None:
+            self._log(f"Extracted locally with the '{result.form_type}' template")
+        return result
+    
+    def _learn_template(self, extracted: ExtractedDocument, extraction_result: ExtractionResult):
+        """Feed an LLM extraction to the template library."""
+        if self.template_library is not None:
+            self.template_library.learn(extracted, extraction_result)
+    
+    def _chunk_index(self, form: ProcessedForm) -> BM25Index:
+        """The form's passage index (built on the fly for forms stored without one)."""
+        if form.chunk_index:
+            return BM25Index.from_dict(form.chunk_index)
+        return BM25Index.from_document(self._to_document(form))
+    
+    def _lookup_answer(self, question: str, form: ProcessedForm) -> Optional[QAResult]:
+        """Answer a plain field lookup from the extracted fields, if one matches clearly."""
+        if self.field_lookup_threshold is None:
+            return None
+        
+        match = match_field(question, form.extracted_fields, threshold=self.field_lookup_threshold)
+        if match is None:
+            return None
+        
+        with self._stats_lock:
+            self.local_answers += 1
+        self._log(f"Answered locally from field '{match.name}' (similarity {match.score:.2f})")
+        
+        value = match.value if isinstance(match.value, str) else json.dumps(match.value, default=str)
+        return QAResult(
+            answer=value,
+            confidence=match.score * (form.extraction_confidence or 1.0),
+            evidence=[f"{match.name}: {value}"],
+            reasoning=f"The question matches the extracted field '{match.name}'."
+        )
+    
+    @staticmethod
+    def _to_document(form: ProcessedForm) -> ExtractedDocument:
+        """Reconstruct an ExtractedDocument for the tools."""
+        return ExtractedDocument(
+            file_path=form.file_path,
+            file_type=form.file_type,
+            raw_text=form.raw_text,
+            tables=form.tables,
+            metadata=form.metadata
+        )
+    
     # ========================================================================
     # Core Methods
     # ========================================================================
@@ -154,7 +385,8 @@ class IntelligentFormAgent:
         
         This is the primary entry point for loading a form. The agent will:
         1. Extract raw text from the document (PDF, image, or text)
-        2. Use LLM to identify and extract all fields
+        2. Use LLM to identify and extract all fields (or a learned
+           template, for layouts seen before)
         3. Determine the form type
         
         Args:
@@ -164,10 +396,12 @@ class IntelligentFormAgent:
         Returns:
             ProcessedForm with extracted data
         """
-        # Check cache
-        if not force_reprocess and file_path in self._processed_forms:
-            self._log(f"Returning cached form: {file_path}")
-            return self._processed_forms[file_path]
+        # Check the form store
+        key = self._form_key(file_path)
+        if not force_reprocess:
+            cached = self._get_stored_form(key, file_path)
+            if cached is not None:
+                return cached
         
         self._log(f"Processing form: {file_path}")
         
@@ -175,46 +409,166 @@ class IntelligentFormAgent:
         extracted = self.doc_processor.process(file_path)
         self._log(f"Extracted {len(extracted.raw_text)} chars, {len(extracted.tables)} tables")
         
-        # Step 2: Use LLM to extract fields
-        self._log("Calling LLM for field extraction...")
-        extraction_result = self.extraction_tool.run(extracted)
-        self.total_llm_calls += 1
+        # Step 2: Use a learned template, or the LLM, to extract fields
+        form_type = self._predict_form_type(extracted)
+        extraction_result = self._template_extraction(extracted, form_type)
+        if extraction_result is None:
+            self._log("Calling LLM for field extraction...")
+            extraction_result = self.extraction_tool.run(extracted, form_type)
+            self._count_llm_call(extraction_result.llm_calls)
+            self._learn_template(extracted, extraction_result)
         
-        self._log(f"Extracted {len(extraction_result.fields)} fields, "
-                  f"form type: {extraction_result.form_type}, "
-                  f"confidence: {extraction_result.confidence:.1%}")
+        return self._build_form(key, file_path, extracted, extraction_result)
+    
+    @staticmethod
+    def _check_failures(
+        file_paths: List[str],
+        results: List[Any],
+        return_exceptions: bool
+    ) -> List[Any]:
+        """Return batch results, or raise FormProcessingError carrying them if any failed."""
+        failures = {path: r for path, r in zip(file_paths, results) if isinstance(r, Exception)}
+        if failures and not return_exceptions:
+            raise FormProcessingError(results, failures) from next(iter(failures.values()))
+        return results
+    
+    def process_forms(
+        self,
+        file_paths: List[str],
+        max_workers: Optional[int] = None,
+        return_exceptions: bool = False
+    ) -> List[ProcessedForm]:
+        """
+        Process multiple forms concurrently.
         
-        # Create ProcessedForm
-        form = ProcessedForm(
-            file_path=file_path,
-            file_type=extracted.file_type,
-            raw_text=extracted.raw_text,
-            extracted_fields=extraction_result.fields,
-            form_type=extraction_result.form_type,
-            extraction_confidence=extraction_result.confidence,
-            tables=extracted.tables,
-            metadata={
-                **extracted.metadata,
-                "extraction_reasoning": extraction_result.reasoning
-            }
-        )
+        Document extraction and LLM calls overlap across a thread pool, with
+        in-flight LLM requests capped by max_concurrent_llm_calls. Every form
+        is attempted even if some fail.
+        
+        Args:
+            file_paths: List of file paths
+            max_workers: Override the agent's thread count for this batch
+            return_exceptions: Return failures in place of their forms instead
+                of raising FormProcessingError after the batch completes
+            
+        Returns:
+            List of ProcessedForm objects (or exceptions), in input order
         
-        # Cache it
-        self._processed_forms[file_path] = form
+        Raises:
+            FormProcessingError: If any form failed and return_exceptions is
+                False; its results still hold the successful forms
+        """
+        workers = max(1, min(max_workers or self.max_workers, len(file_paths) or 1))
         
-        return form
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.process_form, path) for path in file_paths]
+        
+        results = []
+        for path, future in zip(file_paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                self._log(f"Failed to process {path}: {e}")
+                results.append(e)
+        
+        return self._check_failures(file_paths, results, return_exceptions)
     
-    def process_forms(self, file_paths: List[str]) -> List[ProcessedForm]:
+    def process_forms_batch(
+        self,
+        file_paths: List[str],
+        batch_client: Optional[Any] = None,
+        timeout: Optional[float] = None,
+        return_exceptions: bool = False
+    ) -> List[ProcessedForm]:
         """
-        Process multiple forms.
+        Process many forms through the Message Batches API.
+        
+        Intended for backfills where throughput and cost matter more than
+        latency: already-stored forms are skipped, documents are extracted
+        locally in parallel, and all field extraction prompts are submitted as
+        batch jobs and polled until complete.
         
         Args:
             file_paths: List of file paths
+            batch_client: BatchClient to submit through (defaults to the LLM
+                client's batch_client())
+            timeout: Give up waiting for batches after this many seconds
+            return_exceptions: Return failures in place of their forms instead
+                of raising FormProcessingError
             
         Returns:
-            List of ProcessedForm objects
+            List of ProcessedForm objects (or exceptions), in input order
+        
+        Raises:
+            ValueError: No batch_client was given and the LLM client cannot
+                create one
         """
-        return [self.process_form(path) for path in file_paths]
+        if batch_client is None:
+            if not hasattr(self.llm, "batch_client"):
+                raise ValueError(
+                    f"{type(self.llm).__name__} does not support batches; pass batch_client "
+                    "or use process_forms"
+                )
+            batch_client = self.llm.batch_client()
+        
+        results: List[Any] = [None] * len(file_paths)
+        pending = {}
+        
+        def load(path: str):
+            key = self._form_key(path)
+            stored = self._get_stored_form(key, path)
+            if stored is not None:
+                return stored
+            return key, self.doc_processor.process(path)
+        
+        workers = max(1, min(self.max_workers, len(file_paths) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(load, path) for path in file_paths]
+        
+        requests = []
+        for i, future in enumerate(futures):
+            try:
+                loaded = future.result()
+            except Exception as e:
+                results[i] = e
+                continue
+            if isinstance(loaded, ProcessedForm):
+                results[i] = loaded
+                continue
+            
+            form_type = self._predict_form_type(loaded[1])
+            local = self._template_extraction(loaded[1], form_type)
+            if local is not None:
+                results[i] = self._build_form(loaded[0], file_paths[i], loaded[1], local)
+                continue
+            
+            # Long documents become one request per chunk
+            custom_ids = []
+            for j, request in enumerate(self.extraction_tool.build_requests(loaded[1], form_type)):
+                custom_id = f"form-{i}-{j}"
+                custom_ids.append(custom_id)
+                requests.append(batch_client.build_request(custom_id, **request))
+            pending[i] = (custom_ids, *loaded)
+        
+        if requests:
+            self._log(f"Submitting {len(requests)} extraction requests as batch jobs")
+            responses = batch_client.run(requests, timeout=timeout)
+            
+            for i, (custom_ids, key, extracted) in pending.items():
+                chunk_responses = [
+                    responses.get(custom_id, RuntimeError(f"No batch result for {custom_id}"))
+                    for custom_id in custom_ids
+                ]
+                self._count_llm_call(len(custom_ids))
+                failure = next((r for r in chunk_responses if isinstance(r, Exception)), None)
+                if failure is not None:
+                    results[i] = failure
+                    continue
+                extraction_result = self.extraction_tool.parse_responses(chunk_responses)
+                self._learn_template(extracted, extraction_result)
+                results[i] = self._build_form(key, file_paths[i], extracted, extraction_result)
+        
+        return self._check_failures(file_paths, results, return_exceptions)
     
     def ask(
         self,
@@ -226,7 +580,8 @@ class IntelligentFormAgent:
         Ask a question about a form.
         
         The LLM will reason over the document content and extracted fields
-        to provide an accurate answer with evidence.
+        to provide an accurate answer with evidence. Plain lookups of an
+        extracted field ("What is the Employee SSN?") are answered locally.
         
         Args:
             question: Natural language question
@@ -238,26 +593,98 @@ class IntelligentFormAgent:
         """
         self._log(f"Answering question: {question}")
         
-        # Reconstruct ExtractedDocument for the tool
-        doc = ExtractedDocument(
-            file_path=form.file_path,
-            file_type=form.file_type,
-            raw_text=form.raw_text,
-            tables=form.tables,
-            metadata=form.metadata
-        )
+        local = self._lookup_answer(question, form)
+        if local is not None:
+            return local
         
         result = self.qa_tool.run(
             question=question,
-            document=doc,
-            extracted_fields=form.extracted_fields
+            document=self._to_document(form),
+            extracted_fields=form.extracted_fields,
+            index=self._chunk_index(form)
         )
-        self.total_llm_calls += 1
+        self._count_llm_call()
         
         self._log(f"Answer confidence: {result.confidence:.1%}")
         
         return result
     
+    def ask_stream(
+        self,
+        question: str,
+        form: ProcessedForm
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Ask a question about a form, streaming the answer.
+        
+        Yields an {"type": "field", "name": "answer", ...} event as soon as
+        the answer is complete, before evidence and reasoning arrive.
+        
+        Args:
+            question: Natural language question
+            form: ProcessedForm to query
+            
+        Yields:
+            Field events, then a final {"type": "result", "result": QAResult}
+        """
+        self._log(f"Answering question (streaming): {question}")
+        
+        local = self._lookup_answer(question, form)
+        if local is not None:
+            yield {"type": "field", "name": "answer", "value": local.answer}
+            yield {"type": "result", "result": local}
+            return
+        
+        self._count_llm_call()
+        
+        for event in self.qa_tool.stream(
+            question=question,
+            document=self._to_document(form),
+            extracted_fields=form.extracted_fields,
+            index=self._chunk_index(form)
+        ):
+            if event["type"] == "result":
+                self._log(f"Answer confidence: {event['result'].confidence:.1%}")
+            yield event
+    
+    def ask_many(
+        self,
+        questions: List[str],
+        form: ProcessedForm
+    ) -> List[QAResult]:
+        """
+        Ask several questions about one form.
+        
+        Plain field lookups are answered locally; the remaining questions
+        share one structured LLM call (split only if the answers would not
+        fit in a single response) instead of one call per question.
+        
+        Args:
+            questions: Natural language questions
+            form: ProcessedForm to query
+            
+        Returns:
+            QAResults in the same order as questions
+        """
+        self._log(f"Answering {len(questions)} questions")
+        
+        results: List[Optional[QAResult]] = [self._lookup_answer(q, form) for q in questions]
+        remaining = [i for i, result in enumerate(results) if result is None]
+        
+        if remaining:
+            answers, calls = self.qa_tool.run_many(
+                questions=[questions[i] for i in remaining],
+                document=self._to_document(form),
+                extracted_fields=form.extracted_fields,
+                index=self._chunk_index(form)
+            )
+            self._count_llm_call(calls)
+            self._log(f"Answered {len(remaining)} questions in {calls} LLM call(s)")
+            for i, answer in zip(remaining, answers):
+                results[i] = answer
+        
+        return results
+    
     def ask_multiple(
         self,
         question: str,
@@ -292,20 +719,12 @@ class IntelligentFormAgent:
         """
         self._log(f"Summarizing form: {form.file_path}")
         
-        doc = ExtractedDocument(
-            file_path=form.file_path,
-            file_type=form.file_type,
-            raw_text=form.raw_text,
-            tables=form.tables,
-            metadata=form.metadata
-        )
-        
         result = self.summary_tool.run(
-            document=doc,
+            document=self._to_document(form),
             extracted_fields=form.extracted_fields,
             style=style
         )
-        self.total_llm_calls += 1
+        self._count_llm_call()
         
         return result
     
@@ -317,9 +736,8 @@ class IntelligentFormAgent:
         """
         Analyze multiple forms to answer a question or find patterns.
         
-        The LLM will:
+        Numeric statistics are computed locally; the LLM will:
         - Compare fields across documents
-        - Calculate statistics
         - Identify patterns and trends
         - Provide insights
         
@@ -332,25 +750,12 @@ class IntelligentFormAgent:
         """
         self._log(f"Analyzing {len(forms)} forms: {question}")
         
-        documents = [
-            ExtractedDocument(
-                file_path=f.file_path,
-                file_type=f.file_type,
-                raw_text=f.raw_text,
-                tables=f.tables,
-                metadata=f.metadata
-            )
-            for f in forms
-        ]
-        
-        fields_list = [f.extracted_fields for f in forms]
-        
         result = self.analysis_tool.run(
             question=question,
-            documents=documents,
-            extracted_fields_list=fields_list
+            documents=[self._to_document(f) for f in forms],
+            extracted_fields_list=[f.extracted_fields for f in forms]
         )
-        self.total_llm_calls += 1
+        self._count_llm_call(result.calls)
         
         return result
     
@@ -453,75 +858,107 @@ Extraction Confidence: {form.extraction_confidence:.1%}
         
         # Step 3: Execute based on task type
         if task_analysis["task_type"] == "extract":
-            return {
-                "task": task,
-                "type": "extraction",
-                "forms": [f.to_dict() for f in forms]
-            }
+            return self._extraction_output(task, forms)
         
         elif task_analysis["task_type"] == "qa":
             if len(forms) == 1:
                 result = self.ask(question or task, forms[0])
             else:
                 result = self.ask_multiple(question or task, forms)
-            
-            return {
-                "task": task,
-                "type": "qa",
-                "answer": result.answer if hasattr(result, "answer") else str(result),
-                "confidence": getattr(result, "confidence", None),
-                "evidence": getattr(result, "evidence", []),
-                "insights": getattr(result, "insights", [])
-            }
+            return self._qa_output(task, result)
         
         elif task_analysis["task_type"] == "summarize":
             summaries = [self.summarize(f) for f in forms]
-            return {
-                "task": task,
-                "type": "summarization",
-                "summaries": [
-                    {
-                        "file": forms[i].file_path,
-                        "summary": s.summary,
-                        "key_points": s.key_points
-                    }
-                    for i, s in enumerate(summaries)
-                ]
-            }
+            return self._summarization_output(task, forms, summaries)
         
         elif task_analysis["task_type"] == "analyze":
             result = self.analyze(question or task, forms)
-            return {
-                "task": task,
-                "type": "analysis",
-                "answer": result.answer,
-                "insights": result.insights,
-                "statistics": result.statistics,
-                "comparisons": result.comparisons
-            }
+            return self._analysis_output(task, result)
         
         else:
             # Default: extract and summarize
             summaries = [self.summarize(f) for f in forms]
-            return {
-                "task": task,
-                "type": "general",
-                "forms": [f.to_dict() for f in forms],
-                "summaries": [s.summary for s in summaries]
-            }
+            return self._general_output(task, forms, summaries)
     
-    def _analyze_task(
-        self,
+    # Workflow output formatting, shared by run_workflow and arun_workflow
+    
+    @staticmethod
+    def _extraction_output(task: str, forms: List[ProcessedForm]) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "type": "extraction",
+            "forms": [f.to_dict() for f in forms]
+        }
+    
+    @staticmethod
+    def _qa_output(task: str, result: Any) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "type": "qa",
+            "answer": result.answer if hasattr(result, "answer") else str(result),
+            "confidence": getattr(result, "confidence", None),
+            "evidence": getattr(result, "evidence", []),
+            "insights": getattr(result, "insights", [])
+        }
+    
+    @staticmethod
+    def _summarization_output(
         task: str,
-        question: Optional[str],
-        num_docs: int
-    ) -> Dict[str, str]:
-        """
-        Analyze the task to determine what type of operation to perform.
-        
-        Uses LLM to understand user intent.
-        """
-        prompt = f"""Analyze this task and determine what type of form processing is needed.
+        forms: List[ProcessedForm],
+        summaries: List[SummaryResult]
+    ) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "type": "summarization",
+            "summaries": [
+                {
+                    "file": forms[i].file_path,
+                    "summary": s.summary,
+                    "key_points": s.key_points
+                }
+                for i, s in enumerate(summaries)
+            ]
+        }
+    
+    @staticmethod
+    def _analysis_output(task: str, result: AnalysisResult) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "type": "analysis",
+            "answer": result.answer,
+            "insights": result.insights,
+            "statistics": result.statistics,
+            "comparisons": result.comparisons
+        }
+    
+    @staticmethod
+    def _general_output(
+        task: str,
+        forms: List[ProcessedForm],
+        summaries: List[SummaryResult]
+    ) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "type": "general",
+            "forms": [f.to_dict() for f in forms],
+            "summaries": [s.summary for s in summaries]
+        }
+    
+    TASK_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "task_type": {
+                "type": "string",
+                "enum": ["extract", "qa", "summarize", "analyze"]
+            },
+            "reasoning": {"type": "string"}
+        },
+        "required": ["task_type"]
+    }
+    
+    @staticmethod
+    def _task_prompt(task: str, question: Optional[str], num_docs: int) -> str:
+        return f"""Analyze this task and determine what type of form processing is needed.
 
 Task: {task}
 {f"Question: {question}" if question else ""}
@@ -532,39 +969,260 @@ What type of task is this?
 - "qa": User is asking a specific question about the forms
 - "summarize": User wants a summary of the forms
 - "analyze": User wants analysis/comparison across multiple forms"""
-
-        schema = {
-            "type": "object",
-            "properties": {
-                "task_type": {
-                    "type": "string",
-                    "enum": ["extract", "qa", "summarize", "analyze"]
-                },
-                "reasoning": {"type": "string"}
-            },
-            "required": ["task_type"]
+    
+    def _task_model(self) -> Dict[str, str]:
+        """Model override for LLM task routing (the router's fast tier)."""
+        if self.model_router is None:
+            return {}
+        return {"model": self.model_router.select("route_task")}
+    
+    def _route_task(
+        self,
+        task: str,
+        question: Optional[str],
+        num_docs: int
+    ) -> Optional[Dict[str, str]]:
+        """Task analysis from the local intent router, or None if it is unsure."""
+        decision = self.intent_router.route(task, question, num_docs)
+        if decision is None:
+            return None
+        self._log(f"Routed task locally: {decision.intent} ({decision.confidence:.0%})")
+        return {
+            "task_type": decision.intent,
+            "reasoning": f"Routed locally with {decision.confidence:.0%} confidence"
         }
+    
+    def _analyze_task(
+        self,
+        task: str,
+        question: Optional[str],
+        num_docs: int
+    ) -> Dict[str, str]:
+        """
+        Analyze the task to determine what type of operation to perform.
+        
+        The intent router decides locally when it is confident; otherwise
+        the LLM is asked and the router learns from its answer.
+        """
+        routed = self._route_task(task, question, num_docs)
+        if routed is not None:
+            return routed
         
-        result = self.llm.generate_structured(prompt, schema)
-        self.total_llm_calls += 1
+        with self._llm_slots:
+            result = self.llm.generate_structured(
+                self._task_prompt(task, question, num_docs), self.TASK_SCHEMA, **self._task_model()
+            )
+        self._count_llm_call()
+        self.intent_router.record_fallback(task, question, result.get("task_type"))
         
         return result
     
+    # ========================================================================
+    # Async Methods
+    # ========================================================================
+    
+    async def aprocess_form(self, file_path: str, force_reprocess: bool = False) -> ProcessedForm:
+        """
+        Async variant of process_form.
+        
+        Blocking work (hashing, document extraction, form store access,
+        template matching and index building) runs in worker threads; only
+        the LLM call is awaited on the event loop.
+        """
+        key = await asyncio.to_thread(self._form_key, file_path)
+        if not force_reprocess:
+            cached = await asyncio.to_thread(self._get_stored_form, key, file_path)
+            if cached is not None:
+                return cached
+        
+        self._log(f"Processing form: {file_path}")
+        extracted = await asyncio.to_thread(self.doc_processor.process, file_path)
+        
+        form_type = await asyncio.to_thread(self._predict_form_type, extracted)
+        extraction_result = await asyncio.to_thread(self._template_extraction, extracted, form_type)
+        if extraction_result is None:
+            extraction_result = await self.extraction_tool.arun(extracted, form_type)
+            self._count_llm_call(extraction_result.llm_calls)
+            await asyncio.to_thread(self._learn_template, extracted, extraction_result)
+        
+        return await asyncio.to_thread(self._build_form, key, file_path, extracted, extraction_result)
+    
+    async def aprocess_forms(
+        self,
+        file_paths: List[str],
+        return_exceptions: bool = False
+    ) -> List[ProcessedForm]:
+        """
+        Async variant of process_forms.
+        
+        All forms are processed concurrently, with in-flight LLM requests
+        capped by max_concurrent_llm_calls.
+        """
+        results = await asyncio.gather(
+            *(self.aprocess_form(path) for path in file_paths),
+            return_exceptions=True
+        )
+        return self._check_failures(file_paths, list(results), return_exceptions)
+    
+    async def aask(self, question: str, form: ProcessedForm) -> QAResult:
+        """Async variant of ask."""
+        self._log(f"Answering question: {question}")
+        
+        local = self._lookup_answer(question, form)
+        if local is not None:
+            return local
+        
+        result = await self.qa_tool.arun(
+            question=question,
+            document=self._to_document(form),
+            extracted_fields=form.extracted_fields,
+            index=await asyncio.to_thread(self._chunk_index, form)
+        )
+        self._count_llm_call()
+        
+        return result
+    
+    async def asummarize(self, form: ProcessedForm, style: str = "detailed") -> SummaryResult:
+        """Async variant of summarize."""
+        self._log(f"Summarizing form: {form.file_path}")
+        
+        result = await self.summary_tool.arun(
+            document=self._to_document(form),
+            extracted_fields=form.extracted_fields,
+            style=style
+        )
+        self._count_llm_call()
+        
+        return result
+    
+    async def aanalyze(self, question: str, forms: List[ProcessedForm]) -> AnalysisResult:
+        """Async variant of analyze."""
+        self._log(f"Analyzing {len(forms)} forms: {question}")
+        
+        result = await self.analysis_tool.arun(
+            question=question,
+            documents=[self._to_document(f) for f in forms],
+            extracted_fields_list=[f.extracted_fields for f in forms]
+        )
+        self._count_llm_call(result.calls)
+        
+        return result
+    
+    async def _aanalyze_task(
+        self,
+        task: str,
+        question: Optional[str],
+        num_docs: int
+    ) -> Dict[str, str]:
+        """Async variant of _analyze_task."""
+        routed = self._route_task(task, question, num_docs)
+        if routed is not None:
+            return routed
+        
+        prompt = self._task_prompt(task, question, num_docs)
+        async with self._llm_slots:
+            if self.async_llm is None:
+                result = await asyncio.to_thread(
+                    self.llm.generate_structured, prompt, self.TASK_SCHEMA, **self._task_model()
+                )
+            else:
+                result = await self.async_llm.generate_structured(prompt, self.TASK_SCHEMA, **self._task_model())
+        self._count_llm_call()
+        self.intent_router.record_fallback(task, question, result.get("task_type"))
+        
+        return result
+    
+    async def arun_workflow(
+        self,
+        task: str,
+        file_paths: List[str],
+        question: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Async variant of run_workflow."""
+        self._log(f"Running workflow: {task}")
+        
+        forms, task_analysis = await asyncio.gather(
+            self.aprocess_forms(file_paths),
+            self._aanalyze_task(task, question, len(file_paths))
+        )
+        
+        if task_analysis["task_type"] == "extract":
+            return self._extraction_output(task, forms)
+        
+        elif task_analysis["task_type"] == "qa":
+            if len(forms) == 1:
+                result = await self.aask(question or task, forms[0])
+            else:
+                result = await self.aanalyze(question or task, forms)
+            return self._qa_output(task, result)
+        
+        elif task_analysis["task_type"] == "summarize":
+            summaries = await asyncio.gather(*(self.asummarize(f) for f in forms))
+            return self._summarization_output(task, forms, summaries)
+        
+        elif task_analysis["task_type"] == "analyze":
+            result = await self.aanalyze(question or task, forms)
+            return self._analysis_output(task, result)
+        
+        else:
+            summaries = await asyncio.gather(*(self.asummarize(f) for f in forms))
+            return self._general_output(task, forms, summaries)
+    
     # ========================================================================
     # Statistics
     # ========================================================================
     
     def get_stats(self) -> Dict[str, Any]:
         """Get agent statistics."""
-        return {
+        stats = {
             "total_llm_calls": self.total_llm_calls,
-            "cached_forms": len(self._processed_forms),
-            "cached_form_paths": list(self._processed_forms.keys())
+            "local_answers": self.local_answers,
+            "cached_forms": len(self.form_store),
+            "cached_form_paths": self.form_store.file_paths(limit=self.STATS_RECENT_FORMS)
         }
+        
+        # Token usage, including prompt cache reads and writes
+        if hasattr(self.llm, "get_usage"):
+            stats["llm_usage"] = self.llm.get_usage()
+        
+        response_cache = getattr(self.llm, "response_cache", None)
+        if response_cache is not None:
+            stats["response_cache"] = response_cache.get_stats()
+        
+        rate_limiter = getattr(self.llm, "rate_limiter", None)
+        if rate_limiter is not None:
+            stats["rate_limiter"] = rate_limiter.get_stats()
+        
+        if self.template_library is not None:
+            stats["templates"] = self.template_library.get_stats()
+        
+        stats["intent_router"] = self.intent_router.get_stats()
+        
+        if self.model_router is not None:
+            stats["model_router"] = self.model_router.get_stats()
+        
+        return stats
+    
+    def train_classifier(self, min_examples: int = 2, **kwargs) -> FormTypeClassifier:
+        """
+        Train the local form-type classifier on the stored forms and use it.
+        
+        Args:
+            min_examples: Form types with fewer stored forms are left out
+            **kwargs: FormTypeClassifier options
+            
+        Returns:
+            The trained classifier
+        """
+        self.form_classifier = FormTypeClassifier.from_store(
+            self.form_store, min_examples=min_examples, **kwargs
+        )
+        self._log(f"Trained form classifier on types: {', '.join(self.form_classifier.labels)}")
+        return self.form_classifier
     
     def clear_cache(self):
         """Clear the form cache."""
-        self._processed_forms.clear()
+        self.form_store.clear()
 
 
 # ============================================================================
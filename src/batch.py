@@ -0,0 +1,271 @@
+"""
+Batch Module
+
+Bulk LLM requests through Anthropic's Message Batches API, plus a local
+stand-in server for offline runs and tests.
+"""
+
+import time
+import uuid
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Any, Optional, Callable, Union
+
+from src.llm_client import (
+    STRUCTURED_OUTPUT_TOOL,
+    build_structured_system,
+    parse_json_response
+)
+
+
+class LocalBatchServer:
+    """
+    Offline stand-in for the Anthropic Message Batches resource.
+    
+    Implements the create/retrieve/results subset of
+    client.messages.batches. Each request's params are passed to a responder
+    callable that returns the response text (JSON, for requests that force a
+    tool call). Batches report "in_progress" for polls_until_done retrieve
+    calls before they end.
+    
+    Example:
+        server = LocalBatchServer(lambda params: '{"fields": {}}')
+        batch = BatchClient(server, model="local", poll_interval=0)
+    """
+    
+    def __init__(self, responder: Callable[[Dict[str, Any]], str], polls_until_done: int = 1):
+        """
+        Initialize the server.
+        
+        Args:
+            responder: Maps a request's params to the response text
+            polls_until_done: retrieve() calls that report in_progress first
+        """
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def create(self, requests: List[Dict[str, Any]]):
+        batch_id = f"msgbatch_local_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._batches[batch_id] = {"requests": list(requests), "polls": 0, "results": None}
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+    
+    def retrieve(self, batch_id: str):
+        with self._lock:
+            batch = self._batches[batch_id]
+            batch["polls"] += 1
+            done = batch["polls"] > self.polls_until_done
+            # Computed under the lock so concurrent polls run each request once
+            if done and batch["results"] is None:
+                batch["results"] = [self._run(request) for request in batch["requests"]]
+            results = batch["results"] or []
+        
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status="ended" if done else "in_progress",
+            request_counts=SimpleNamespace(
+                processing=0 if done else len(batch["requests"]),
+                succeeded=sum(1 for r in results if r.result.type == "succeeded"),
+                errored=sum(1 for r in results if r.result.type == "errored")
+            )
+        )
+    
+    def results(self, batch_id: str):
+        with self._lock:
+            results = self._batches[batch_id]["results"]
+        if results is None:
+            raise RuntimeError(f"Batch {batch_id} has not finished processing")
+        return iter(results)
+    
+    def _run(self, request: Dict[str, Any]):
+        try:
+            text = self.responder(request["params"])
+            result = SimpleNamespace(
+                type="succeeded",
+                message=SimpleNamespace(content=[self._content_block(request["params"], text)])
+            )
+        except Exception as e:
+            result = SimpleNamespace(type="errored", error=SimpleNamespace(message=str(e)))
+        return SimpleNamespace(custom_id=request["custom_id"], result=result)
+    
+    @staticmethod
+    def _content_block(params: Dict[str, Any], text: str):
+        """Answer forced tool calls with a tool_use block, as the real API does."""
+        tool_choice = params.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool":
+            return SimpleNamespace(
+                type="tool_use",
+                id=f"toolu_local_{uuid.uuid4().hex[:12]}",
+                name=tool_choice["name"],
+                input=parse_json_response(text)
+            )
+        return SimpleNamespace(type="text", text=text)
+
+
+class BatchClient:
+    """
+    Submits structured-output requests as Message Batches and collects results.
+    
+    Batches trade latency (results can take minutes to hours) for throughput
+    and lower per-token cost, which suits overnight backfills.
+    
+    Example:
+        batch = client.batch_client()
+        requests = [batch.build_request(f"form-{i}", prompt, schema) for i, prompt in enumerate(prompts)]
+        results = batch.run(requests)
+    """
+    
+    def __init__(
+        self,
+        batches: Any,
+        model: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+        poll_interval: float = 30.0,
+        max_batch_size: int = 10000,
+        structured_output: str = "tool"
+    ):
+        """
+        Initialize the batch client.
+        
+        Args:
+            batches: client.messages.batches, or a LocalBatchServer
+            model: Model used for every request
+            max_tokens: Maximum tokens per response
+            temperature: Sampling temperature
+            poll_interval: Seconds between status polls
+            max_batch_size: Requests per submitted batch
+            structured_output: "tool" forces a tool call carrying the result;
+                "json" asks for JSON in the text reply
+        """
+        self.batches = batches
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.poll_interval = poll_interval
+        self.max_batch_size = max_batch_size
+        self.structured_output = structured_output
+    
+    def build_request(
+        self,
+        custom_id: str,
+        prompt: str,
+        schema: Dict,
+        system: str = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build one batch request for a structured JSON response.
+        
+        Args:
+            custom_id: Caller-chosen ID used to match the result
+            prompt: User prompt
+            schema: JSON schema for expected output
+            system: System prompt
+            model: Model for this request (defaults to the client's model)
+        
+        Returns:
+            Request dict for batches.create
+        """
+        params = {
+            "model": model or self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        
+        if self.structured_output == "tool":
+            params["system"] = system or "You are a helpful assistant."
+            params["tools"] = [{
+                "name": STRUCTURED_OUTPUT_TOOL,
+                "description": "Record the final result. Always call this tool exactly once.",
+                "input_schema": schema
+            }]
+            params["tool_choice"] = {"type": "tool", "name": STRUCTURED_OUTPUT_TOOL}
+        else:
+            params["system"] = build_structured_system(system, schema)
+        
+        return {"custom_id": custom_id, "params": params}
+    
+    def submit(self, requests: List[Dict[str, Any]]) -> List[str]:
+        """Submit requests, split into batches of max_batch_size. Returns batch IDs."""
+        batch_ids = []
+        for start in range(0, len(requests), self.max_batch_size):
+            batch = self.batches.create(requests=requests[start:start + self.max_batch_size])
+            batch_ids.append(batch.id)
+        return batch_ids
+    
+    def wait(self, batch_ids: List[str], timeout: Optional[float] = None):
+        """Poll until every batch has ended."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = list(batch_ids)
+        
+        while pending:
+            pending = [
+                batch_id for batch_id in pending
+                if self.batches.retrieve(batch_id).processing_status != "ended"
+            ]
+            if not pending:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Batches still processing after {timeout}s: {pending}")
+            time.sleep(self.poll_interval)
+    
+    def collect(self, batch_id: str) -> Dict[str, Union[Dict, Exception]]:
+        """
+        Parse results of an ended batch.
+        
+        Returns:
+            Dictionary of custom_id to parsed JSON, or to the exception for
+            requests that errored or returned unparseable output
+        """
+        results = {}
+        for entry in self.batches.results(batch_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                results[entry.custom_id] = RuntimeError(
+                    f"Batch request {result.type}: {getattr(error, 'message', error)}"
+                )
+                continue
+            try:
+                results[entry.custom_id] = self._parse_message(result.message)
+            except ValueError as e:
+                results[entry.custom_id] = e
+        return results
+    
+    @staticmethod
+    def _parse_message(message) -> Dict:
+        """Structured result from a message: the forced tool call's input, or JSON text."""
+        for block in message.content:
+            if block.type == "tool_use" and block.name == STRUCTURED_OUTPUT_TOOL:
+                return block.input
+        for block in message.content:
+            if block.type == "text":
+                return parse_json_response(block.text)
+        raise ValueError("Batch response contained no structured result")
+    
+    def run(
+        self,
+        requests: List[Dict[str, Any]],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Union[Dict, Exception]]:
+        """
+        Submit requests, wait for completion and return parsed results.
+        
+        Args:
+            requests: Requests from build_request
+            timeout: Give up waiting after this many seconds
+        
+        Returns:
+            Dictionary of custom_id to parsed JSON (or exception)
+        """
+        batch_ids = self.submit(requests)
+        self.wait(batch_ids, timeout=timeout)
+        
+        results = {}
+        for batch_id in batch_ids:
+            results.update(self.collect(batch_id))
+        return results
@@ -0,0 +1,255 @@
+"""
+Cache Module
+
+Content-addressed on-disk caching shared by the processing pipeline.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 of a file's contents.
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Bytes read per iteration
+    
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Build a stable cache key from JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Size-bounded, least-recently-used JSON cache on disk.
+    
+    Each entry is one file named by its key. Reads refresh the file's
+    modification time, and writes evict the stalest entries once the
+    directory exceeds max_bytes. Writes are atomic, so several processes
+    can share one cache directory.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir: Directory to store entries in (created if missing)
+            max_bytes: Total size budget for all entries
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.hits += 1
+        return value
+    
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value under key."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        self._evict()
+    
+    def delete(self, key: str):
+        """Remove an entry if present."""
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def clear(self):
+        """Remove all entries."""
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def _evict(self):
+        """Delete least recently used entries until under the size budget."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            
+            for _, size, path in sorted(entries):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counts and current size."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries)
+        }
+
+
+class ResponseCache:
+    """
+    Two-tier cache for deterministic LLM responses.
+    
+    A bounded in-memory LRU sits in front of an optional DiskCache, so hot
+    entries are served without I/O while repeat prompts still hit across
+    processes and restarts. Entries older than ttl_seconds are ignored in
+    both tiers.
+    
+    Example:
+        cache = ResponseCache(cache_dir="~/.cache/form_agent/responses", ttl_seconds=86400)
+        client = ClaudeClient(response_cache=cache)
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Entries kept in memory
+            cache_dir: Directory for the disk tier (None keeps memory only)
+            max_disk_bytes: Size budget for the disk tier
+            ttl_seconds: Expire entries after this many seconds (None never expires)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = DiskCache(cache_dir, max_bytes=max_disk_bytes) if cache_dir else None
+        
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+    
+    def _remember(self, key: str, created_at: float, value: Any):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+        
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                if not self._expired(stored["created_at"]):
+                    with self._lock:
+                        self._remember(key, stored["created_at"], stored["value"])
+                        self.disk_hits += 1
+                    return stored["value"]
+                self.disk.delete(key)
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def set(self, key: str, value: Any):
+        """Cache a JSON-serializable response."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+        if self.disk is not None:
+            self.disk.set(key, {"created_at": created_at, "value": value})
+    
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for both tiers."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
@@ -0,0 +1,135 @@
+"""
+Chunking Module
+
+Splits long documents into page-aligned chunks that fit a prompt budget.
+"""
+
+import json
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+
+from src.document_processor import ExtractedDocument
+
+
+@dataclass
+class DocumentChunk:
+    """A contiguous piece of a document and the pages it came from."""
+    index: int
+    text: str
+    pages: List[int]
+    kind: str = "text"
+    
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def split_text(text: str, max_chars: int, separators=("\n\n", "\n")) -> List[str]:
+    """
+    Split text into pieces of at most max_chars.
+    
+    Breaks at paragraph boundaries where possible, then at line breaks,
+    and only cuts mid-line for lines longer than max_chars.
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum characters per piece
+        separators: Boundaries to try, coarsest first
+    
+    Returns:
+        Non-empty pieces, in order
+    """
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+    if not separators:
+        cuts = [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+        return [cut for cut in cuts if cut.strip()]
+    
+    separator, finer = separators[0], separators[1:]
+    pieces = []
+    current = ""
+    for part in text.split(separator):
+        candidate = f"{current}{separator}{part}" if current else part
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current.strip():
+            pieces.append(current)
+        if len(part) <= max_chars:
+            current = part
+        else:
+            pieces.extend(split_text(part, max_chars, finer))
+            current = ""
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def chunk_document(
+    document: ExtractedDocument,
+    max_chars: int = 8000,
+    include_tables: bool = True
+) -> List[DocumentChunk]:
+    """
+    Split a document into chunks of at most max_chars.
+    
+    Whole pages are packed together while they fit; longer pages are split
+    by paragraph. Documents without page information are split from
+    raw_text. Tables are serialized as JSON and packed into chunks of
+    their own, so none are dropped.
+    
+    Args:
+        document: Document to split
+        max_chars: Maximum characters per chunk
+        include_tables: Append table chunks after the text chunks
+    
+    Returns:
+        Chunks in document order
+    """
+    paged = any(page.strip() for page in document.pages)
+    pages = document.pages if paged else [document.raw_text]
+    
+    chunks: List[DocumentChunk] = []
+    current_text = ""
+    current_pages: List[int] = []
+    
+    def flush():
+        nonlocal current_text, current_pages
+        if current_text.strip():
+            chunks.append(DocumentChunk(len(chunks), current_text, current_pages))
+        current_text = ""
+        current_pages = []
+    
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text.strip():
+            continue
+        page_ref = [page_number] if paged else []
+        header = f"[Page {page_number}]\n" if paged else ""
+        
+        if len(header) + len(page_text) > max_chars:
+            # Split oversized pages, labelling every piece with its page
+            flush()
+            for piece in split_text(page_text, max_chars - len(header)):
+                chunks.append(DocumentChunk(len(chunks), header + piece, list(page_ref)))
+            continue
+        page_text = header + page_text
+        
+        candidate = f"{current_text}\n\n{page_text}" if current_text else page_text
+        if len(candidate) > max_chars:
+            flush()
+            candidate = page_text
+        current_text = candidate
+        current_pages = current_pages + page_ref
+    flush()
+    
+    if include_tables and document.tables:
+        table_text = ""
+        for table in document.tables:
+            serialized = json.dumps(table)[:max_chars]
+            if table_text and len(table_text) + len(serialized) + 1 > max_chars:
+                chunks.append(DocumentChunk(len(chunks), table_text, [], kind="tables"))
+                table_text = ""
+            table_text = f"{table_text}\n{serialized}" if table_text else serialized
+        if table_text:
+            chunks.append(DocumentChunk(len(chunks), table_text, [], kind="tables"))
+    
+    return chunks
@@ -0,0 +1,246 @@
+"""
+Classifier Module
+
+Local text classification with hashed word n-grams and a softmax linear
+model, used to know a document's form type (and a task's intent) without
+an LLM call.
+"""
+
+import os
+import re
+import json
+import math
+import zlib
+import random
+import tempfile
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+# Only the head of a document is featurized; titles and labels live there
+MAX_CHARS = 4000
+
+
+def hashed_features(
+    text: str,
+    n_features: int = 2 ** 20,
+    ngram_range: Tuple[int, int] = (1, 2),
+    max_chars: int = MAX_CHARS
+) -> Dict[int, float]:
+    """
+    Sparse feature vector of hashed word n-grams.
+    
+    Counts are log-scaled and the vector is L2-normalized. CRC32 is used
+    instead of hash() so features are stable across processes.
+    
+    Args:
+        text: Document text
+        n_features: Size of the hashed feature space
+        ngram_range: Smallest and largest n-gram length
+        max_chars: Characters of text to featurize
+    
+    Returns:
+        Feature index to value
+    """
+    tokens = re.findall(r"[a-z0-9]+", text[:max_chars].lower())
+    counts: Counter = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = " ".join(tokens[i:i + n])
+            counts[zlib.crc32(gram.encode("utf-8")) % n_features] += 1
+    
+    features = {index: 1 + math.log(count) for index, count in counts.items()}
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {index: v / norm for index, v in features.items()}
+
+
+class TextClassifier:
+    """
+    Multinomial logistic regression over hashed n-gram features.
+    
+    Weights are sparse per class, so prediction costs one dictionary lookup
+    per feature and class (under a millisecond for a one-page form).
+    Labels are matched case- and whitespace-insensitively; predictions use
+    the most common spelling seen in training.
+    
+    Example:
+        classifier = TextClassifier().fit(texts, labels)
+        label, probability = classifier.predict(text)
+    """
+    
+    def __init__(
+        self,
+        n_features: int = 2 ** 20,
+        ngram_range: Tuple[int, int] = (1, 2),
+        min_confidence: float = 0.6
+    ):
+        """
+        Initialize an untrained classifier.
+        
+        Args:
+            n_features: Size of the hashed feature space
+            ngram_range: Smallest and largest word n-gram length
+            min_confidence: Probability below which classify() returns None
+        """
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.min_confidence = min_confidence
+        
+        self.labels: List[str] = []
+        self.weights: Dict[str, Dict[int, float]] = {}
+        self.bias: Dict[str, float] = {}
+    
+    @staticmethod
+    def normalize_label(label: str) -> str:
+        return " ".join(str(label).lower().split())
+    
+    def _features(self, text: str) -> Dict[int, float]:
+        return hashed_features(text, self.n_features, self.ngram_range)
+    
+    def fit(
+        self,
+        texts: List[str],
+        labels: List[str],
+        epochs: int = 20,
+        learning_rate: float = 0.5,
+        seed: int = 0
+    ) -> "TextClassifier":
+        """
+        Train with stochastic gradient descent on the softmax loss.
+        
+        Args:
+            texts: Training texts
+            labels: Label of each text
+            epochs: Passes over the training data
+            learning_rate: SGD step size
+            seed: Shuffle seed, for reproducible models
+        
+        Returns:
+            self
+        """
+        spellings: Dict[str, Counter] = {}
+        for label in labels:
+            spellings.setdefault(self.normalize_label(label), Counter())[label] += 1
+        if len(spellings) < 2:
+            raise ValueError("Training needs at least two labels")
+        
+        display = {key: counts.most_common(1)[0][0] for key, counts in spellings.items()}
+        self.labels = sorted(display.values())
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+        
+        examples = [
+            (self._features(text), display[self.normalize_label(label)])
+            for text, label in zip(texts, labels)
+        ]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(examples)
+            for features, target in examples:
+                for label, probability in self._probabilities(features).items():
+                    gradient = probability - (1.0 if label == target else 0.0)
+                    if abs(gradient) < 1e-6:
+                        continue
+                    weights = self.weights[label]
+                    for index, value in features.items():
+                        weights[index] = weights.get(index, 0.0) - learning_rate * gradient * value
+                    self.bias[label] -= learning_rate * gradient
+        return self
+    
+    def _probabilities(self, features: Dict[int, float]) -> Dict[str, float]:
+        scores = {
+            label: self.bias[label] + sum(
+                weights.get(index, 0.0) * value for index, value in features.items()
+            )
+            for label, weights in self.weights.items()
+        }
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: e / total for label, e in exps.items()}
+    
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Probability of each label for a text."""
+        if not self.labels:
+            raise ValueError("Classifier has not been trained")
+        return self._probabilities(self._features(text))
+    
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its probability."""
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+    
+    def classify(self, text: str) -> Optional[str]:
+        """Most likely label, or None if below min_confidence."""
+        label, probability = self.predict(text)
+        return label if probability >= self.min_confidence else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "min_confidence": self.min_confidence,
+            "labels": self.labels,
+            "bias": self.bias,
+            "weights": {label: {str(i): w for i, w in weights.items()} for label, weights in self.weights.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TextClassifier":
+        classifier = cls(data["n_features"], tuple(data["ngram_range"]), data.get("min_confidence", 0.6))
+        classifier.labels = data["labels"]
+        classifier.bias = data["bias"]
+        classifier.weights = {
+            label: {int(i): w for i, w in weights.items()} for label, weights in data["weights"].items()
+        }
+        return classifier
+    
+    def save(self, path: str):
+        """Write the model to a JSON file atomically."""
+        path = str(Path(path).expanduser())
+        directory = Path(path).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    @classmethod
+    def load(cls, path: str) -> "TextClassifier":
+        """Read a model written by save()."""
+        with open(Path(path).expanduser(), "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class FormTypeClassifier(TextClassifier):
+    """
+    TextClassifier for form types, trainable from stored forms.
+    
+    Example:
+        classifier = FormTypeClassifier.from_store(agent.form_store)
+        form_type, probability = classifier.predict(document.raw_text)
+    """
+    
+    @classmethod
+    def from_store(cls, form_store, min_examples: int = 2, **kwargs) -> "FormTypeClassifier":
+        """
+        Train on the processed forms in a form store.
+        
+        Args:
+            form_store: BaseFormStore whose forms carry form_type labels
+            min_examples: Form types with fewer stored forms are left out
+            **kwargs: Classifier options
+        
+        Returns:
+            Trained classifier
+        """
+        forms = [f for f in form_store.forms() if f.get("form_type") and f.get("raw_text")]
+        counts = Counter(cls.normalize_label(f["form_type"]) for f in forms)
+        forms = [f for f in forms if counts[cls.normalize_label(f["form_type"])] >= min_examples]
+        return cls(**kwargs).fit([f["raw_text"] for f in forms], [f["form_type"] for f in forms])
@@ -5,10 +5,18 @@ Handles raw document loading and text extraction from various formats.
 """
 
 import os
+import base64
 from pathlib import Path
 from typing import Tuple, List, Dict, Any, Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from src.cache import DiskCache, hash_file, make_key
+from src.ocr_engine import OCREngine
+
+# Bump when extraction output changes so stale cache entries are ignored
+EXTRACTION_CACHE_VERSION = 1
 
 
 @dataclass
@@ -20,9 +28,93 @@ class ExtractedDocument:
     pages: List[str] = field(default_factory=list)
     tables: List[List[List[str]]] = field(default_factory=list)
     images: List[bytes] = field(default_factory=list)
+    words: List[Dict[str, Any]] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
     extraction_method: str = "unknown"
     extracted_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["images"] = [base64.b64encode(img).decode("ascii") for img in self.images]
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ExtractedDocument":
+        data = dict(data)
+        data["images"] = [base64.b64decode(img) for img in data.get("images", [])]
+        return cls(**data)
+
+
+# ============================================================================
+# Page-level helpers (module level so they can run in worker processes)
+# ============================================================================
+
+def _extract_page(page) -> Tuple[str, List[List[List[str]]]]:
+    """Extract text and cleaned tables from a single pdfplumber page."""
+    page_text = page.extract_text() or ""
+    
+    tables = []
+    for table in page.extract_tables():
+        if table:
+            cleaned = [[str(cell).strip() if cell else "" for cell in row] for row in table]
+            tables.append(cleaned)
+    
+    return page_text, tables
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[str, List[List[List[str]]]]]:
+    """Extract pages [start, end) of a PDF. Runs inside a worker process."""
+    import pdfplumber
+    
+    with pdfplumber.open(file_path) as pdf:
+        return [_extract_page(page) for page in pdf.pages[start:end]]
+
+
+def split_page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    Split page indices into contiguous, near-equal ranges.
+    
+    Args:
+        page_count: Number of pages in the document
+        workers: Number of ranges to produce (at most page_count)
+        
+    Returns:
+        List of (start, end) half-open ranges in page order
+    """
+    workers = max(1, min(workers, page_count))
+    size, remainder = divmod(page_count, workers)
+    
+    ranges = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < remainder else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def group_page_windows(page_numbers: List[int], window: int) -> List[Tuple[int, int]]:
+    """
+    Group page numbers into runs of consecutive pages, at most `window` long.
+    
+    Each run can be rasterized with a single first_page/last_page call.
+    
+    Args:
+        page_numbers: 1-based page numbers
+        window: Maximum pages per run
+        
+    Returns:
+        List of inclusive (first_page, last_page) pairs
+    """
+    window = max(1, window)
+    runs = []
+    for page_number in sorted(set(page_numbers)):
+        if runs and page_number == runs[-1][1] + 1 and runs[-1][1] - runs[-1][0] + 1 < window:
+            runs[-1] = (runs[-1][0], page_number)
+        else:
+            runs.append((page_number, page_number))
+    return runs
 
 
 class DocumentProcessor:
@@ -33,9 +125,45 @@ class DocumentProcessor:
     The LLM will handle understanding the content.
     """
     
-    def __init__(self, ocr_enabled: bool = True, ocr_language: str = "eng"):
+    def __init__(
+        self,
+        ocr_enabled: bool = True,
+        ocr_language: str = "eng",
+        max_workers: int = 1,
+        parallel_min_pages: int = 8,
+        ocr_dpi: int = 200,
+        ocr_memory_limit_mb: int = 256,
+        ocr_workers: int = 0,
+        cache_dir: Optional[str] = None,
+        cache_max_mb: int = 512
+    ):
+        """
+        Initialize the processor.
+        
+        Args:
+            ocr_enabled: Whether to fall back to OCR for scanned content
+            ocr_language: Tesseract language code
+            max_workers: Worker processes for page-parallel PDF extraction
+                (1 disables parallelism)
+            parallel_min_pages: Minimum page count before PDFs are split
+                across workers; smaller documents are not worth the pool startup
+            ocr_dpi: Rasterization resolution for PDF OCR
+            ocr_memory_limit_mb: Upper bound on rasterized page images held in
+                memory at once; PDFs are OCR'd in windows that fit this budget
+            ocr_workers: Persistent OCR worker processes (0 runs OCR inline)
+            cache_dir: Directory for the content-addressed extraction cache
+                (None disables caching)
+            cache_max_mb: Size budget for the extraction cache
+        """
         self.ocr_enabled = ocr_enabled
         self.ocr_language = ocr_language
+        self.max_workers = max(1, max_workers)
+        self.parallel_min_pages = parallel_min_pages
+        self.ocr_dpi = ocr_dpi
+        self.ocr_memory_limit_mb = ocr_memory_limit_mb
+        self.ocr_workers = ocr_workers
+        self._ocr_engine: Optional[OCREngine] = None
+        self.cache = DiskCache(cache_dir, max_bytes=cache_max_mb * 1024 * 1024) if cache_dir else None
         self._pdfplumber = None
         self._pytesseract = None
         self._Image = None
@@ -55,6 +183,24 @@ class DocumentProcessor:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Document not found: {file_path}")
         
+        if self.cache is None:
+            return self._extract(file_path)
+        
+        key = self._cache_key(file_path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            document = ExtractedDocument.from_dict(cached)
+            document.file_path = file_path
+            document.metadata["cache_hit"] = True
+            return document
+        
+        document = self._extract(file_path)
+        if not document.metadata.get("error"):
+            self.cache.set(key, document.to_dict())
+        return document
+    
+    def _extract(self, file_path: str) -> ExtractedDocument:
+        """Dispatch to the extractor for the file's type."""
         file_type = self._detect_file_type(file_path)
         
         if file_type == "pdf":
@@ -64,6 +210,33 @@ class DocumentProcessor:
         else:
             return self._process_text(file_path)
     
+    def _cache_key(self, file_path: str) -> str:
+        """Key a document on its bytes plus every setting that changes the output."""
+        return make_key(
+            EXTRACTION_CACHE_VERSION,
+            hash_file(file_path),
+            self._detect_file_type(file_path),
+            self.ocr_enabled,
+            self.ocr_language,
+            self.ocr_dpi
+        )
+    
+    def get_ocr_engine(self) -> OCREngine:
+        """Get the shared OCR engine, starting it on first use."""
+        if self._ocr_engine is None:
+            self._ocr_engine = OCREngine(language=self.ocr_language, workers=self.ocr_workers)
+        return self._ocr_engine
+    
+    def get_ocr_stats(self) -> Dict[str, Any]:
+        """Get OCR throughput and queue statistics (empty if OCR never ran)."""
+        return self._ocr_engine.get_stats() if self._ocr_engine else {}
+    
+    def close(self):
+        """Release OCR worker processes."""
+        if self._ocr_engine is not None:
+            self._ocr_engine.shutdown()
+            self._ocr_engine = None
+    
     def _detect_file_type(self, file_path: str) -> str:
         """Detect file type from extension or magic bytes."""
         ext = Path(file_path).suffix.lower()
@@ -91,7 +264,7 @@ class DocumentProcessor:
         
         pages = []
         tables = []
-        all_text = ""
+        ocr_pages = []
         metadata = {}
         
         try:
@@ -101,31 +274,61 @@ class DocumentProcessor:
                     "pdf_info": pdf.metadata or {}
                 }
                 
-                for i, page in enumerate(pdf.pages):
-                    page_text = page.extract_text() or ""
-                    pages.append(page_text)
-                    all_text += f"\n--- Page {i+1} ---\n{page_text}"
-                    
-                    # Extract tables
-                    page_tables = page.extract_tables()
-                    for table in page_tables:
-                        if table:
-                            cleaned = [[str(cell).strip() if cell else "" for cell in row] for row in table]
-                            tables.append(cleaned)
+                if self.max_workers > 1 and len(pdf.pages) >= self.parallel_min_pages:
+                    page_results = self._extract_pages_parallel(file_path, len(pdf.pages))
+                    metadata["parallel_workers"] = self.max_workers
+                else:
+                    page_results = [_extract_page(page) for page in pdf.pages]
                 
-                # If no text, try OCR
-                if not all_text.strip() and self.ocr_enabled:
-                    all_text, pages = self._ocr_pdf(file_path)
-                    metadata["ocr_used"] = True
+                for page_text, page_tables in page_results:
+                    pages.append(page_text)
+                    tables.extend(page_tables)
         
         except Exception as e:
             metadata["error"] = str(e)
             if self.ocr_enabled:
                 try:
-                    all_text, pages = self._ocr_pdf(file_path)
-                    metadata["ocr_used"] = True
+                    ocr_results = self._ocr_pdf(file_path)
+                    page_count = max([len(pages), *ocr_results])
+                    pages = [
+                        ocr_results.get(n, pages[n - 1] if n <= len(pages) else "")
+                        for n in range(1, page_count + 1)
+                    ]
+                    ocr_pages = sorted(ocr_results)
                 except:
                     pass
+        else:
+            # OCR only the pages that came back without a text layer; a page
+            # whose OCR fails keeps the pdfplumber text
+            empty_pages = [i + 1 for i, text in enumerate(pages) if not text.strip()]
+            if empty_pages and self.ocr_enabled:
+                try:
+                    ocr_results = self._ocr_pdf(file_path, empty_pages)
+                except Exception as e:
+                    metadata["ocr_error"] = str(e)
+                    ocr_results = {}
+                for page_number, page_text in sorted(ocr_results.items()):
+                    pages[page_number - 1] = page_text
+                    ocr_pages.append(page_number)
+                failed = [n for n in empty_pages if n not in ocr_results]
+                if failed:
+                    metadata["ocr_failed_pages"] = failed
+        
+        all_text = ""
+        for i, page_text in enumerate(pages):
+            label = f"Page {i+1} (OCR)" if (i + 1) in ocr_pages else f"Page {i+1}"
+            all_text += f"\n--- {label} ---\n{page_text}"
+        
+        if ocr_pages:
+            metadata["ocr_used"] = True
+            metadata["ocr_pages"] = ocr_pages
+        
+        if not ocr_pages:
+            extraction_method = "pdfplumber"
+        elif len(ocr_pages) == len(pages):
+            extraction_method = "ocr"
+        else:
+            extraction_method = "pdfplumber+ocr"
         
         return ExtractedDocument(
             file_path=file_path,
@@ -134,27 +337,85 @@ class DocumentProcessor:
             pages=pages,
             tables=tables,
             metadata=metadata,
-            extraction_method="pdfplumber" if not metadata.get("ocr_used") else "ocr"
+            extraction_method=extraction_method
         )
     
-    def _ocr_pdf(self, file_path: str) -> Tuple[str, List[str]]:
-        """OCR a PDF document."""
+    def _extract_pages_parallel(
+        self,
+        file_path: str,
+        page_count: int
+    ) -> List[Tuple[str, List[List[List[str]]]]]:
+        """
+        Extract PDF pages across a process pool.
+        
+        Each worker opens the file independently and handles one contiguous
+        page range; results are concatenated back in page order.
+        """
+        ranges = split_page_ranges(page_count, self.max_workers)
+        
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(_extract_page_range, file_path, start, end)
+                for start, end in ranges
+            ]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        
+        return results
+    
+    def _ocr_window_size(self) -> int:
+        """Number of pages that can be rasterized at once within the memory limit."""
+        # Assume US Letter at the configured DPI, 3 bytes per RGB pixel
+        page_bytes = int(8.5 * self.ocr_dpi) * int(11 * self.ocr_dpi) * 3
+        return max(1, (self.ocr_memory_limit_mb * 1024 * 1024) // page_bytes)
+    
+    def _ocr_pdf(self, file_path: str, page_numbers: Optional[List[int]] = None) -> Dict[int, str]:
+        """
+        OCR a PDF document.
+        
+        Pages are rasterized a window at a time so peak memory is bounded by
+        ocr_memory_limit_mb rather than by the page count.
+        
+        Args:
+            file_path: Path to the PDF
+            page_numbers: 1-based pages to OCR (all pages if None)
+            
+        Returns:
+            Dictionary of page number to OCR text, without pages whose OCR
+            failed
+        """
         try:
-            from pdf2image import convert_from_path
-            import pytesseract
+            from pdf2image import convert_from_path, pdfinfo_from_path
+            engine = self.get_ocr_engine()
         except ImportError:
-            return "", []
+            return {}
         
-        pages = []
-        all_text = ""
+        if page_numbers is None:
+            page_count = int(pdfinfo_from_path(file_path).get("Pages", 0))
+            page_numbers = list(range(1, page_count + 1))
         
-        images = convert_from_path(file_path)
-        for i, img in enumerate(images):
-            page_text = pytesseract.image_to_string(img, lang=self.ocr_language)
-            pages.append(page_text)
-            all_text += f"\n--- Page {i+1} (OCR) ---\n{page_text}"
+        results = {}
         
-        return all_text, pages
+        for first_page, last_page in group_page_windows(page_numbers, self._ocr_window_size()):
+            images = convert_from_path(
+                file_path,
+                dpi=self.ocr_dpi,
+                first_page=first_page,
+                last_page=last_page
+            )
+            futures = [engine.submit(image) for image in images]
+            for offset, future in enumerate(futures):
+                try:
+                    results[first_page + offset] = future.result()
+                except Exception:
+                    # Left out, so the caller keeps the text it already has for the page
+                    continue
+            for img in images:
+                img.close()
+            del images
+        
+        return results
     
     def _process_image(self, file_path: str) -> ExtractedDocument:
         """Extract text from image using OCR."""
@@ -168,30 +429,24 @@ class DocumentProcessor:
         
         try:
             from PIL import Image
-            import pytesseract
         except ImportError:
             raise ImportError("Pillow and pytesseract required for image processing")
         
         img = Image.open(file_path)
-        text = pytesseract.image_to_string(img, lang=self.ocr_language)
         
-        # Get OCR confidence data
-        try:
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-            confidences = [int(c) for c in data["conf"] if str(c).isdigit() and int(c) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-        except:
-            avg_confidence = 0
+        # One recognition pass yields text, confidence and word boxes
+        ocr = self.get_ocr_engine().recognize_detailed(img)
         
         return ExtractedDocument(
             file_path=file_path,
             file_type=self._detect_file_type(file_path),
-            raw_text=text.strip(),
-            pages=[text],
+            raw_text=ocr.text.strip(),
+            pages=[ocr.text],
+            words=ocr.words,
             metadata={
                 "image_size": img.size,
                 "image_mode": img.mode,
-                "ocr_confidence": avg_confidence
+                "ocr_confidence": ocr.confidence
             },
             extraction_method="ocr"
         )
@@ -0,0 +1,154 @@
+"""
+Field Lookup Module
+
+Answers "What is the <field>?" questions directly from extracted fields,
+without an LLM call.
+"""
+
+import re
+from difflib import SequenceMatcher
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional
+
+# Leading phrases of a plain field lookup ("What is the", "Show me the", ...)
+LOOKUP_PREFIX = re.compile(
+    r"^\s*(?:what(?:'s|\s+is|\s+are|\s+was|\s+were)|show(?:\s+me)?|give\s+me|tell\s+me|get|find|list)"
+    r"\s+(?:(?:the|my|their|his|her|its)\s+)?(?:value\s+(?:of|for)\s+(?:the\s+)?)?",
+    re.IGNORECASE
+)
+
+# Trailing references to the form itself ("... on this form?")
+FORM_SUFFIX = re.compile(
+    r"\s+(?:on|in|of|for|from)\s+(?:this|the|that)\s+(?:form|document|file|page)\s*$",
+    re.IGNORECASE
+)
+
+# Words that signal the question needs reasoning, not a lookup
+REASONING_WORDS = {
+    "why", "how", "compare", "difference", "sum", "average", "explain",
+    "should", "whether", "and", "or", "between", "than", "versus", "vs"
+}
+
+# Words that never tell two fields apart ("Date of Birth")
+FILLER_WORDS = {"a", "an", "the", "of", "for", "on", "in", "to", "at", "by", "per"}
+
+# Suffixes that make two words the same term ("wage"/"wages", "date"/"dated")
+INFLECTIONS = {"s", "es", "d", "ed", "ing"}
+
+
+@dataclass
+class FieldMatch:
+    """An extracted field matched to a question."""
+    name: str
+    value: Any
+    score: float
+
+
+def _terms(text: str) -> List[str]:
+    text = re.sub(r"'s\b", "", text.lower())
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def lookup_target(question: str) -> Optional[str]:
+    """
+    The field phrase a lookup question asks for, or None.
+    
+    "What is the Employee SSN?" gives "Employee SSN"; questions that need
+    reasoning ("Why was the claim denied?") give None.
+    """
+    match = LOOKUP_PREFIX.match(question)
+    if not match:
+        return None
+    
+    target = FORM_SUFFIX.sub("", question[match.end():].strip().rstrip("?.! "))
+    terms = _terms(target)
+    if not terms or len(terms) > 6:
+        return None
+    if any(word in REASONING_WORDS for word in terms):
+        return None
+    return target
+
+
+def _same_word(a: str, b: str) -> bool:
+    """Whether two words are equal or differ only by an inflection ("wage"/"wages")."""
+    if a == b:
+        return True
+    short, long = sorted((a, b), key=len)
+    return len(short) >= 3 and long.startswith(short) and long[len(short):] in INFLECTIONS
+
+
+def field_similarity(target: str, field_name: str) -> float:
+    """
+    Similarity (0-1) between a question's target phrase and a field name.
+    
+    Every word of the target must appear in the field name, exactly or
+    inflected, so "employer name" never matches "Employee Name". A field
+    name with further distinguishing words scores below the lookup
+    threshold ("date" vs "Date of Birth"), unless the target names a
+    numbered box ("Box 1" vs "Box 1 - Wages"). Numbers must match exactly,
+    so "Box 1" never matches "Box 10". Character similarity only orders
+    candidates within each of these bands.
+    """
+    target_terms = _terms(target)
+    field_terms = _terms(field_name)
+    if not target_terms or not field_terms:
+        return 0.0
+    
+    target_numbers = {t for t in target_terms if t.isdigit()}
+    if target_numbers and target_numbers != {t for t in field_terms if t.isdigit()}:
+        return 0.0
+    
+    char_score = SequenceMatcher(None, " ".join(target_terms), " ".join(field_terms)).ratio()
+    matched = {f for f in field_terms if any(_same_word(t, f) for t in target_terms)}
+    required = [t for t in target_terms if t not in FILLER_WORDS]
+    covered = all(any(_same_word(t, f) for f in field_terms) for t in required)
+    precision = len(matched) / len(set(field_terms))
+    
+    if not covered:
+        containment = sum(1 for t in set(target_terms) if any(_same_word(t, f) for f in field_terms))
+        return 0.6 * containment / len(set(target_terms)) * precision + 0.2 * char_score
+    
+    extra = set(field_terms) - matched - FILLER_WORDS
+    if not extra or target_numbers:
+        return 0.9 + 0.1 * char_score
+    return 0.6 + 0.2 * precision + 0.04 * char_score
+
+
+def match_field(
+    question: str,
+    fields: Dict[str, Any],
+    threshold: float = 0.85,
+    margin: float = 0.05
+) -> Optional[FieldMatch]:
+    """
+    Find the extracted field a lookup question refers to.
+    
+    Args:
+        question: Natural language question
+        fields: Extracted field names and values
+        threshold: Minimum similarity to accept a match
+        margin: Required lead over the runner-up with a different value
+    
+    Returns:
+        The matching field, or None when the question is not a plain
+        lookup or no field matches clearly
+    """
+    target = lookup_target(question)
+    if target is None or not fields:
+        return None
+    
+    scored = sorted(
+        (FieldMatch(name, value, field_similarity(target, name)) for name, value in fields.items()
+         if value not in (None, "", [], {})),
+        key=lambda m: -m.score
+    )
+    if not scored or scored[0].score < threshold:
+        return None
+    
+    best = scored[0]
+    for other in scored[1:]:
+        if best.score - other.score >= margin:
+            break
+        if other.value != best.value:
+            return None
+    return best
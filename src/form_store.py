@@ -0,0 +1,255 @@
+"""
+Form Store Module
+
+Persistent storage for processed forms, so LLM extraction results survive
+across runs and memory stays bounded in long-lived services.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+from abc import ABC, abstractmethod
+
+from src.cache import make_key
+
+
+def form_key(content_hash: str, model: str, prompt_version: str) -> str:
+    """
+    Build the store key for a processed form.
+    
+    Args:
+        content_hash: SHA-256 of the source file's bytes
+        model: LLM model used for extraction
+        prompt_version: Version of the extraction prompt
+    
+    Returns:
+        Store key
+    """
+    return make_key(content_hash, model, prompt_version)
+
+
+def default_store_path() -> str:
+    """Default SQLite location (override with FORM_AGENT_CACHE_DIR)."""
+    cache_dir = os.getenv("FORM_AGENT_CACHE_DIR", "~/.cache/intelligent_form_agent")
+    return str(Path(cache_dir).expanduser() / "forms.db")
+
+
+class BaseFormStore(ABC):
+    """Abstract base class for processed form stores."""
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored form dict for key, or None."""
+        pass
+    
+    @abstractmethod
+    def put(self, key: str, form: Dict[str, Any]):
+        """Store a form dict under key."""
+        pass
+    
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove a form if present."""
+        pass
+    
+    @abstractmethod
+    def clear(self):
+        """Remove all forms."""
+        pass
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+    
+    @abstractmethod
+    def file_paths(self, limit: Optional[int] = None) -> List[str]:
+        """File paths of stored forms, most recently used first (at most limit)."""
+        pass
+    
+    @abstractmethod
+    def forms(self) -> List[Dict[str, Any]]:
+        """All stored form dicts, most recently used first, without touching recency."""
+        pass
+
+
+class MemoryFormStore(BaseFormStore):
+    """
+    In-process LRU form store with optional TTL.
+    
+    Useful for tests and short-lived sessions that should not touch disk.
+    """
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._forms: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._forms.get(key)
+            if entry is None:
+                return None
+            created_at, form = entry
+            if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                del self._forms[key]
+                return None
+            self._forms.move_to_end(key)
+            return form
+    
+    def put(self, key: str, form: Dict[str, Any]):
+        with self._lock:
+            self._forms[key] = (time.time(), form)
+            self._forms.move_to_end(key)
+            while len(self._forms) > self.max_entries:
+                self._forms.popitem(last=False)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._forms.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._forms.clear()
+    
+    def __len__(self) -> int:
+        return len(self._forms)
+    
+    def file_paths(self, limit: Optional[int] = None) -> List[str]:
+        with self._lock:
+            paths = [form["file_path"] for _, form in reversed(self._forms.values())]
+        return paths if limit is None else paths[:limit]
+    
+    def forms(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [
+                form for created_at, form in reversed(self._forms.values())
+                if self.ttl_seconds is None or now - created_at <= self.ttl_seconds
+            ]
+
+
+class SQLiteFormStore(BaseFormStore):
+    """
+    SQLite-backed form store with LRU eviction, TTL and a size cap.
+    
+    Example:
+        store = SQLiteFormStore("~/.cache/forms.db", max_entries=10000)
+        agent = IntelligentFormAgent(form_store=store)
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            path: Database file (defaults to default_store_path())
+            max_entries: Maximum forms kept; least recently used are evicted
+            ttl_seconds: Discard forms older than this (None keeps forever)
+        """
+        self.path = str(Path(path or default_store_path()).expanduser())
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS forms (
+                key TEXT PRIMARY KEY,
+                file_path TEXT,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_forms_accessed ON forms (accessed_at)")
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, created_at FROM forms WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            data, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM forms WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            
+            self._conn.execute("UPDATE forms SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        
+        return json.loads(data)
+    
+    def put(self, key: str, form: Dict[str, Any]):
+        now = time.time()
+        data = json.dumps(form, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO forms (key, file_path, data, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, form.get("file_path"), data, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now: float):
+        """Drop expired forms, then least recently used ones beyond the cap."""
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM forms WHERE created_at < ?", (now - self.ttl_seconds,))
+        
+        self._conn.execute(
+            "DELETE FROM forms WHERE key IN ("
+            "SELECT key FROM forms ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM forms WHERE key = ?", (key,))
+            self._conn.commit()
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM forms")
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM forms").fetchone()[0]
+    
+    def file_paths(self, limit: Optional[int] = None) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path FROM forms ORDER BY accessed_at DESC LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def forms(self) -> List[Dict[str, Any]]:
+        oldest = 0.0 if self.ttl_seconds is None else time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM forms WHERE created_at >= ? ORDER BY accessed_at DESC", (oldest,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
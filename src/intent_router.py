@@ -0,0 +1,252 @@
+"""
+Intent Router Module
+
+Routes workflow tasks to "extract", "qa", "summarize" or "analyze"
+locally, with keyword rules and a small trainable classifier, so the LLM
+is only asked when the local decision is uncertain.
+"""
+
+import re
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+
+from src.classifier import TextClassifier
+
+INTENTS = ("extract", "qa", "summarize", "analyze")
+
+# Phrases that signal each intent; every matching pattern adds one point
+INTENT_PATTERNS = {
+    "extract": [
+        r"\bextract\w*",
+        r"\b(?:list|show|get|export|dump|parse|pull)\b.*\b(?:fields?|data|values|key[- ]value)",
+        r"\bfields?\b"
+    ],
+    "qa": [
+        r"\?\s*$",
+        r"^\s*(?:what|who|whom|when|where|which|why|how|is|are|does|did|was|were|can|has)\b",
+        r"\b(?:answer|question)\b",
+        r"\bfind (?:out|the)\b"
+    ],
+    "summarize": [
+        r"\bsummar\w*",
+        r"\b(?:overview|gist|recap|tl;?dr)\b",
+        r"\bkey points\b",
+        r"\bbrief\w*"
+    ],
+    "analyze": [
+        r"\bcompar\w*",
+        r"\banaly[sz]\w*",
+        r"\b(?:trends?|patterns?|outliers?|statistics?|aggregates?)\b",
+        r"\bacross\b",
+        r"\b(?:average|mean|median|totals?|sum)\b",
+        r"\b(?:rank\w*|differen\w*)\b",
+        r"\b(?:highest|lowest|largest|smallest|biggest|most|least|maximum|minimum|top)\b",
+        r"\b(?:how many|count|number of)\b",
+        r"^\s*(?:which|who|what|how)\b.*\b(?:highest|lowest|largest|smallest|biggest|most|least|many)\b",
+        r"\ball (?:the |of the |these )?(?:forms|documents|files)\b"
+    ]
+}
+
+# Built-in training examples for the classifier
+SEED_EXAMPLES = [
+    ("Extract the fields", "extract"),
+    ("Extract all key-value pairs from these forms", "extract"),
+    ("Pull out the data from the form", "extract"),
+    ("Show me all fields", "extract"),
+    ("Get the values from each document", "extract"),
+    ("Export the form data as JSON", "extract"),
+    ("Parse these forms", "extract"),
+    ("What is the employee name?", "qa"),
+    ("Who signed the form?", "qa"),
+    ("When is the payment due?", "qa"),
+    ("Is the claim approved?", "qa"),
+    ("How much was withheld for federal tax?", "qa"),
+    ("Answer the question about this form", "qa"),
+    ("Find out the policy number", "qa"),
+    ("Summarize the forms", "summarize"),
+    ("Give me a summary of each document", "summarize"),
+    ("Provide an overview of this form", "summarize"),
+    ("What are the key points of these documents", "summarize"),
+    ("Brief me on the form", "summarize"),
+    ("Recap the document", "summarize"),
+    ("Compare the salaries across forms", "analyze"),
+    ("What is the average claim amount across all documents?", "analyze"),
+    ("Analyze trends in these forms", "analyze"),
+    ("Find patterns and outliers in the submissions", "analyze"),
+    ("What is the total income across all forms?", "analyze"),
+    ("Rank the employees by salary", "analyze"),
+    ("Which form has the largest claim amount?", "analyze"),
+    ("How many documents are missing a signature?", "analyze"),
+    ("What are the differences between these documents?", "analyze")
+]
+
+
+@dataclass
+class IntentDecision:
+    """A locally routed task type and how sure the router is."""
+    intent: str
+    confidence: float
+
+
+def rule_scores(text: str, num_docs: int = 1) -> Dict[str, float]:
+    """
+    Keyword rule score for each intent.
+    
+    Cross-document signals count half for a single document, where
+    "the total" usually asks for one value rather than an aggregate; over
+    several documents, a question carrying such a signal ("Which employee
+    has the highest salary?") leans further toward analyze.
+    """
+    text = text.lower()
+    scores = {
+        intent: float(sum(1 for pattern in patterns if re.search(pattern, text)))
+        for intent, patterns in INTENT_PATTERNS.items()
+    }
+    if num_docs <= 1:
+        scores["analyze"] /= 2
+    elif scores["analyze"] and scores["qa"]:
+        scores["analyze"] += 1
+    return scores
+
+
+def _softmax(scores: Dict[str, float], scale: float) -> Dict[str, float]:
+    top = max(scores.values())
+    exps = {k: math.exp((v - top) * scale) for k, v in scores.items()}
+    total = sum(exps.values())
+    return {k: e / total for k, e in exps.items()}
+
+
+class IntentRouter:
+    """
+    Local task-intent routing with an LLM fallback.
+    
+    Rule scores and classifier probabilities are blended; below
+    min_confidence, route() returns None and the caller should ask the LLM,
+    then pass its answer to record_fallback(). The classifier is retrained
+    on the LLM's answers every retrain_every fallbacks.
+    
+    Example:
+        router = IntentRouter()
+        decision = router.route("Compare salaries", num_docs=3)
+        if decision is None:
+            ...  # ask the LLM
+    """
+    
+    def __init__(
+        self,
+        min_confidence: float = 0.5,
+        rule_weight: float = 0.6,
+        rule_scale: float = 2.5,
+        max_examples: int = 1000,
+        retrain_every: int = 10
+    ):
+        """
+        Initialize the router and train its classifier on SEED_EXAMPLES.
+        
+        Args:
+            min_confidence: Combined probability needed to route locally
+            rule_weight: Weight of the rules against the classifier (0-1)
+            rule_scale: Sharpness of the rule score softmax
+            max_examples: Training examples kept, oldest learned ones dropped first
+            retrain_every: LLM answers collected before the classifier is retrained
+        """
+        self.min_confidence = min_confidence
+        self.rule_weight = rule_weight
+        self.rule_scale = rule_scale
+        self.max_examples = max_examples
+        self.retrain_every = max(1, retrain_every)
+        
+        self.examples: List[Tuple[str, str]] = list(SEED_EXAMPLES)
+        self.classifier = TextClassifier(n_features=2 ** 18).fit(*zip(*self.examples))
+        
+        self._lock = threading.Lock()
+        self._untrained = 0
+        self._training = False
+        self.routed: Counter = Counter()
+        self.fallbacks = 0
+    
+    @staticmethod
+    def _text(task: str, question: Optional[str]) -> str:
+        return f"{task} {question}" if question else task
+    
+    def probabilities(self, task: str, question: Optional[str] = None, num_docs: int = 1) -> Dict[str, float]:
+        """Combined rule and classifier probability of each intent."""
+        text = self._text(task, question)
+        rules = _softmax(rule_scores(text, num_docs), self.rule_scale)
+        learned = self.classifier.predict_proba(text)
+        return {
+            intent: self.rule_weight * rules[intent] + (1 - self.rule_weight) * learned.get(intent, 0.0)
+            for intent in INTENTS
+        }
+    
+    def route(
+        self,
+        task: str,
+        question: Optional[str] = None,
+        num_docs: int = 1
+    ) -> Optional[IntentDecision]:
+        """
+        Route a task locally.
+        
+        Args:
+            task: Task description
+            question: Optional specific question
+            num_docs: Number of documents in the workflow
+        
+        Returns:
+            The decision, or None if the LLM should decide
+        """
+        probabilities = self.probabilities(task, question, num_docs)
+        intent = max(probabilities, key=probabilities.get)
+        confidence = probabilities[intent]
+        if confidence < self.min_confidence:
+            return None
+        
+        with self._lock:
+            self.routed[intent] += 1
+        return IntentDecision(intent, round(confidence, 4))
+    
+    def record_fallback(self, task: str, question: Optional[str], intent: Optional[str]):
+        """
+        Count an LLM-routed task and keep its answer as a training example.
+        
+        Every retrain_every answers, the classifier is retrained outside the
+        lock, so routing on other threads continues with the old model.
+        """
+        with self._lock:
+            self.fallbacks += 1
+            if intent not in INTENTS:
+                return
+            self.examples.append((self._text(task, question), intent))
+            if len(self.examples) > self.max_examples:
+                del self.examples[len(SEED_EXAMPLES)]
+            self._untrained += 1
+            if self._untrained < self.retrain_every or self._training:
+                return
+            self._untrained = 0
+            self._training = True
+            examples = list(self.examples)
+        
+        classifier = None
+        try:
+            classifier = TextClassifier(n_features=2 ** 18).fit(*zip(*examples))
+        finally:
+            with self._lock:
+                if classifier is not None:
+                    self.classifier = classifier
+                self._training = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get local routing counts and the local hit rate."""
+        with self._lock:
+            local = sum(self.routed.values())
+            total = local + self.fallbacks
+            return {
+                "routed_locally": local,
+                "llm_fallbacks": self.fallbacks,
+                "hit_rate": local / total if total else 0.0,
+                "by_intent": dict(self.routed)
+            }
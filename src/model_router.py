@@ -0,0 +1,131 @@
+"""
+Model Router Module
+
+Picks a Claude model per tool call: a fast model for short documents and
+brief summaries, the standard model for most work, and a stronger model
+for long documents and low-confidence extractions.
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
+
+FAST_MODEL = "claude-3-5-haiku-20241022"
+STANDARD_MODEL = "claude-sonnet-4-20250514"
+STRONG_MODEL = "claude-opus-4-20250514"
+
+TIERS = ("fast", "standard", "strong")
+
+# Lowest and highest tier of each tool; within the range, input size decides
+TOOL_TIERS = {
+    "extract_fields": ("fast", "strong"),
+    "summarize_document": ("fast", "standard"),
+    "answer_question": ("standard", "standard"),
+    "analyze_documents": ("standard", "standard"),
+    "route_task": ("fast", "fast")
+}
+
+
+class ModelRouter:
+    """
+    Model tiering for tool calls, with escalation.
+    
+    Inputs up to short_chars use a tool's lowest tier and inputs beyond
+    long_chars its highest, so short extractions and summaries go to the
+    fast model and long extractions to the strong one; brief summaries
+    always use the fast model. Extractions whose confidence falls below
+    escalation_threshold are retried one tier up.
+    
+    Example:
+        router = ModelRouter.from_env()
+        agent = IntelligentFormAgent(model_router=router)
+    """
+    
+    def __init__(
+        self,
+        fast_model: str = FAST_MODEL,
+        standard_model: str = STANDARD_MODEL,
+        strong_model: str = STRONG_MODEL,
+        short_chars: int = 4000,
+        long_chars: int = 40000,
+        escalation_threshold: float = 0.6,
+        tool_tiers: Optional[Dict[str, Tuple[str, str]]] = None
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            fast_model: Cheap, low-latency model
+            standard_model: Default model
+            strong_model: Model for long documents and escalations
+            short_chars: Inputs up to this length use the fast tier
+            long_chars: Inputs above this length use the strong tier
+            escalation_threshold: Extraction confidence below which the
+                extraction is retried on the next tier
+            tool_tiers: Overrides for TOOL_TIERS, as (lowest, highest) tier
+        """
+        self.models = {"fast": fast_model, "standard": standard_model, "strong": strong_model}
+        self.short_chars = short_chars
+        self.long_chars = long_chars
+        self.escalation_threshold = escalation_threshold
+        self.tool_tiers = {**TOOL_TIERS, **(tool_tiers or {})}
+        
+        self._lock = threading.Lock()
+        self._selections: Counter = Counter()
+        self.escalations = 0
+    
+    @classmethod
+    def from_env(cls, **kwargs) -> "ModelRouter":
+        """Build a router, taking models from FORM_AGENT_FAST_MODEL / _STANDARD_MODEL / _STRONG_MODEL."""
+        for tier in TIERS:
+            value = os.getenv(f"FORM_AGENT_{tier.upper()}_MODEL")
+            if value:
+                kwargs.setdefault(f"{tier}_model", value)
+        return cls(**kwargs)
+    
+    def _tier(self, tool: str, chars: int, style: Optional[str]) -> str:
+        lowest, highest = self.tool_tiers.get(tool, ("standard", "standard"))
+        if style == "brief" or chars <= self.short_chars:
+            tier = "fast"
+        elif chars > self.long_chars:
+            tier = "strong"
+        else:
+            tier = "standard"
+        return TIERS[min(max(TIERS.index(tier), TIERS.index(lowest)), TIERS.index(highest))]
+    
+    def select(self, tool: str, chars: int = 0, style: Optional[str] = None) -> str:
+        """
+        Model for one tool call.
+        
+        Args:
+            tool: Tool name (e.g. "extract_fields")
+            chars: Input size in characters
+            style: Summary style, for summarize_document
+        
+        Returns:
+            Model ID
+        """
+        model = self.models[self._tier(tool, chars, style)]
+        with self._lock:
+            self._selections[model] += 1
+        return model
+    
+    def should_escalate(self, confidence: float) -> bool:
+        return confidence < self.escalation_threshold
+    
+    def escalate(self, model: str) -> Optional[str]:
+        """The next tier's model after model, or None if it is the strongest."""
+        tiers = [t for t in TIERS if self.models[t] == model]
+        if not tiers or tiers[-1] == "strong":
+            return None
+        stronger = self.models[TIERS[TIERS.index(tiers[-1]) + 1]]
+        with self._lock:
+            self.escalations += 1
+            self._selections[stronger] += 1
+        return stronger
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get calls routed to each model and the number of escalations."""
+        with self._lock:
+            return {"selections": dict(self._selections), "escalations": self.escalations}
@@ -0,0 +1,172 @@
+"""
+Numeric Statistics Module
+
+Exact, locally computed statistics over numeric fields extracted from a
+set of forms, so cross-document analysis does not rely on LLM arithmetic.
+"""
+
+import re
+import math
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+# Amounts such as "$1,234.56", "(1,200)", "-€5", "12.5%", "3000 USD"
+NUMBER_PATTERN = re.compile(
+    r"^\(?\s*([-+])?\s*(?:[$€£¥]|usd|eur|gbp)?\s*([-+])?\s*"
+    r"(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(%|usd|eur|gbp)?\s*\)?$",
+    re.IGNORECASE
+)
+
+# Last words of field names marking identifiers that look numeric but are
+# not quantities ("Account Number", "Zip Code"; not "Account Balance")
+IDENTIFIER_WORDS = {
+    "id", "zip", "code", "phone", "fax", "ssn", "ein", "tin", "year", "no", "number"
+}
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """
+    Parse a numeric field value.
+    
+    Accepts numbers and amount strings with currency symbols, thousands
+    separators, percent signs and accounting-style negatives.
+    
+    Returns:
+        The number, or None if the value is not a plain amount
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if not isinstance(value, str):
+        return None
+    
+    text = value.strip()
+    match = NUMBER_PATTERN.match(text)
+    if not match:
+        return None
+    
+    number = float(match.group(3).replace(",", "") + (match.group(4) or ""))
+    negative = "-" in (match.group(1) or "", match.group(2) or "")
+    if text.startswith("(") and text.endswith(")"):
+        negative = True
+    return -number if negative else number
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", str(name).lower()))
+
+
+def _is_identifier(name: str) -> bool:
+    words = _normalize_name(name).split()
+    return bool(words) and words[-1] in IDENTIFIER_WORDS
+
+
+def collect_numeric_fields(
+    extracted_fields_list: List[Dict[str, Any]],
+    min_documents: int = 2
+) -> Dict[str, List[Optional[float]]]:
+    """
+    Align numeric fields across documents.
+    
+    Field names are matched case- and punctuation-insensitively. A field
+    is kept when it parses as a number in at least min_documents documents
+    and is not an identifier (IDs, phone numbers, policy numbers, ...).
+    
+    Args:
+        extracted_fields_list: Extracted fields for each document
+        min_documents: Minimum documents a field must be numeric in
+    
+    Returns:
+        Display name to one value per document (None where missing)
+    """
+    columns: Dict[str, Dict[str, Any]] = {}
+    for position, fields in enumerate(extracted_fields_list):
+        for name, value in (fields or {}).items():
+            number = parse_number(value)
+            if number is None or _is_identifier(name):
+                continue
+            column = columns.setdefault(_normalize_name(name), {"name": name, "values": {}})
+            column["values"].setdefault(position, number)
+    
+    return {
+        column["name"]: [column["values"].get(i) for i in range(len(extracted_fields_list))]
+        for column in columns.values()
+        if len(column["values"]) >= min_documents
+    }
+
+
+def _matrix_stats(matrix) -> Dict[str, Any]:
+    """Per-column statistics for a documents x fields matrix with NaN gaps."""
+    percentiles = np.nanpercentile(matrix, [25, 50, 75, 90], axis=0)
+    return {
+        "total": np.nansum(matrix, axis=0),
+        "mean": np.nanmean(matrix, axis=0),
+        "median": percentiles[1],
+        "min": np.nanmin(matrix, axis=0),
+        "max": np.nanmax(matrix, axis=0),
+        "std": np.nanstd(matrix, axis=0),
+        "p25": percentiles[0],
+        "p75": percentiles[2],
+        "p90": percentiles[3]
+    }
+
+
+def compute_statistics(
+    extracted_fields_list: List[Dict[str, Any]],
+    document_names: Optional[List[str]] = None,
+    min_documents: int = 2
+) -> Dict[str, Any]:
+    """
+    Compute totals, means, percentiles and outliers for numeric fields.
+    
+    Every field is computed at once with NumPy. Outliers use the 1.5 x IQR
+    rule for fields present in at least four documents.
+    
+    Args:
+        extracted_fields_list: Extracted fields for each document
+        document_names: Names used to label min/max and outliers
+        min_documents: Minimum documents a field must be numeric in
+    
+    Returns:
+        {"document_count": n, "fields": {name: statistics}}
+    """
+    names = document_names or [f"document {i + 1}" for i in range(len(extracted_fields_list))]
+    columns = collect_numeric_fields(extracted_fields_list, min_documents=min_documents)
+    
+    field_names = list(columns)
+    per_field = {}
+    if field_names:
+        matrix = np.array(
+            [[np.nan if v is None else v for v in columns[name]] for name in field_names],
+            dtype=float
+        ).T
+        computed = _matrix_stats(matrix)
+        per_field = {
+            name: {key: float(values[j]) for key, values in computed.items()}
+            for j, name in enumerate(field_names)
+        }
+    
+    statistics = {}
+    for name in field_names:
+        values = columns[name]
+        present = [(names[i], v) for i, v in enumerate(values) if v is not None]
+        stats = per_field[name]
+        
+        outliers = []
+        if len(present) >= 4:
+            spread = stats["p75"] - stats["p25"]
+            low, high = stats["p25"] - 1.5 * spread, stats["p75"] + 1.5 * spread
+            outliers = [{"document": doc, "value": v} for doc, v in present if v < low or v > high]
+        
+        statistics[name] = {
+            "count": len(present),
+            "missing": len(values) - len(present),
+            **{key: round(value, 4) for key, value in stats.items()},
+            "min_document": min(present, key=lambda p: p[1])[0],
+            "max_document": max(present, key=lambda p: p[1])[0],
+            "outliers": outliers
+        }
+    
+    return {"document_count": len(extracted_fields_list), "fields": statistics}
@@ -0,0 +1,340 @@
+"""
+OCR Engine Module
+
+Runs Tesseract OCR behind a pool of warm worker processes.
+"""
+
+import time
+import threading
+from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+@dataclass
+class OCRResult:
+    """Text, confidence and word boxes from a single recognition pass."""
+    text: str
+    confidence: float
+    words: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def layout_words(words: List[Dict[str, Any]]) -> str:
+    """
+    Rebuild text from recognized words.
+    
+    Words on the same line are joined with spaces; lines are separated by
+    newlines and paragraphs by a blank line, matching image_to_string output.
+    
+    Args:
+        words: Word dicts with "text", "block", "paragraph" and "line" keys
+    
+    Returns:
+        Laid-out text
+    """
+    lines = []
+    current_key = None
+    current_paragraph = None
+    for word in words:
+        paragraph = (word["block"], word["paragraph"])
+        key = paragraph + (word["line"],)
+        if key != current_key:
+            if current_paragraph is not None and paragraph != current_paragraph:
+                lines.append("")
+            lines.append(word["text"])
+            current_key = key
+            current_paragraph = paragraph
+        else:
+            lines[-1] += " " + word["text"]
+    return "\n".join(lines)
+
+
+def average_confidence(words: List[Dict[str, Any]]) -> float:
+    """Mean confidence over words Tesseract actually scored."""
+    confidences = [w["confidence"] for w in words if w["confidence"] > 0]
+    return sum(confidences) / len(confidences) if confidences else 0
+
+
+class _Recognizer:
+    """
+    Wraps a single Tesseract backend.
+    
+    Prefers tesserocr, which keeps one Tesseract instance (and its language
+    data) loaded for the lifetime of the process. Falls back to pytesseract,
+    which shells out to the tesseract binary per call.
+    """
+    
+    def __init__(self, language: str):
+        self.language = language
+        self._api = None
+        self._pytesseract = None
+        
+        try:
+            import tesserocr
+            self._api = tesserocr.PyTessBaseAPI(lang=language)
+        except ImportError:
+            try:
+                import pytesseract
+                self._pytesseract = pytesseract
+            except ImportError:
+                raise ImportError("tesserocr or pytesseract required for OCR")
+    
+    @property
+    def backend(self) -> str:
+        return "tesserocr" if self._api is not None else "pytesseract"
+    
+    def recognize(self, image) -> str:
+        """OCR a PIL image and return its text."""
+        if self._api is not None:
+            self._api.SetImage(image)
+            return self._api.GetUTF8Text()
+        return self._pytesseract.image_to_string(image, lang=self.language)
+    
+    def recognize_detailed(self, image) -> OCRResult:
+        """
+        OCR a PIL image once and return text, confidence and word boxes.
+        
+        Text layout is reconstructed from the word-level results rather than
+        running a second recognition pass.
+        """
+        words = self._recognize_words(image)
+        return OCRResult(
+            text=layout_words(words),
+            confidence=average_confidence(words),
+            words=words
+        )
+    
+    def _recognize_words(self, image) -> List[Dict[str, Any]]:
+        if self._api is not None:
+            return self._tesserocr_words(image)
+        
+        data = self._pytesseract.image_to_data(
+            image,
+            lang=self.language,
+            output_type=self._pytesseract.Output.DICT
+        )
+        words = []
+        for i, text in enumerate(data["text"]):
+            if not str(text).strip():
+                continue
+            words.append({
+                "text": str(text).strip(),
+                "confidence": float(data["conf"][i]),
+                "left": int(data["left"][i]),
+                "top": int(data["top"][i]),
+                "width": int(data["width"][i]),
+                "height": int(data["height"][i]),
+                "block": int(data["block_num"][i]),
+                "paragraph": int(data["par_num"][i]),
+                "line": int(data["line_num"][i])
+            })
+        return words
+    
+    def _tesserocr_words(self, image) -> List[Dict[str, Any]]:
+        from tesserocr import RIL, iterate_level
+        
+        self._api.SetImage(image)
+        self._api.Recognize()
+        
+        words = []
+        block = paragraph = line = 0
+        for item in iterate_level(self._api.GetIterator(), RIL.WORD):
+            if item.IsAtBeginningOf(RIL.BLOCK):
+                block += 1
+            if item.IsAtBeginningOf(RIL.PARA):
+                paragraph += 1
+            if item.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            text = (item.GetUTF8Text(RIL.WORD) or "").strip()
+            box = item.BoundingBox(RIL.WORD)
+            if not text or box is None:
+                continue
+            left, top, right, bottom = box
+            words.append({
+                "text": text,
+                "confidence": float(item.Confidence(RIL.WORD)),
+                "left": left,
+                "top": top,
+                "width": right - left,
+                "height": bottom - top,
+                "block": block,
+                "paragraph": paragraph,
+                "line": line
+            })
+        return words
+
+
+# Per-process recognizer, created once by the pool initializer
+_worker_recognizer: Optional[_Recognizer] = None
+
+
+def _init_worker(language: str):
+    """Load the OCR backend once when a worker process starts."""
+    global _worker_recognizer
+    _worker_recognizer = _Recognizer(language)
+
+
+def _recognize_in_worker(image, detailed: bool = False):
+    """Run OCR on the worker's warm recognizer."""
+    if detailed:
+        return _worker_recognizer.recognize_detailed(image)
+    return _worker_recognizer.recognize(image)
+
+
+def ocr_available() -> bool:
+    """Check whether any OCR backend is importable."""
+    for module in ("tesserocr", "pytesseract"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+class OCREngine:
+    """
+    Dispatches OCR jobs to a pool of persistent workers.
+    
+    Each worker loads its Tesseract backend once and reuses it for every
+    page it receives. With workers=0 OCR runs inline in the calling process
+    on a single warm recognizer.
+    
+    Example:
+        engine = OCREngine(language="eng", workers=4)
+        texts = engine.map(page_images)
+        print(engine.get_stats())
+        engine.shutdown()
+    """
+    
+    def __init__(self, language: str = "eng", workers: int = 0):
+        """
+        Initialize the engine.
+        
+        Args:
+            language: Tesseract language code
+            workers: Worker processes (0 runs OCR inline)
+        """
+        if not ocr_available():
+            raise ImportError("tesserocr or pytesseract required for OCR")
+        
+        self.language = language
+        self.workers = max(0, workers)
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inline: Optional[_Recognizer] = None
+        self._inline_lock = threading.Lock()
+        
+        # Statistics
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._started_at: Optional[float] = None
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.language,)
+            )
+        return self._executor
+    
+    def _record_submit(self) -> float:
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._submitted += 1
+            if self._started_at is None:
+                self._started_at = now
+        return now
+    
+    def _record_done(self, submitted_at: float, failed: bool):
+        with self._stats_lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._total_latency += time.perf_counter() - submitted_at
+    
+    def submit(self, image, detailed: bool = False) -> Future:
+        """
+        Queue one image for OCR.
+        
+        Args:
+            image: PIL image
+            detailed: Return an OCRResult with confidence and word boxes
+        
+        Returns:
+            Future resolving to the recognized text (or OCRResult)
+        """
+        submitted_at = self._record_submit()
+        
+        if self.workers == 0:
+            future = Future()
+            try:
+                with self._inline_lock:
+                    if self._inline is None:
+                        self._inline = _Recognizer(self.language)
+                    if detailed:
+                        result = self._inline.recognize_detailed(image)
+                    else:
+                        result = self._inline.recognize(image)
+                self._record_done(submitted_at, failed=False)
+                future.set_result(result)
+            except Exception as e:
+                self._record_done(submitted_at, failed=True)
+                future.set_exception(e)
+            return future
+        
+        future = self._get_executor().submit(_recognize_in_worker, image, detailed)
+        future.add_done_callback(
+            lambda f: self._record_done(submitted_at, failed=f.exception() is not None)
+        )
+        return future
+    
+    def recognize(self, image) -> str:
+        """OCR a single image and wait for the result."""
+        return self.submit(image).result()
+    
+    def recognize_detailed(self, image) -> OCRResult:
+        """OCR a single image in one pass, returning text, confidence and word boxes."""
+        return self.submit(image, detailed=True).result()
+    
+    def map(self, images: List[Any]) -> List[str]:
+        """
+        OCR several images concurrently.
+        
+        Returns:
+            Recognized text for each image, in input order
+        """
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get throughput and queue statistics."""
+        with self._stats_lock:
+            finished = self._completed + self._failed
+            elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+            return {
+                "workers": self.workers,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "queue_depth": self._submitted - finished,
+                "avg_latency_seconds": self._total_latency / finished if finished else 0.0,
+                "pages_per_second": self._completed / elapsed if elapsed > 0 else 0.0
+            }
+    
+    def shutdown(self, wait: bool = True):
+        """Stop worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.shutdown()
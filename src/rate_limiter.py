@@ -0,0 +1,446 @@
+"""
+Rate Limiter Module
+
+Client-side throttling for LLM API calls: token buckets for requests and
+tokens per minute, adaptive (AIMD) concurrency, and jittered exponential
+retry on rate-limit and overload errors.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# HTTP statuses worth retrying: rate limited, server errors, overloaded
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+
+# Statuses that mean we are sending too fast and should back off concurrency
+THROTTLE_STATUS = {429, 529}
+
+# SDK errors without a status code that are safe to retry
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status code carried by an API error, if any."""
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an API error is transient."""
+    return error_status(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from an error's retry-after header, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """
+    Rough token cost of a messages request, for budgeting before the call.
+    
+    Counts about four characters per input token plus the full max_tokens
+    output allowance; the estimate is corrected from actual usage afterwards.
+    """
+    input_chars = len(str(params.get("system", ""))) + len(str(params.get("messages", "")))
+    input_chars += len(str(params.get("tools", "")))
+    return input_chars // 4 + params.get("max_tokens", 0)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+    
+    reserve() deducts immediately, letting the balance go negative, and
+    returns how long the caller must wait before using the reservation.
+    This serves sync and async callers alike and keeps requests in FIFO
+    order.
+    """
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket.
+        
+        Args:
+            per_minute: Refill rate
+            capacity: Maximum burst (defaults to one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount from the bucket.
+        
+        Returns:
+            Seconds to wait before the reserved amount is available
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+    
+    def adjust(self, delta: float):
+        """Return (positive) or charge (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + delta)
+    
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight requests.
+    
+    Each success raises the limit by 1/limit (about +1 per round trip at
+    full load); each throttling error halves it. The limit settles just
+    below the point where the API starts rejecting requests.
+    
+    Waiting coroutines are queued in FIFO order and handed a slot by
+    release() on their own event loop, so they never poll.
+    """
+    
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64):
+        """
+        Initialize the limiter.
+        
+        Args:
+            initial: Starting concurrency limit
+            min_limit: Floor for the limit
+            max_limit: Ceiling for the limit
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+    
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free."""
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+    
+    def acquire(self):
+        """Block until a slot is free, then take it."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+    
+    async def aacquire(self):
+        """Wait for a free slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._async_waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+        
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+                elif waiter[1].done() and not waiter[1].cancelled():
+                    # Granted a slot just as the waiter was cancelled
+                    self._free_slot()
+            raise
+    
+    def _free_slot(self):
+        """Return a slot without adapting the limit (caller holds the condition)."""
+        self.in_flight -= 1
+        self._wake_waiters()
+    
+    def _wake_waiters(self):
+        """Hand free slots to queued coroutines, then wake blocked threads (caller holds the condition)."""
+        while self._async_waiters and self.in_flight < int(self.limit):
+            loop, future = self._async_waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, future)
+            except RuntimeError:
+                # The waiter's event loop has closed
+                self.in_flight -= 1
+        self._condition.notify_all()
+    
+    def _grant(self, future: asyncio.Future):
+        """Complete a waiter's future on its event loop, or return the slot if it gave up."""
+        if future.cancelled():
+            with self._condition:
+                self._free_slot()
+        else:
+            future.set_result(None)
+    
+    def release(self, throttled: bool = False):
+        """
+        Free a slot and adapt the limit.
+        
+        Args:
+            throttled: The request was rejected for rate or load reasons
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake_waiters()
+
+
+class RequestSlots:
+    """
+    Fixed cap on in-flight requests, shared by threads and coroutines.
+    
+    Threads and coroutines on any event loop count against the same
+    limit: a fixed-size AdaptiveConcurrency keeps one counter under one
+    lock and hands slots to waiting coroutines on their own loop.
+    
+    Example:
+        slots = RequestSlots(4)
+        with slots:
+            ...
+        async with slots:
+            ...
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._slots = AdaptiveConcurrency(self.limit, min_limit=self.limit, max_limit=self.limit)
+    
+    @property
+    def in_flight(self) -> int:
+        return self._slots.in_flight
+    
+    def __enter__(self) -> "RequestSlots":
+        self._slots.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._slots.release()
+    
+    async def __aenter__(self) -> "RequestSlots":
+        await self._slots.aacquire()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self._slots.release()
+
+
+class RateLimiter:
+    """
+    Shared throttle and retry policy for LLM API calls.
+    
+    One limiter should be shared by every worker hitting the same account,
+    so that requests/min, tokens/min and concurrency are budgeted together.
+    
+    Example:
+        limiter = RateLimiter(requests_per_minute=50, tokens_per_minute=40000)
+        client = ClaudeClient(rate_limiter=limiter)
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        """
+        Initialize the limiter.
+        
+        Args:
+            requests_per_minute: Request budget (None for unlimited)
+            tokens_per_minute: Input plus output token budget (None for unlimited)
+            max_concurrency: Ceiling for adaptive concurrency
+            initial_concurrency: Starting concurrency
+            max_retries: Retries of a transient error before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Cap on a single backoff delay
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, max_limit=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0, "wait_seconds": 0.0}
+    
+    @classmethod
+    def from_env(cls, **kwargs) -> "RateLimiter":
+        """Build a limiter from FORM_AGENT_RPM / FORM_AGENT_TPM when set."""
+        rpm = os.getenv("FORM_AGENT_RPM")
+        tpm = os.getenv("FORM_AGENT_TPM")
+        kwargs.setdefault("requests_per_minute", float(rpm) if rpm else None)
+        kwargs.setdefault("tokens_per_minute", float(tpm) if tpm else None)
+        return cls(**kwargs)
+    
+    def _count(self, name: str, amount: float = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def _reserve(self, tokens: int) -> float:
+        """Reserve budget for one request; returns the wait required."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        self._count("requests")
+        self._count("wait_seconds", wait)
+        return wait
+    
+    def record_usage(self, estimated: int, actual: int):
+        """Correct the token bucket once a response reports real usage."""
+        if self.tokens is not None:
+            self.tokens.adjust(min(estimated, self.tokens.capacity) - actual)
+    
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        Delay before retry number attempt (0-based).
+        
+        Uses "full jitter": a uniform draw up to the exponential cap, so
+        workers throttled together do not retry in lockstep. A retry-after
+        header, when present, sets the minimum.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hinted = retry_after(error) if error is not None else None
+        return max(delay, hinted or 0.0)
+    
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        throttled = error_status(error) in THROTTLE_STATUS
+        if throttled:
+            self._count("throttled")
+        if attempt < self.max_retries and is_retryable(error):
+            self._count("retries")
+            return True
+        self._count("failed")
+        return False
+    
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        """
+        Hold budget and a concurrency slot for one request, without retrying.
+        
+        Used for streaming calls, which cannot be replayed once output has
+        been yielded.
+        """
+        time.sleep(self._reserve(tokens))
+        self.concurrency.acquire()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = error_status(e) in THROTTLE_STATUS
+            if throttled:
+                self._count("throttled")
+            raise
+        finally:
+            self.concurrency.release(throttled=throttled)
+    
+    def call(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], int]] = None
+    ) -> Any:
+        """
+        Run fn under the rate limits, retrying transient errors.
+        
+        Args:
+            fn: Zero-argument function making the API request
+            tokens: Estimated token cost of the request
+            usage: Maps the result to its actual token count
+        
+        Returns:
+            fn's result
+        """
+        attempt = 0
+        while True:
+            time.sleep(self._reserve(tokens))
+            self.concurrency.acquire()
+            error = None
+            try:
+                result = fn()
+            except Exception as e:
+                error = e
+            finally:
+                # Also runs on cancellation and KeyboardInterrupt, so no slot leaks
+                self.concurrency.release(throttled=error is not None and error_status(error) in THROTTLE_STATUS)
+            
+            if error is None:
+                if usage is not None:
+                    self.record_usage(tokens, usage(result))
+                return result
+            if not self._should_retry(error, attempt):
+                raise error
+            time.sleep(self.backoff(attempt, error))
+            attempt += 1
+    
+    async def acall(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], int]] = None
+    ) -> Any:
+        """Async variant of call; fn returns an awaitable."""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve(tokens))
+            await self.concurrency.aacquire()
+            error = None
+            try:
+                result = await fn()
+            except Exception as e:
+                error = e
+            finally:
+                # Also runs on cancellation and KeyboardInterrupt, so no slot leaks
+                self.concurrency.release(throttled=error is not None and error_status(error) in THROTTLE_STATUS)
+            
+            if error is None:
+                if usage is not None:
+                    self.record_usage(tokens, usage(result))
+                return result
+            if not self._should_retry(error, attempt):
+                raise error
+            await asyncio.sleep(self.backoff(attempt, error))
+            attempt += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request, retry and throttling counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = int(self.concurrency.limit)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
@@ -0,0 +1,122 @@
+"""
+Retrieval Module
+
+BM25 ranking over document passages, so questions can be answered from
+the few passages that matter instead of the whole document.
+"""
+
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+
+from src.document_processor import ExtractedDocument
+from src.chunking import chunk_document
+
+# Common words that carry no retrieval signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "has", "have", "how", "in", "is", "it", "its", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "which", "who", "why", "with"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms, without stopwords."""
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a document's passages.
+    
+    Term frequencies are computed once when the index is built and kept in
+    to_dict(), so a stored index is searchable without re-tokenizing.
+    
+    Example:
+        index = BM25Index.from_document(document)
+        for score, passage in index.search("total amount due", k=3):
+            print(passage["pages"], passage["text"])
+    """
+    
+    def __init__(
+        self,
+        passages: List[Dict[str, Any]],
+        term_freqs: List[Dict[str, int]],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        """
+        Initialize the index.
+        
+        Args:
+            passages: Passage dicts with "index", "text" and "pages"
+            term_freqs: Term counts for each passage
+            k1: Term frequency saturation
+            b: Length normalization strength
+        """
+        self.passages = passages
+        self.term_freqs = term_freqs
+        self.k1 = k1
+        self.b = b
+        
+        self.lengths = [sum(tf.values()) for tf in term_freqs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        doc_freqs = Counter(term for tf in term_freqs for term in tf)
+        n = len(passages)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+    
+    @classmethod
+    def from_document(cls, document: ExtractedDocument, passage_chars: int = 1200) -> "BM25Index":
+        """
+        Build an index from a document's paragraphs and tables.
+        
+        Args:
+            document: Document to index
+            passage_chars: Maximum characters per passage
+        """
+        passages = [
+            {"index": chunk.index, "text": chunk.text, "pages": chunk.pages}
+            for chunk in chunk_document(document, max_chars=passage_chars)
+        ]
+        return cls(passages, [dict(Counter(tokenize(p["text"]))) for p in passages])
+    
+    def __len__(self) -> int:
+        return len(self.passages)
+    
+    def score(self, query_terms: List[str], position: int) -> float:
+        """BM25 score of one passage for the query terms."""
+        tf = self.term_freqs[position]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / (self.avg_length or 1))
+        total = 0.0
+        for term in query_terms:
+            freq = tf.get(term, 0)
+            if freq:
+                total += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+        return total
+    
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Rank passages for a query.
+        
+        Args:
+            query: Natural language query
+            k: Number of passages to return
+        
+        Returns:
+            (score, passage) pairs with positive scores, best first
+        """
+        terms = tokenize(query)
+        scored = [(self.score(terms, i), i) for i in range(len(self.passages))]
+        best = sorted((pair for pair in scored if pair[0] > 0), key=lambda p: (-p[0], p[1]))[:k]
+        return [(score, self.passages[i]) for score, i in best]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"passages": self.passages, "term_freqs": self.term_freqs, "k1": self.k1, "b": self.b}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        return cls(data["passages"], data["term_freqs"], data.get("k1", 1.5), data.get("b", 0.75))
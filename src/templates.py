@@ -0,0 +1,366 @@
+"""
+Templates Module
+
+Learns label-to-field mappings for repetitive form layouts from LLM
+extractions, so later forms with the same layout are extracted locally.
+"""
+
+import os
+import re
+import json
+import math
+import tempfile
+import threading
+from pathlib import Path
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Optional, Tuple
+
+from src.document_processor import ExtractedDocument
+from src.field_lookup import field_similarity
+from src.numeric_stats import parse_number
+from src.tools import ExtractionResult, FieldExtractionTool
+
+# "Label: value" lines; labels start with a letter and stay short
+LABEL_LINE = re.compile(r"^[ \t]*([A-Za-z][^:\n]{0,59}?)[ \t]*:[ \t]*(\S[^\n]*?)[ \t]*$", re.MULTILINE)
+
+# Dates such as "01/25/2024", "1-5-24" or "2024-01-25"
+DATE_PATTERN = re.compile(r"^(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2})$")
+
+
+def default_template_path() -> str:
+    """Default template file location (override with FORM_AGENT_CACHE_DIR)."""
+    cache_dir = os.getenv("FORM_AGENT_CACHE_DIR", "~/.cache/intelligent_form_agent")
+    return str(Path(cache_dir).expanduser() / "templates.json")
+
+
+def template_key(form_type: str) -> str:
+    """Library key for a form type, ignoring case and spacing."""
+    return " ".join(form_type.lower().split())
+
+
+def label_values(text: str) -> Dict[str, str]:
+    """
+    "Label: value" pairs in a document, keyed by normalized label.
+    
+    Repeated labels are numbered by occurrence ("date", "date #2"), so
+    each keeps its position in the layout.
+    """
+    pairs = {}
+    seen: Counter = Counter()
+    for match in LABEL_LINE.finditer(text):
+        label = " ".join(match.group(1).lower().split())
+        seen[label] += 1
+        pairs[label if seen[label] == 1 else f"{label} #{seen[label]}"] = match.group(2)
+    return pairs
+
+
+def value_kind(value: str) -> str:
+    """Classify a raw value as "date", "number" or "text" for validation."""
+    if DATE_PATTERN.match(value.strip()):
+        return "date"
+    if parse_number(value) is not None:
+        return "number"
+    return "text"
+
+
+def _same_value(extracted: Any, raw: str) -> bool:
+    """Check whether an LLM-extracted value is the raw label value, possibly normalized."""
+    if extracted is None or isinstance(extracted, (bool, dict, list)):
+        return False
+    if " ".join(str(extracted).lower().split()) == " ".join(raw.lower().split()):
+        return True
+    a, b = parse_number(extracted), parse_number(raw)
+    return a is not None and b is not None and math.isclose(a, b)
+
+
+@dataclass
+class FormTemplate:
+    """
+    Label-to-field mappings learned for one form type.
+    
+    labels counts the samples each label appeared in; extracted counts
+    the samples the LLM returned each field name in; mappings records,
+    per label, how often each field name was extracted from it, the kind
+    of value it holds and whether the LLM returned it as a number.
+    """
+    form_type: str
+    samples: int = 0
+    confidence: float = 0.0
+    field_coverage: float = 0.0
+    labels: Dict[str, int] = field(default_factory=dict)
+    extracted: Dict[str, int] = field(default_factory=dict)
+    mappings: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    
+    def learn(self, pairs: Dict[str, str], fields: Dict[str, Any], confidence: float):
+        """
+        Add one LLM extraction of a document with these label values.
+        
+        Each field is attributed to the label holding its value; when
+        several labels hold it, the one whose name best matches the field
+        wins, and fields that stay ambiguous are skipped.
+        """
+        explained = 0
+        for name, value in fields.items():
+            self.extracted[name] = self.extracted.get(name, 0) + 1
+            candidates = sorted(
+                ((field_similarity(label.split(" #")[0], name), label)
+                 for label, raw in pairs.items() if _same_value(value, raw)),
+                reverse=True
+            )
+            if not candidates or (len(candidates) > 1 and candidates[0][0] == candidates[1][0]):
+                continue
+            
+            label = candidates[0][1]
+            kind = value_kind(pairs[label])
+            numeric = isinstance(value, (int, float))
+            entry = self.mappings.setdefault(label, {"fields": {}, "kind": kind, "numeric": numeric})
+            entry["fields"][name] = entry["fields"].get(name, 0) + 1
+            if entry["kind"] != kind:
+                entry["kind"] = "text"
+            entry["numeric"] = entry["numeric"] and numeric
+            explained += 1
+        
+        for label in pairs:
+            self.labels[label] = self.labels.get(label, 0) + 1
+        
+        n = self.samples
+        self.field_coverage = (self.field_coverage * n + explained / max(len(fields), 1)) / (n + 1)
+        self.confidence = (self.confidence * n + confidence) / (n + 1)
+        self.samples = n + 1
+    
+    def rules(self, support: float) -> Dict[str, Tuple[str, str, bool]]:
+        """
+        Label to (field name, kind, numeric) for consistent mappings.
+        
+        A mapping is kept when its field was extracted from the label in at
+        least support of the samples; each field keeps its best label.
+        """
+        required = max(1, math.ceil(support * self.samples))
+        best: Dict[str, Tuple[int, str, str, bool]] = {}
+        for label, entry in self.mappings.items():
+            name, count = max(entry["fields"].items(), key=lambda item: item[1])
+            if count >= required and count > best.get(name, (0,))[0]:
+                best[name] = (count, label, entry["kind"], entry["numeric"])
+        return {label: (name, kind, numeric) for name, (_, label, kind, numeric) in best.items()}
+    
+    def expected_fields(self, support: float) -> set:
+        """Field names the LLM returned in at least support of the samples."""
+        required = max(1, math.ceil(support * self.samples))
+        return {name for name, count in self.extracted.items() if count >= required}
+    
+    def known_labels(self, support: float) -> set:
+        """Labels seen in at least support of the samples."""
+        required = max(1, math.ceil(support * self.samples))
+        return {label for label, count in self.labels.items() if count >= required}
+    
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class TemplateLibrary:
+    """
+    Learned form templates, with optional JSON persistence.
+    
+    After min_samples confident LLM extractions of a form type, documents
+    whose labels match the learned layout are extracted locally. A
+    document falls back to the LLM when it has labels the template has not
+    seen, is missing too many template labels, lacks a field the LLM
+    consistently returned for the type, or a value fails its kind check
+    (e.g. a date label holding free text).
+    
+    Example:
+        library = TemplateLibrary(default_template_path())
+        agent = IntelligentFormAgent(template_library=library)
+    """
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        version: str = FieldExtractionTool.PROMPT_VERSION,
+        min_samples: int = 2,
+        min_confidence: float = 0.7,
+        min_field_coverage: float = 0.8,
+        min_coverage: float = 0.9,
+        support: float = 0.8,
+        min_rules: int = 3
+    ):
+        """
+        Initialize the library.
+        
+        Args:
+            path: JSON file to load from and save to (None keeps memory only)
+            version: Extraction prompt version; a file saved under another
+                version is ignored, since field names may have changed
+            min_samples: LLM extractions of a form type before its template is used
+            min_confidence: Minimum extraction confidence to learn from
+            min_field_coverage: Minimum share of LLM fields a template must
+                explain, on average, to be used
+            min_coverage: Minimum share of template labels a document must
+                contain, and of document labels the template must know
+            support: Share of samples a mapping or label must appear in
+            min_rules: Minimum field mappings for a template to be used
+        """
+        self.path = str(Path(path).expanduser()) if path else None
+        self.version = version
+        self.min_samples = min_samples
+        self.min_confidence = min_confidence
+        self.min_field_coverage = min_field_coverage
+        self.min_coverage = min_coverage
+        self.support = support
+        self.min_rules = min_rules
+        
+        self.templates: Dict[str, FormTemplate] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") != self.version:
+            return
+        self.templates = {key: FormTemplate(**t) for key, t in data.get("templates", {}).items()}
+    
+    def _save(self):
+        """Write the templates atomically (caller holds the lock)."""
+        if not self.path:
+            return
+        directory = Path(self.path).parent
+        directory.mkdir(parents=True, exist_ok=True)
+        data = {"version": self.version, "templates": {k: t.to_dict() for k, t in self.templates.items()}}
+        
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    
+    def learn(self, document: ExtractedDocument, result: ExtractionResult):
+        """
+        Learn from an LLM extraction of a document.
+        
+        Extractions without a form type or fields, or below min_confidence,
+        are ignored.
+        """
+        if not result.form_type or not result.fields or result.confidence < self.min_confidence:
+            return
+        pairs = label_values(document.raw_text)
+        if not pairs:
+            return
+        
+        key = template_key(result.form_type)
+        with self._lock:
+            template = self.templates.setdefault(key, FormTemplate(form_type=result.form_type))
+            template.learn(pairs, result.fields, result.confidence)
+            self._save()
+    
+    def _ready(self, template: FormTemplate) -> bool:
+        return (template.samples >= self.min_samples
+                and template.field_coverage >= self.min_field_coverage)
+    
+    def _apply(
+        self,
+        template: FormTemplate,
+        pairs: Dict[str, str]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Extract fields with a template, or None if the document does not fit it."""
+        rules = template.rules(self.support)
+        if len(rules) < self.min_rules:
+            return None
+        
+        known = template.known_labels(self.support)
+        found = [label for label in rules if label in pairs]
+        coverage = len(found) / len(rules)
+        explained = sum(1 for label in pairs if label in known) / len(pairs)
+        if coverage < self.min_coverage or explained < self.min_coverage:
+            return None
+        
+        # Local results must not silently drop a field the LLM would return
+        produced = {rules[label][0] for label in found}
+        if not template.expected_fields(self.support) <= produced:
+            return None
+        
+        fields = {}
+        for label in found:
+            name, kind, numeric = rules[label]
+            raw = pairs[label]
+            if kind != "text" and value_kind(raw) != kind:
+                return None
+            fields[name] = parse_number(raw) if numeric else raw
+        return fields, coverage
+    
+    def match(
+        self,
+        document: ExtractedDocument,
+        form_type: Optional[str] = None
+    ) -> Optional[ExtractionResult]:
+        """
+        Extract a document locally with the best-fitting learned template.
+        
+        Args:
+            document: Document to extract
+            form_type: Predicted form type; only its template is tried
+        
+        Returns:
+            ExtractionResult with chunks=0 (no LLM calls), or None when no
+            template fits and the LLM should be used
+        """
+        pairs = label_values(document.raw_text)
+        best = None
+        if pairs:
+            with self._lock:
+                templates = [
+                    (k, t) for k, t in self.templates.items()
+                    if self._ready(t) and (form_type is None or k == template_key(form_type))
+                ]
+                for key, template in templates:
+                    applied = self._apply(template, pairs)
+                    if applied is not None and (best is None or applied[1] > best[2]):
+                        best = (key, template, applied[1], applied[0])
+        
+        with self._lock:
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        
+        key, template, coverage, fields = best
+        return ExtractionResult(
+            fields=fields,
+            form_type=template.form_type,
+            confidence=round(template.confidence * coverage, 4),
+            reasoning=(f"Extracted locally with the '{template.form_type}' template "
+                       f"learned from {template.samples} forms ({coverage:.0%} of its labels found)."),
+            chunks=0,
+            template=key
+        )
+    
+    def __len__(self) -> int:
+        return len(self.templates)
+    
+    def clear(self):
+        """Forget all templates."""
+        with self._lock:
+            self.templates.clear()
+            self._save()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get template counts and local hit/miss counts."""
+        with self._lock:
+            return {
+                "templates": len(self.templates),
+                "ready": sum(1 for t in self.templates.values() if self._ready(t)),
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -4,13 +4,22 @@ Agent Tools Module
 Defines the tools the agent can use, each powered by LLM calls.
 """
 
+import re
 import json
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from dataclasses import dataclass, asdict, field
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 
-from src.llm_client import BaseLLMClient, LLMResponse
+from src.llm_client import BaseLLMClient, AsyncBaseLLMClient, LLMResponse
 from src.document_processor import ExtractedDocument
+from src.chunking import DocumentChunk, chunk_document
+from src.retrieval import BM25Index, tokenize
+from src.numeric_stats import compute_statistics
+from src.model_router import ModelRouter
+from src.rate_limiter import RequestSlots
 
 
 # ============================================================================
@@ -24,6 +33,16 @@ class ExtractionResult:
     form_type: Optional[str]
     confidence: float
     reasoning: str
+    chunks: int = 1
+    conflicts: Dict[str, List[Any]] = field(default_factory=dict)
+    template: Optional[str] = None
+    model: Optional[str] = None
+    escalated_from: Optional[str] = None
+    
+    @property
+    def llm_calls(self) -> int:
+        """LLM calls made, counting the retry of an escalated extraction."""
+        return self.chunks * (2 if self.escalated_from else 1)
 
 
 @dataclass
@@ -51,6 +70,86 @@ class AnalysisResult:
     insights: List[str]
     comparisons: Dict[str, Any]
     statistics: Dict[str, Any]
+    groups: int = 1
+    calls: int = 1
+
+
+# ============================================================================
+# Extraction Merging
+# ============================================================================
+
+def _normalize_field_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def _normalize_field_value(value: Any) -> str:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def merge_extractions(results: List[ExtractionResult]) -> ExtractionResult:
+    """
+    Merge per-chunk extraction results into one.
+    
+    Field names are matched case- and punctuation-insensitively. When
+    chunks disagree on a value, the value reported by the most chunks wins,
+    then the one from the most confident chunk, then the earliest. Losing
+    values are kept in conflicts. The form type is a confidence-weighted
+    vote.
+    
+    Args:
+        results: Extraction results in document order
+    
+    Returns:
+        Combined ExtractionResult
+    """
+    if len(results) == 1:
+        return results[0]
+    
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for position, result in enumerate(results):
+        for name, value in result.fields.items():
+            if value in (None, "", [], {}):
+                continue
+            entry = candidates.setdefault(_normalize_field_name(name), {"name": name, "options": {}})
+            option = entry["options"].setdefault(
+                _normalize_field_value(value),
+                {"value": value, "votes": 0, "confidence": 0.0, "first": position}
+            )
+            option["votes"] += 1
+            option["confidence"] = max(option["confidence"], result.confidence)
+    
+    fields = {}
+    conflicts = {}
+    for entry in candidates.values():
+        options = sorted(
+            entry["options"].values(),
+            key=lambda o: (-o["votes"], -o["confidence"], o["first"])
+        )
+        fields[entry["name"]] = options[0]["value"]
+        if len(options) > 1:
+            conflicts[entry["name"]] = [o["value"] for o in options]
+    
+    type_votes: Dict[str, float] = {}
+    for result in results:
+        if result.form_type and result.form_type.lower() != "unknown":
+            type_votes[result.form_type] = type_votes.get(result.form_type, 0.0) + max(result.confidence, 0.01)
+    form_type = max(type_votes, key=type_votes.get) if type_votes else None
+    
+    contributing = [r.confidence for r in results if r.fields] or [r.confidence for r in results]
+    reasoning = f"Merged field extraction from {len(results)} document chunks."
+    if conflicts:
+        reasoning += f" Resolved conflicting values for: {', '.join(conflicts)}."
+    
+    return ExtractionResult(
+        fields=fields,
+        form_type=form_type,
+        confidence=sum(contributing) / len(contributing),
+        reasoning=reasoning,
+        chunks=sum(r.chunks for r in results),
+        conflicts=conflicts
+    )
 
 
 # ============================================================================
@@ -63,14 +162,51 @@ class BaseTool(ABC):
     name: str
     description: str
     
-    def __init__(self, llm_client: BaseLLMClient):
+    def __init__(
+        self,
+        llm_client: BaseLLMClient,
+        async_llm_client: Optional[AsyncBaseLLMClient] = None,
+        model_router: Optional[ModelRouter] = None,
+        llm_slots: Optional[RequestSlots] = None
+    ):
         self.llm = llm_client
+        self.async_llm = async_llm_client
+        self.model_router = model_router
+        self.llm_slots = llm_slots
     
     @abstractmethod
     def run(self, **kwargs) -> Any:
         """Execute the tool."""
         pass
     
+    @abstractmethod
+    async def arun(self, **kwargs) -> Any:
+        """Execute the tool without blocking the event loop."""
+        pass
+    
+    def _generate_structured(self, prompt: str, schema: Dict, **kwargs) -> Dict:
+        """Structured generation, holding one of the shared request slots for the call."""
+        with self.llm_slots or nullcontext():
+            return self.llm.generate_structured(prompt, schema, **kwargs)
+    
+    async def _agenerate_structured(self, prompt: str, schema: Dict, **kwargs) -> Dict:
+        """Structured generation on the async client, or the sync one in a worker thread."""
+        if self.llm_slots is None:
+            return await self._acall_structured(prompt, schema, **kwargs)
+        async with self.llm_slots:
+            return await self._acall_structured(prompt, schema, **kwargs)
+    
+    async def _acall_structured(self, prompt: str, schema: Dict, **kwargs) -> Dict:
+        if self.async_llm is None:
+            return await asyncio.to_thread(self.llm.generate_structured, prompt, schema, **kwargs)
+        return await self.async_llm.generate_structured(prompt, schema, **kwargs)
+    
+    def _model_kwargs(self, chars: int = 0, style: Optional[str] = None) -> Dict[str, str]:
+        """Per-call model override chosen by the model router (empty without one)."""
+        if self.model_router is None:
+            return {}
+        return {"model": self.model_router.select(self.name, chars, style)}
+    
     def to_tool_definition(self) -> Dict:
         """Convert to Claude tool definition format."""
         return {
@@ -100,6 +236,16 @@ class FieldExtractionTool(BaseTool):
     name = "extract_fields"
     description = "Extract structured fields and form type from a document"
     
+    # Bump when the prompt or schema changes so stored forms are re-extracted
+    PROMPT_VERSION = "2"
+    
+    # Longer documents (or ones with more tables) are extracted chunk by chunk
+    CHUNK_CHARS = 8000
+    MAX_INLINE_TABLES = 3
+    
+    # Chunks of one document extracted concurrently
+    MAX_PARALLEL_CHUNKS = 4
+    
     SYSTEM_PROMPT = """You are an expert form analyzer. Your task is to extract structured information from form documents.
 
 Analyze the document carefully and:
@@ -124,57 +270,182 @@ Be thorough but precise. Only extract fields you're confident about."""
             "required": ["document_text"]
         }
     
-    def run(self, document: ExtractedDocument) -> ExtractionResult:
-        """
-        Extract fields from a document.
-        
-        Args:
-            document: ExtractedDocument to analyze
-            
-        Returns:
-            ExtractionResult with extracted fields
-        """
-        prompt = f"""Analyze this form document and extract all fields:
+    OUTPUT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "fields": {
+                "type": "object",
+                "description": "Dictionary of field names to values"
+            },
+            "form_type": {
+                "type": "string",
+                "description": "Type of form (e.g., W-2, insurance_claim, job_application)"
+            },
+            "confidence": {
+                "type": "number",
+                "description": "Confidence score 0.0-1.0"
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "Explanation of extraction process"
+            }
+        },
+        "required": ["fields", "form_type", "confidence", "reasoning"]
+    }
+    
+    def _build_prompt(self, document: ExtractedDocument) -> str:
+        return f"""Analyze this form document and extract all fields:
 
 <document>
-{document.raw_text[:8000]}
+{document.raw_text[:self.CHUNK_CHARS]}
 </document>
 
-{f"Tables found in document: {json.dumps(document.tables[:3])}" if document.tables else ""}
+{f"Tables found in document: {json.dumps(document.tables[:self.MAX_INLINE_TABLES])}" if document.tables else ""}
 
 Extract all key-value pairs, identify the form type, and rate your confidence."""
-
-        schema = {
-            "type": "object",
-            "properties": {
-                "fields": {
-                    "type": "object",
-                    "description": "Dictionary of field names to values"
-                },
-                "form_type": {
-                    "type": "string",
-                    "description": "Type of form (e.g., W-2, insurance_claim, job_application)"
-                },
-                "confidence": {
-                    "type": "number",
-                    "description": "Confidence score 0.0-1.0"
-                },
-                "reasoning": {
-                    "type": "string",
-                    "description": "Explanation of extraction process"
-                }
-            },
-            "required": ["fields", "form_type", "confidence", "reasoning"]
-        }
+    
+    def _build_chunk_prompt(self, chunk: DocumentChunk, total: int) -> str:
+        if chunk.kind == "tables":
+            location = "tables extracted from the document"
+        elif chunk.pages:
+            location = f"pages {chunk.pages[0]}-{chunk.pages[-1]}" if len(chunk.pages) > 1 else f"page {chunk.pages[0]}"
+        else:
+            location = "a section of the document"
         
-        result = self.llm.generate_structured(prompt, schema, system=self.SYSTEM_PROMPT)
+        return f"""This is part {chunk.index + 1} of {total} of a longer form document ({location}).
+Extract all fields that appear in this part:
+
+<document_part>
+{chunk.text}
+</document_part>
+
+Only report fields present in this part. Identify the form type if this part indicates it, and rate your confidence."""
+    
+    def _build_prompts(
+        self,
+        document: ExtractedDocument,
+        form_type_hint: Optional[str] = None
+    ) -> List[str]:
+        """One prompt for documents within budget, otherwise one per chunk."""
+        if len(document.raw_text) <= self.CHUNK_CHARS and len(document.tables) <= self.MAX_INLINE_TABLES:
+            prompts = [self._build_prompt(document)]
+        else:
+            chunks = chunk_document(document, max_chars=self.CHUNK_CHARS)
+            prompts = [self._build_chunk_prompt(chunk, len(chunks)) for chunk in chunks]
         
+        if form_type_hint:
+            hint = (f"\n\nPredicted form type: {form_type_hint}. Use that form's standard field names, "
+                    "and report a different form type if the prediction is wrong.")
+            prompts = [prompt + hint for prompt in prompts]
+        return prompts
+    
+    @staticmethod
+    def _parse_result(result: Dict) -> ExtractionResult:
         return ExtractionResult(
             fields=result.get("fields", {}),
             form_type=result.get("form_type"),
             confidence=result.get("confidence", 0.0),
             reasoning=result.get("reasoning", "")
         )
+    
+    def build_requests(
+        self,
+        document: ExtractedDocument,
+        form_type_hint: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Prompt, schema, system prompt and routed model for each extraction call, for batch submission."""
+        model = self._model_kwargs(len(document.raw_text))
+        return [
+            {"prompt": prompt, "schema": self.OUTPUT_SCHEMA, "system": self.SYSTEM_PROMPT, **model}
+            for prompt in self._build_prompts(document, form_type_hint)
+        ]
+    
+    def parse_responses(self, results: List[Dict]) -> ExtractionResult:
+        """Merge the structured responses to build_requests into an ExtractionResult."""
+        return merge_extractions([self._parse_result(result) for result in results])
+    
+    def _escalation_model(self, result: ExtractionResult) -> Optional[str]:
+        """Stronger model to retry a low-confidence extraction with, if any."""
+        if self.model_router is None or result.model is None:
+            return None
+        if not self.model_router.should_escalate(result.confidence):
+            return None
+        return self.model_router.escalate(result.model)
+    
+    @staticmethod
+    def _escalated(first: ExtractionResult, retry: ExtractionResult) -> ExtractionResult:
+        """Keep the retry unless it came back less confident than the first attempt."""
+        result = retry if retry.confidence >= first.confidence else first
+        result.escalated_from = first.model
+        return result
+    
+    def run(
+        self,
+        document: ExtractedDocument,
+        form_type_hint: Optional[str] = None
+    ) -> ExtractionResult:
+        """
+        Extract fields from a document.
+        
+        Long documents are split by page into chunks that are extracted in
+        parallel and merged, so nothing past the first chunk is lost. With
+        a model router, a result below its escalation threshold is
+        extracted again on the next model tier.
+        
+        Args:
+            document: ExtractedDocument to analyze
+            form_type_hint: Locally predicted form type to steer field naming
+            
+        Returns:
+            ExtractionResult with extracted fields
+        """
+        prompts = self._build_prompts(document, form_type_hint)
+        
+        def extract_all(model: Dict[str, str]) -> ExtractionResult:
+            def extract(prompt: str) -> Dict:
+                return self._generate_structured(
+                    prompt, self.OUTPUT_SCHEMA, system=self.SYSTEM_PROMPT, **model
+                )
+            
+            if len(prompts) == 1:
+                result = self.parse_responses([extract(prompts[0])])
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.MAX_PARALLEL_CHUNKS, len(prompts))) as executor:
+                    result = self.parse_responses(list(executor.map(extract, prompts)))
+            result.model = model.get("model")
+            return result
+        
+        result = extract_all(self._model_kwargs(len(document.raw_text)))
+        stronger = self._escalation_model(result)
+        if stronger:
+            result = self._escalated(result, extract_all({"model": stronger}))
+        return result
+    
+    async def arun(
+        self,
+        document: ExtractedDocument,
+        form_type_hint: Optional[str] = None
+    ) -> ExtractionResult:
+        """Async variant of run."""
+        prompts = self._build_prompts(document, form_type_hint)
+        slots = asyncio.Semaphore(self.MAX_PARALLEL_CHUNKS)
+        
+        async def extract_all(model: Dict[str, str]) -> ExtractionResult:
+            async def extract(prompt: str) -> Dict:
+                async with slots:
+                    return await self._agenerate_structured(
+                        prompt, self.OUTPUT_SCHEMA, system=self.SYSTEM_PROMPT, **model
+                    )
+            
+            result = self.parse_responses(list(await asyncio.gather(*(extract(p) for p in prompts))))
+            result.model = model.get("model")
+            return result
+        
+        result = await extract_all(self._model_kwargs(len(document.raw_text)))
+        stronger = self._escalation_model(result)
+        if stronger:
+            result = self._escalated(result, await extract_all({"model": stronger}))
+        return result
 
 
 # ============================================================================
@@ -216,11 +487,188 @@ Be precise and factual. Don't make assumptions beyond what's in the document."""
             "required": ["question", "document_text"]
         }
     
+    OUTPUT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "answer": {
+                "type": "string",
+                "description": "The answer to the question"
+            },
+            "confidence": {
+                "type": "number",
+                "description": "Confidence score 0.0-1.0"
+            },
+            "evidence": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Quotes or references from the document supporting the answer"
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "Explanation of how you arrived at the answer"
+            }
+        },
+        "required": ["answer", "confidence", "evidence", "reasoning"]
+    }
+    
+    MULTI_OUTPUT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "answers": {
+                "type": "array",
+                "description": "One entry per question, in the order asked",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question_number": {
+                            "type": "integer",
+                            "description": "Number of the question being answered"
+                        },
+                        **OUTPUT_SCHEMA["properties"]
+                    },
+                    "required": ["question_number", "answer", "confidence", "evidence", "reasoning"]
+                }
+            }
+        },
+        "required": ["answers"]
+    }
+    
+    # Passages sent per question when answering from a chunk index
+    TOP_K_PASSAGES = 4
+    
+    # Shortest field value matched against passages ("1" or "Y" would match almost any)
+    MIN_VALUE_CHARS = 3
+    
+    # Rough output tokens per answer, used to size multi-question calls
+    ANSWER_TOKENS = 300
+    
+    def _build_context(
+        self,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None
+    ) -> str:
+        """Document block shared by every question on a form, sent as a cacheable prefix."""
+        fields_context = ""
+        if extracted_fields:
+            fields_context = f"\n\nPreviously extracted fields:\n{json.dumps(extracted_fields, indent=2)}"
+        
+        return f"""<document>
+{document.raw_text[:8000]}
+</document>
+{fields_context}"""
+    
+    def _build_prompt(self, question: str) -> str:
+        return f"""Answer this question about the form document above:
+
+Question: {question}
+
+Provide a clear answer with evidence from the document."""
+    
+    @classmethod
+    def _relevant_fields(
+        cls,
+        question: str,
+        passages: List[Dict[str, Any]],
+        extracted_fields: Optional[Dict]
+    ) -> Dict:
+        """Fields named in the question or whose values appear, as whole words, in the passages."""
+        question_terms = set(tokenize(question))
+        text = " ".join(p["text"] for p in passages).lower()
+        passage_words = f" {' '.join(re.findall(r'[a-z0-9]+', text))} "
+        
+        def in_passages(value: Any) -> bool:
+            words = " ".join(re.findall(r"[a-z0-9]+", str(value).lower()))
+            return len(words) >= cls.MIN_VALUE_CHARS and f" {words} " in passage_words
+        
+        return {
+            name: value for name, value in (extracted_fields or {}).items()
+            if question_terms & set(tokenize(str(name))) or in_passages(value)
+        }
+    
+    def _build_excerpts(
+        self,
+        questions: List[str],
+        index: BM25Index,
+        extracted_fields: Optional[Dict] = None
+    ) -> str:
+        """Top passages for each question (in document order) plus the fields they touch."""
+        selected = {}
+        for question in questions:
+            for _, passage in index.search(question, k=self.TOP_K_PASSAGES):
+                selected[passage["index"]] = passage
+        if not selected:
+            selected = {p["index"]: p for p in index.passages[:self.TOP_K_PASSAGES]}
+        passages = [selected[i] for i in sorted(selected)]
+        
+        excerpts = []
+        for passage in passages:
+            pages = ",".join(str(page) for page in passage["pages"])
+            label = f' pages="{pages}"' if pages else ""
+            excerpts.append(f"<excerpt{label}>\n{passage['text']}\n</excerpt>")
+        
+        excerpts_text = "\n".join(excerpts)
+        
+        fields = self._relevant_fields(" ".join(questions), passages, extracted_fields)
+        fields_context = f"\n\nRelevant extracted fields:\n{json.dumps(fields, indent=2)}" if fields else ""
+        
+        return f"""These are the passages of a form document most relevant to the {"question" if len(questions) == 1 else "questions"}:
+
+{excerpts_text}
+{fields_context}"""
+    
+    def _build_retrieval_prompt(
+        self,
+        question: str,
+        index: BM25Index,
+        extracted_fields: Optional[Dict] = None
+    ) -> str:
+        return f"""{self._build_excerpts([question], index, extracted_fields)}
+
+Question: {question}
+
+Provide a clear answer with evidence from the passages. If they do not contain the answer, say so."""
+    
+    def _request(
+        self,
+        question: str,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
+    ) -> Dict[str, Any]:
+        """
+        Arguments for generate_structured.
+        
+        With an index covering more passages than TOP_K_PASSAGES, only the
+        best-matching passages are sent. Otherwise the whole document goes
+        in a cacheable prefix shared by every question on the form.
+        """
+        request = {
+            "schema": self.OUTPUT_SCHEMA,
+            "system": self.SYSTEM_PROMPT,
+            **self._model_kwargs(len(document.raw_text))
+        }
+        if index is not None and len(index) > self.TOP_K_PASSAGES:
+            request["prompt"] = self._build_retrieval_prompt(question, index, extracted_fields)
+        else:
+            request["prompt"] = self._build_prompt(question)
+            request["cached_context"] = self._build_context(document, extracted_fields)
+        return request
+    
+    @staticmethod
+    def _parse_result(result: Dict) -> QAResult:
+        return QAResult(
+            answer=result.get("answer", "Unable to determine"),
+            confidence=result.get("confidence", 0.0),
+            evidence=result.get("evidence", []),
+            reasoning=result.get("reasoning", "")
+        )
+    
     def run(
         self,
         question: str,
         document: ExtractedDocument,
-        extracted_fields: Optional[Dict] = None
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
     ) -> QAResult:
         """
         Answer a question about a document.
@@ -229,57 +677,151 @@ Be precise and factual. Don't make assumptions beyond what's in the document."""
             question: The question to answer
             document: Source document
             extracted_fields: Optional pre-extracted fields
+            index: Optional passage index; long documents are answered from
+                the top-ranked passages only
             
         Returns:
             QAResult with answer and evidence
         """
-        fields_context = ""
-        if extracted_fields:
-            fields_context = f"\n\nPreviously extracted fields:\n{json.dumps(extracted_fields, indent=2)}"
+        result = self._generate_structured(
+            **self._request(question, document, extracted_fields, index)
+        )
+        return self._parse_result(result)
+    
+    async def arun(
+        self,
+        question: str,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
+    ) -> QAResult:
+        """Async variant of run."""
+        result = await self._agenerate_structured(
+            **self._request(question, document, extracted_fields, index)
+        )
+        return self._parse_result(result)
+    
+    def stream(
+        self,
+        question: str,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question, yielding fields as the model produces them.
         
-        prompt = f"""Answer this question about the form document:
-
-Question: {question}
-
-<document>
-{document.raw_text[:8000]}
-</document>
-{fields_context}
-
-Provide a clear answer with evidence from the document."""
+        The answer field comes first in the output schema, so it is usually
+        available well before evidence and reasoning finish generating.
+        
+        Args:
+            question: The question to answer
+            document: Source document
+            extracted_fields: Optional pre-extracted fields
+            index: Optional passage index (see run)
+            
+        Yields:
+            {"type": "field", "name", "value"} events, then a final
+            {"type": "result", "result": QAResult} event
+        """
+        with self.llm_slots or nullcontext():
+            events = self.llm.stream_structured(
+                **self._request(question, document, extracted_fields, index)
+            )
+            for event in events:
+                if event["type"] == "result":
+                    yield {"type": "result", "result": self._parse_result(event["result"])}
+                else:
+                    yield event
+    
+    def _request_many(
+        self,
+        questions: List[str],
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
+    ) -> Dict[str, Any]:
+        """Arguments for one generate_structured call answering several questions."""
+        numbered = "\n".join(f"{n}. {question}" for n, question in enumerate(questions, start=1))
+        instructions = f"""Questions:
+{numbered}
 
-        schema = {
-            "type": "object",
-            "properties": {
-                "answer": {
-                    "type": "string",
-                    "description": "The answer to the question"
-                },
-                "confidence": {
-                    "type": "number",
-                    "description": "Confidence score 0.0-1.0"
-                },
-                "evidence": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Quotes or references from the document supporting the answer"
-                },
-                "reasoning": {
-                    "type": "string",
-                    "description": "Explanation of how you arrived at the answer"
-                }
-            },
-            "required": ["answer", "confidence", "evidence", "reasoning"]
+Answer every question. Return one entry in "answers" per question, with question_number set to its number, a clear answer and evidence from the document."""
+        
+        request = {
+            "schema": self.MULTI_OUTPUT_SCHEMA,
+            "system": self.SYSTEM_PROMPT,
+            **self._model_kwargs(len(document.raw_text))
         }
+        if index is not None and len(index) > self.TOP_K_PASSAGES:
+            request["prompt"] = f"{self._build_excerpts(questions, index, extracted_fields)}\n\n{instructions}"
+        else:
+            request["prompt"] = f"Answer these questions about the form document above.\n\n{instructions}"
+            request["cached_context"] = self._build_context(document, extracted_fields)
+        return request
+    
+    def _questions_per_call(self) -> int:
+        """How many answers fit comfortably in one response's output budget."""
+        max_tokens = getattr(self.llm, "max_tokens", 4096)
+        return max(1, int(max_tokens * 0.8) // self.ANSWER_TOKENS)
+    
+    def run_many(
+        self,
+        questions: List[str],
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        index: Optional[BM25Index] = None
+    ) -> Tuple[List[QAResult], int]:
+        """
+        Answer several questions about a document in as few calls as possible.
         
-        result = self.llm.generate_structured(prompt, schema, system=self.SYSTEM_PROMPT)
+        Questions are grouped to fit the client's output budget. When a
+        response comes back truncated or missing answers, the unanswered
+        questions are retried, halving the group each time it makes no
+        progress, down to single-question calls.
         
-        return QAResult(
-            answer=result.get("answer", "Unable to determine"),
-            confidence=result.get("confidence", 0.0),
-            evidence=result.get("evidence", []),
-            reasoning=result.get("reasoning", "")
-        )
+        Args:
+            questions: Questions to answer
+            document: Source document
+            extracted_fields: Optional pre-extracted fields
+            index: Optional passage index (see run)
+            
+        Returns:
+            (QAResults in question order, number of LLM calls made)
+        """
+        size = self._questions_per_call()
+        pending = [list(range(start, min(start + size, len(questions)))) for start in range(0, len(questions), size)]
+        results: Dict[int, QAResult] = {}
+        calls = 0
+        
+        while pending:
+            group = pending.pop(0)
+            calls += 1
+            if len(group) == 1:
+                results[group[0]] = self.run(questions[group[0]], document, extracted_fields, index)
+                continue
+            
+            try:
+                response = self._generate_structured(
+                    **self._request_many([questions[i] for i in group], document, extracted_fields, index)
+                )
+            except ValueError:
+                # Truncated output that no longer parses
+                response = {}
+            
+            for item in response.get("answers", []):
+                number = item.get("question_number")
+                if isinstance(number, int) and 1 <= number <= len(group) and "answer" in item:
+                    results[group[number - 1]] = self._parse_result(item)
+            
+            missing = [i for i in group if i not in results]
+            if len(missing) == len(group):
+                half = len(missing) // 2
+                pending[:0] = [missing[:half], missing[half:]]
+            elif missing:
+                pending.insert(0, missing)
+        
+        return [results[i] for i in range(len(questions))], calls
 
 
 # ============================================================================
@@ -319,74 +861,106 @@ Format the summary clearly with key points and important values."""
             "required": ["document_text"]
         }
     
-    def run(
+    OUTPUT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "The document summary"
+            },
+            "key_points": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "List of key points from the document"
+            },
+            "form_type": {
+                "type": "string",
+                "description": "Type of form"
+            },
+            "important_values": {
+                "type": "object",
+                "description": "Dictionary of the most important values"
+            }
+        },
+        "required": ["summary", "key_points", "form_type", "important_values"]
+    }
+    
+    def _build_context(
         self,
         document: ExtractedDocument,
-        extracted_fields: Optional[Dict] = None,
-        style: str = "detailed"
-    ) -> SummaryResult:
-        """
-        Generate a summary of a document.
-        
-        Args:
-            document: Document to summarize
-            extracted_fields: Optional pre-extracted fields
-            style: Summary style (brief, detailed, bullet_points)
-            
-        Returns:
-            SummaryResult with summary and key points
-        """
+        extracted_fields: Optional[Dict] = None
+    ) -> str:
+        """Document block shared across summary styles, sent as a cacheable prefix."""
         fields_context = ""
         if extracted_fields:
             fields_context = f"\n\nExtracted fields:\n{json.dumps(extracted_fields, indent=2)}"
         
+        return f"""<document>
+{document.raw_text[:8000]}
+</document>
+{fields_context}"""
+    
+    def _build_prompt(self, style: str = "detailed") -> str:
         style_instruction = {
             "brief": "Create a 2-3 sentence summary.",
             "detailed": "Create a comprehensive summary with all important details.",
             "bullet_points": "Create a bullet-point summary of key information."
         }.get(style, "Create a detailed summary.")
         
-        prompt = f"""Summarize this form document.
-
-{style_instruction}
-
-<document>
-{document.raw_text[:8000]}
-</document>
-{fields_context}"""
+        return f"""Summarize the form document above.
 
-        schema = {
-            "type": "object",
-            "properties": {
-                "summary": {
-                    "type": "string",
-                    "description": "The document summary"
-                },
-                "key_points": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "List of key points from the document"
-                },
-                "form_type": {
-                    "type": "string",
-                    "description": "Type of form"
-                },
-                "important_values": {
-                    "type": "object",
-                    "description": "Dictionary of the most important values"
-                }
-            },
-            "required": ["summary", "key_points", "form_type", "important_values"]
-        }
-        
-        result = self.llm.generate_structured(prompt, schema, system=self.SYSTEM_PROMPT)
-        
+{style_instruction}"""
+    
+    @staticmethod
+    def _parse_result(result: Dict) -> SummaryResult:
         return SummaryResult(
             summary=result.get("summary", ""),
             key_points=result.get("key_points", []),
             form_type=result.get("form_type", "unknown"),
             important_values=result.get("important_values", {})
         )
+    
+    def run(
+        self,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        style: str = "detailed"
+    ) -> SummaryResult:
+        """
+        Generate a summary of a document.
+        
+        Args:
+            document: Document to summarize
+            extracted_fields: Optional pre-extracted fields
+            style: Summary style (brief, detailed, bullet_points)
+            
+        Returns:
+            SummaryResult with summary and key points
+        """
+        result = self._generate_structured(
+            self._build_prompt(style),
+            self.OUTPUT_SCHEMA,
+            system=self.SYSTEM_PROMPT,
+            cached_context=self._build_context(document, extracted_fields),
+            **self._model_kwargs(len(document.raw_text), style)
+        )
+        return self._parse_result(result)
+    
+    async def arun(
+        self,
+        document: ExtractedDocument,
+        extracted_fields: Optional[Dict] = None,
+        style: str = "detailed"
+    ) -> SummaryResult:
+        """Async variant of run."""
+        result = await self._agenerate_structured(
+            self._build_prompt(style),
+            self.OUTPUT_SCHEMA,
+            system=self.SYSTEM_PROMPT,
+            cached_context=self._build_context(document, extracted_fields),
+            **self._model_kwargs(len(document.raw_text), style)
+        )
+        return self._parse_result(result)
 
 
 # ============================================================================
@@ -397,22 +971,42 @@ class CrossDocumentAnalysisTool(BaseTool):
     """
     Analyzes multiple documents to find patterns and insights.
     
-    The LLM compares documents, aggregates information, and provides
-    holistic insights across the document set.
+    Numeric statistics are computed locally (see numeric_stats) and given
+    to the LLM, which compares documents and writes the narrative and
+    insights without doing arithmetic itself. Large document sets are
+    analyzed map-reduce style, in groups whose partial analyses are then
+    combined.
     """
     
     name = "analyze_documents"
     description = "Analyze multiple documents to find patterns and answer questions"
     
+    # Serialized document summaries per analysis call; more are analyzed in groups
+    GROUP_CHARS = 60000
+    PREVIEW_CHARS = 1000
+    
+    # Groups analyzed concurrently, and partial analyses combined per reduce call
+    MAX_PARALLEL_GROUPS = 4
+    REDUCE_FANOUT = 8
+    
     SYSTEM_PROMPT = """You are an expert at analyzing multiple form documents together.
 
 When analyzing multiple documents:
 1. Compare similar fields across documents
-2. Calculate statistics for numeric values (totals, averages, ranges)
+2. Use the provided computed statistics for numeric values; never recalculate them
 3. Identify patterns and trends
 4. Answer questions that require information from multiple documents
 5. Provide insights that wouldn't be visible from individual documents
 
+Be analytical and data-driven. Support conclusions with specific evidence."""
+    
+    REDUCE_SYSTEM_PROMPT = """You are an expert at combining partial analyses of a large set of form documents.
+
+Each partial analysis covers one group of documents. When combining them:
+1. Reconcile the partial answers into a single direct answer to the question
+2. Keep insights that hold across groups and point out where groups differ
+3. Use the provided computed statistics for numeric values; never recalculate them
+
 Be analytical and data-driven. Support conclusions with specific evidence."""
 
     def get_input_schema(self) -> Dict:
@@ -434,6 +1028,150 @@ Be analytical and data-driven. Support conclusions with specific evidence."""
             "required": ["question", "documents"]
         }
     
+    OUTPUT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "answer": {
+                "type": "string",
+                "description": "Direct answer to the question"
+            },
+            "insights": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Key insights discovered from the analysis"
+            },
+            "comparisons": {
+                "type": "object",
+                "description": "Comparisons between documents"
+            }
+        },
+        "required": ["answer", "insights", "comparisons"]
+    }
+    
+    def _summarize(self, document: ExtractedDocument, fields: Dict) -> Dict[str, Any]:
+        return {
+            "file": document.file_path.split("/")[-1],
+            "fields": fields,
+            "preview": document.raw_text[:self.PREVIEW_CHARS]
+        }
+    
+    @staticmethod
+    def _compute_statistics(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return compute_statistics([s["fields"] for s in summaries], [s["file"] for s in summaries])
+    
+    def partition(self, summaries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Pack document summaries, in order, into groups of at most GROUP_CHARS.
+        
+        A summary larger than the budget on its own gets a group to itself.
+        """
+        groups: List[List[Dict[str, Any]]] = []
+        size = 0
+        for summary in summaries:
+            length = len(json.dumps(summary, indent=2))
+            if groups and size + length <= self.GROUP_CHARS:
+                groups[-1].append(summary)
+                size += length
+            else:
+                groups.append([summary])
+                size = length
+        return groups
+    
+    def _build_prompt(
+        self,
+        question: str,
+        summaries: List[Dict[str, Any]],
+        statistics: Dict[str, Any],
+        part: Optional[Tuple[int, int]] = None
+    ) -> str:
+        scope = ""
+        if part is not None:
+            scope = (f"\nThese documents are group {part[0]} of {part[1]} in a larger set. "
+                     "Analyze only this group; the group analyses are combined afterwards.\n")
+        
+        return f"""Analyze these {len(summaries)} documents to answer the question.
+{scope}
+Question: {question}
+
+<documents>
+{json.dumps(summaries, indent=2)}
+</documents>
+
+<computed_statistics>
+{json.dumps(statistics, indent=2)}
+</computed_statistics>
+
+The computed statistics are exact; quote them as given rather than recalculating.
+Provide a comprehensive analysis with comparisons and insights."""
+    
+    def _build_reduce_prompt(
+        self,
+        question: str,
+        partials: List[Dict[str, Any]],
+        statistics: Dict[str, Any]
+    ) -> str:
+        analyses = [
+            {
+                "documents": f"{p['files'][0]} to {p['files'][-1]} ({len(p['files'])} documents)",
+                "answer": p["answer"],
+                "insights": p["insights"],
+                "comparisons": p["comparisons"]
+            }
+            for p in partials
+        ]
+        document_count = sum(len(p["files"]) for p in partials)
+        
+        return f"""Combine these {len(partials)} partial analyses, covering {document_count} documents, to answer the question.
+
+Question: {question}
+
+<partial_analyses>
+{json.dumps(analyses, indent=2)}
+</partial_analyses>
+
+<computed_statistics>
+{json.dumps(statistics, indent=2)}
+</computed_statistics>
+
+The computed statistics are exact and cover all {statistics["document_count"]} documents; quote them as given rather than recalculating.
+Provide one combined answer with the comparisons and insights that matter across groups."""
+    
+    @staticmethod
+    def _partial(files: List[str], result: Dict) -> Dict[str, Any]:
+        return {
+            "files": files,
+            "answer": result.get("answer", ""),
+            "insights": result.get("insights", []),
+            "comparisons": result.get("comparisons", {})
+        }
+    
+    def _reduce_batches(self, partials: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return [partials[i:i + self.REDUCE_FANOUT] for i in range(0, len(partials), self.REDUCE_FANOUT)]
+    
+    def _combine(self, batches: List[List[Dict[str, Any]]], results: List[Dict]) -> List[Dict[str, Any]]:
+        """Partials for the next level; results cover the batches with more than one partial."""
+        merged = iter(results)
+        return [
+            batch[0] if len(batch) == 1 else self._partial([f for p in batch for f in p["files"]], next(merged))
+            for batch in batches
+        ]
+    
+    @staticmethod
+    def _parse_result(
+        result: Dict,
+        statistics: Dict[str, Any],
+        groups: int = 1,
+        calls: int = 1
+    ) -> AnalysisResult:
+        return AnalysisResult(
+            answer=result.get("answer", ""),
+            insights=result.get("insights", []),
+            comparisons=result.get("comparisons", {}),
+            statistics=statistics,
+            groups=groups,
+            calls=calls
+        )
+    
     def run(
         self,
         question: str,
@@ -443,84 +1181,135 @@ Be analytical and data-driven. Support conclusions with specific evidence."""
         """
         Analyze multiple documents.
         
+        Document sets larger than GROUP_CHARS are analyzed hierarchically:
+        groups of documents are analyzed in parallel, then the partial
+        analyses are combined REDUCE_FANOUT at a time until one remains.
+        
         Args:
             question: Analysis question
             documents: List of documents
             extracted_fields_list: List of extracted fields for each document
             
         Returns:
-            AnalysisResult with insights
+            AnalysisResult with insights and locally computed statistics
         """
-        # Prepare document summaries for the prompt
-        doc_summaries = []
-        for doc, fields in zip(documents, extracted_fields_list):
-            doc_summaries.append({
-                "file": doc.file_path.split("/")[-1],
-                "fields": fields,
-                "preview": doc.raw_text[:1000]
-            })
+        summaries = [
+            self._summarize(doc, fields)
+            for doc, fields in zip(documents, extracted_fields_list)
+        ]
+        statistics = self._compute_statistics(summaries)
+        groups = self.partition(summaries)
         
-        prompt = f"""Analyze these {len(documents)} documents to answer the question.
-
-Question: {question}
-
-<documents>
-{json.dumps(doc_summaries, indent=2)}
-</documents>
-
-Provide a comprehensive analysis with statistics, comparisons, and insights."""
-
-        schema = {
-            "type": "object",
-            "properties": {
-                "answer": {
-                    "type": "string",
-                    "description": "Direct answer to the question"
-                },
-                "insights": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Key insights discovered from the analysis"
-                },
-                "comparisons": {
-                    "type": "object",
-                    "description": "Comparisons between documents"
-                },
-                "statistics": {
-                    "type": "object",
-                    "description": "Calculated statistics (totals, averages, etc.)"
-                }
-            },
-            "required": ["answer", "insights", "comparisons", "statistics"]
-        }
+        if len(groups) <= 1:
+            prompt = self._build_prompt(question, summaries, statistics)
+            result = self._generate_structured(
+                prompt, self.OUTPUT_SCHEMA, system=self.SYSTEM_PROMPT, **self._model_kwargs(len(prompt))
+            )
+            return self._parse_result(result, statistics)
         
-        result = self.llm.generate_structured(prompt, schema, system=self.SYSTEM_PROMPT)
+        def analyze(request: Tuple[str, str]) -> Dict:
+            prompt, system = request
+            return self._generate_structured(
+                prompt, self.OUTPUT_SCHEMA, system=system, **self._model_kwargs(len(prompt))
+            )
         
-        return AnalysisResult(
-            answer=result.get("answer", ""),
-            insights=result.get("insights", []),
-            comparisons=result.get("comparisons", {}),
-            statistics=result.get("statistics", {})
-        )
+        requests = [
+            (self._build_prompt(question, group, self._compute_statistics(group), (i, len(groups))),
+             self.SYSTEM_PROMPT)
+            for i, group in enumerate(groups, start=1)
+        ]
+        with ThreadPoolExecutor(max_workers=min(self.MAX_PARALLEL_GROUPS, len(groups))) as executor:
+            results = executor.map(analyze, requests)
+            partials = [self._partial([s["file"] for s in g], r) for g, r in zip(groups, results)]
+            calls = len(groups)
+            
+            while len(partials) > 1:
+                batches = self._reduce_batches(partials)
+                requests = [
+                    (self._build_reduce_prompt(question, batch, statistics), self.REDUCE_SYSTEM_PROMPT)
+                    for batch in batches if len(batch) > 1
+                ]
+                partials = self._combine(batches, list(executor.map(analyze, requests)))
+                calls += len(requests)
+        
+        return self._parse_result(partials[0], statistics, groups=len(groups), calls=calls)
+    
+    async def arun(
+        self,
+        question: str,
+        documents: List[ExtractedDocument],
+        extracted_fields_list: List[Dict]
+    ) -> AnalysisResult:
+        """Async variant of run."""
+        summaries = [
+            self._summarize(doc, fields)
+            for doc, fields in zip(documents, extracted_fields_list)
+        ]
+        statistics = self._compute_statistics(summaries)
+        groups = self.partition(summaries)
+        
+        if len(groups) <= 1:
+            prompt = self._build_prompt(question, summaries, statistics)
+            result = await self._agenerate_structured(
+                prompt, self.OUTPUT_SCHEMA, system=self.SYSTEM_PROMPT, **self._model_kwargs(len(prompt))
+            )
+            return self._parse_result(result, statistics)
+        
+        slots = asyncio.Semaphore(self.MAX_PARALLEL_GROUPS)
+        
+        async def analyze(prompt: str, system: str) -> Dict:
+            async with slots:
+                return await self._agenerate_structured(
+                    prompt, self.OUTPUT_SCHEMA, system=system, **self._model_kwargs(len(prompt))
+                )
+        
+        results = await asyncio.gather(*(
+            analyze(self._build_prompt(question, group, self._compute_statistics(group), (i, len(groups))),
+                    self.SYSTEM_PROMPT)
+            for i, group in enumerate(groups, start=1)
+        ))
+        partials = [self._partial([s["file"] for s in g], r) for g, r in zip(groups, results)]
+        calls = len(groups)
+        
+        while len(partials) > 1:
+            batches = self._reduce_batches(partials)
+            results = await asyncio.gather(*(
+                analyze(self._build_reduce_prompt(question, batch, statistics), self.REDUCE_SYSTEM_PROMPT)
+                for batch in batches if len(batch) > 1
+            ))
+            partials = self._combine(batches, list(results))
+            calls += len(results)
+        
+        return self._parse_result(partials[0], statistics, groups=len(groups), calls=calls)
 
 
 # ============================================================================
 # Tool Registry
 # ============================================================================
 
-def get_all_tools(llm_client: BaseLLMClient) -> Dict[str, BaseTool]:
+def get_all_tools(
+    llm_client: BaseLLMClient,
+    async_llm_client: Optional[AsyncBaseLLMClient] = None,
+    model_router: Optional[ModelRouter] = None,
+    llm_slots: Optional[RequestSlots] = None
+) -> Dict[str, BaseTool]:
     """
     Get all available tools.
     
     Args:
         llm_client: LLM client to use for tools
+        async_llm_client: Optional async client used by the tools' arun methods
+        model_router: Optional router picking a model per tool call; without
+            one, every call uses the client's model
+        llm_slots: Optional cap on in-flight LLM requests, taken for each
+            request (so chunked and map-reduce calls count individually)
         
     Returns:
         Dictionary of tool name to tool instance
     """
     return {
-        "extract_fields": FieldExtractionTool(llm_client),
-        "answer_question": QuestionAnsweringTool(llm_client),
-        "summarize_document": SummarizationTool(llm_client),
-        "analyze_documents": CrossDocumentAnalysisTool(llm_client)
+        "extract_fields": FieldExtractionTool(llm_client, async_llm_client, model_router, llm_slots),
+        "answer_question": QuestionAnsweringTool(llm_client, async_llm_client, model_router, llm_slots),
+        "summarize_document": SummarizationTool(llm_client, async_llm_client, model_router, llm_slots),
+        "analyze_documents": CrossDocumentAnalysisTool(llm_client, async_llm_client, model_router, llm_slots)
     }
@@ -7,21 +7,55 @@ These tests use a mock LLM client to avoid API calls during testing.
 import pytest
 import os
 import json
+import asyncio
 import tempfile
+import threading
+import time
 from pathlib import Path
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.llm_client import MockLLMClient, LLMResponse
-from src.document_processor import DocumentProcessor, ExtractedDocument
+from types import SimpleNamespace
+
+from src import llm_client
+from src.llm_client import (
+    MockLLMClient,
+    AsyncMockLLMClient,
+    LLMResponse,
+    ClaudeClient,
+    IncrementalJSONParser
+)
+from src.document_processor import (
+    DocumentProcessor,
+    ExtractedDocument,
+    group_page_windows,
+    split_page_ranges
+)
+from src import ocr_engine
+from src.batch import BatchClient, LocalBatchServer
+from src.cache import DiskCache, ResponseCache
+from src.rate_limiter import AdaptiveConcurrency, RateLimiter, RequestSlots, TokenBucket
+from src.form_store import MemoryFormStore, SQLiteFormStore
+from src.ocr_engine import OCREngine, average_confidence, layout_words
+from src.chunking import chunk_document, split_text
+from src.retrieval import BM25Index
+from src.field_lookup import match_field
+from src.templates import TemplateLibrary, label_values
+from src.classifier import FormTypeClassifier
+from src.intent_router import IntentRouter
+from src.model_router import ModelRouter
+from src.numeric_stats import compute_statistics, parse_number
 from src.tools import (
+    ExtractionResult,
+    merge_extractions,
     FieldExtractionTool,
     QuestionAnsweringTool,
     SummarizationTool,
-    CrossDocumentAnalysisTool
+    CrossDocumentAnalysisTool,
+    get_all_tools
 )
-from src.agent import IntelligentFormAgent, ProcessedForm
+from src.agent import IntelligentFormAgent, ProcessedForm, FormProcessingError
 
 
 class TestDocumentProcessor:
@@ -80,10 +114,191 @@ class TestDocumentProcessor:
         finally:
             os.unlink(temp_path)
     
+    def test_extraction_cache_hits_on_same_content(self):
+        """Test identical bytes under a different path are served from cache."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            processor = DocumentProcessor(cache_dir=cache_dir)
+            paths = []
+            for _ in range(2):
+                with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                    f.write("Name: John Doe\nAmount: $1,000")
+                    paths.append(f.name)
+            
+            try:
+                first = processor.process(paths[0])
+                second = processor.process(paths[1])
+                
+                assert "cache_hit" not in first.metadata
+                assert second.metadata["cache_hit"] is True
+                assert second.file_path == str(Path(paths[1]).resolve())
+                assert second.raw_text == first.raw_text
+                
+                other = DocumentProcessor(cache_dir=cache_dir, ocr_language="deu")
+                assert "cache_hit" not in other.process(paths[0]).metadata
+            finally:
+                for p in paths:
+                    os.unlink(p)
+    
+    def test_disk_cache_evicts_least_recently_used(self):
+        """Test the disk cache stays under its size budget."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DiskCache(cache_dir, max_bytes=250)
+            cache.set("old", {"value": "x" * 100})
+            os.utime(Path(cache_dir) / "old.json", (0, 0))
+            cache.set("new", {"value": "y" * 100})
+            cache.set("newest", {"value": "z" * 100})
+            
+            assert cache.get("old") is None
+            assert cache.get("newest") == {"value": "z" * 100}
+            assert cache.get_stats()["size_bytes"] <= 250
+    
     def test_file_not_found(self):
         """Test handling of missing files."""
         with pytest.raises(FileNotFoundError):
             self.processor.process("nonexistent_file.pdf")
+    
+    def test_split_page_ranges(self):
+        """Test page ranges cover every page once, in order."""
+        ranges = split_page_ranges(10, 3)
+        
+        assert ranges == [(0, 4), (4, 7), (7, 10)]
+        assert split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+        assert split_page_ranges(0, 4) == []
+    
+    def test_group_page_windows(self):
+        """Test OCR windows are consecutive runs bounded by the window size."""
+        assert group_page_windows([1, 2, 3, 4, 5], 2) == [(1, 2), (3, 4), (5, 5)]
+        assert group_page_windows([7, 2, 3, 9], 4) == [(2, 3), (7, 7), (9, 9)]
+    
+    def test_ocr_window_respects_memory_limit(self):
+        """Test the OCR window shrinks as DPI grows."""
+        low = DocumentProcessor(ocr_dpi=100, ocr_memory_limit_mb=64)
+        high = DocumentProcessor(ocr_dpi=300, ocr_memory_limit_mb=64)
+        
+        assert low._ocr_window_size() > high._ocr_window_size() >= 1
+    
+    @staticmethod
+    def fake_pdfplumber(texts):
+        """A pdfplumber stand-in opening a PDF with one page per text."""
+        class FakePage:
+            def __init__(self, text):
+                self.text = text
+            
+            def extract_text(self):
+                return self.text
+            
+            def extract_tables(self):
+                return []
+        
+        class FakePDF:
+            pages = [FakePage(text) for text in texts]
+            metadata = {}
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *args):
+                return False
+        
+        class FakePdfplumber:
+            @staticmethod
+            def open(path):
+                return FakePDF()
+        
+        return FakePdfplumber
+    
+    def test_pdf_ocrs_only_textless_pages(self):
+        """Test that only pages without a text layer are sent to OCR."""
+        requested = []
+        
+        def fake_ocr(file_path, page_numbers=None):
+            requested.append(page_numbers)
+            return {n: f"scanned page {n}" for n in page_numbers}
+        
+        self.processor._pdfplumber = self.fake_pdfplumber(["Cover letter", "", "Appendix"])
+        self.processor._ocr_pdf = fake_ocr
+        
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+            temp_path = f.name
+        
+        try:
+            result = self.processor.process(temp_path)
+            
+            assert requested == [[2]]
+            assert result.metadata["ocr_pages"] == [2]
+            assert result.pages == ["Cover letter", "scanned page 2", "Appendix"]
+            assert "--- Page 2 (OCR) ---" in result.raw_text
+            assert result.extraction_method == "pdfplumber+ocr"
+        finally:
+            os.unlink(temp_path)
+    
+    def test_pdf_keeps_pdfplumber_text_when_ocr_fails(self):
+        """Test a failing page OCR keeps the extracted text instead of re-OCRing the document."""
+        requested = []
+        
+        def failing_ocr(file_path, page_numbers=None):
+            requested.append(page_numbers)
+            raise RuntimeError("tesseract crashed")
+        
+        self.processor._pdfplumber = self.fake_pdfplumber(["Cover letter", " ", "Appendix"])
+        self.processor._ocr_pdf = failing_ocr
+        
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+            temp_path = f.name
+        
+        try:
+            result = self.processor.process(temp_path)
+            
+            assert requested == [[2]]
+            assert result.pages == ["Cover letter", " ", "Appendix"]
+            assert result.metadata["ocr_failed_pages"] == [2]
+            assert "error" not in result.metadata
+            assert result.extraction_method == "pdfplumber"
+        finally:
+            os.unlink(temp_path)
+
+
+class TestOCREngine:
+    """Tests for the OCR engine with a fake recognizer."""
+    
+    class FakeRecognizer:
+        instances = 0
+        
+        def __init__(self, language):
+            TestOCREngine.FakeRecognizer.instances += 1
+        
+        def recognize(self, image):
+            return f"text:{image}"
+    
+    def test_inline_engine_reuses_recognizer(self, monkeypatch):
+        """Test inline OCR keeps one warm recognizer and tracks stats."""
+        monkeypatch.setattr(ocr_engine, "ocr_available", lambda: True)
+        monkeypatch.setattr(ocr_engine, "_Recognizer", self.FakeRecognizer)
+        self.FakeRecognizer.instances = 0
+        
+        engine = OCREngine(workers=0)
+        texts = engine.map(["a", "b", "c"])
+        stats = engine.get_stats()
+        
+        assert texts == ["text:a", "text:b", "text:c"]
+        assert self.FakeRecognizer.instances == 1
+        assert stats["completed"] == 3
+        assert stats["queue_depth"] == 0
+    
+    def test_layout_words_and_confidence(self):
+        """Test text layout and confidence come from one set of word results."""
+        def word(text, block, par, line, conf):
+            return {"text": text, "block": block, "paragraph": par, "line": line, "confidence": conf}
+        
+        words = [
+            word("Name:", 1, 1, 1, 90.0),
+            word("John", 1, 1, 1, 80.0),
+            word("Amount:", 1, 1, 2, 70.0),
+            word("$1,000", 2, 1, 1, -1.0)
+        ]
+        
+        assert layout_words(words) == "Name: John\nAmount:\n\n$1,000"
+        assert average_confidence(words) == 80.0
 
 
 class TestMockLLMClient:
@@ -124,6 +339,409 @@ class TestMockLLMClient:
         assert "confidence" in result
 
 
+class FakeMessages:
+    """Stands in for anthropic's messages resource, recording requests."""
+    
+    def __init__(self, text='{"answer": "42", "confidence": 0.9}'):
+        self.text = text
+        self.requests = []
+    
+    def create(self, **params):
+        self.requests.append(params)
+        tool_choice = params.get("tool_choice") or {}
+        if tool_choice.get("type") == "tool":
+            block = SimpleNamespace(
+                type="tool_use", id="toolu_1", name=tool_choice["name"], input=json.loads(self.text)
+            )
+        else:
+            block = SimpleNamespace(type="text", text=self.text)
+        return SimpleNamespace(
+            content=[block],
+            model=params["model"],
+            stop_reason="end_turn",
+            usage=SimpleNamespace(
+                input_tokens=10,
+                output_tokens=5,
+                cache_creation_input_tokens=0 if len(self.requests) > 1 else 1000,
+                cache_read_input_tokens=1000 if len(self.requests) > 1 else 0
+            )
+        )
+    
+    def stream(self, **params):
+        return FakeStream(self, params)
+
+
+class FakeStream:
+    """Stands in for anthropic's MessageStream, sending the text a few characters at a time."""
+    
+    def __init__(self, messages, params):
+        self.messages = messages
+        self.params = params
+        self.tool = bool(params.get("tool_choice"))
+        self.chunks = [messages.text[i:i + 3] for i in range(0, len(messages.text), 3)]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        return False
+    
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.tool:
+                delta = SimpleNamespace(type="input_json_delta", partial_json=chunk)
+            else:
+                delta = SimpleNamespace(type="text_delta", text=chunk)
+            yield SimpleNamespace(type="content_block_delta", index=0, delta=delta)
+    
+    @property
+    def text_stream(self):
+        return iter(self.chunks)
+    
+    def get_final_message(self):
+        return self.messages.create(**self.params)
+
+
+@pytest.fixture
+def claude_client(monkeypatch):
+    """A ClaudeClient wired to FakeMessages instead of the Anthropic API."""
+    messages = FakeMessages()
+    monkeypatch.setattr(llm_client, "ANTHROPIC_AVAILABLE", True)
+    monkeypatch.setattr(
+        llm_client, "Anthropic", lambda **kwargs: SimpleNamespace(messages=messages), raising=False
+    )
+    client = ClaudeClient(api_key="test-key")
+    client.fake_messages = messages
+    return client
+
+
+class TestClaudeClient:
+    """Tests for ClaudeClient request building against a fake API."""
+    
+    def test_prompt_caching_marks_stable_prefixes(self, claude_client):
+        """Test the system prompt and cached context carry cache_control."""
+        claude_client.generate_structured(
+            "Question: what?",
+            {"type": "object", "properties": {"answer": {"type": "string"}}},
+            system="System prompt",
+            cached_context="<document>...</document>"
+        )
+        request = claude_client.fake_messages.requests[0]
+        
+        assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert request["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+        content = request["messages"][0]["content"]
+        assert content[0]["cache_control"] == {"type": "ephemeral"}
+        assert content[1] == {"type": "text", "text": "Question: what?"}
+    
+    def test_structured_output_forces_tool_call(self, claude_client):
+        """Test structured output uses a forced tool whose input is the result."""
+        schema = {"type": "object", "properties": {"answer": {"type": "string"}}}
+        result = claude_client.generate_structured("What?", schema, system="S")
+        request = claude_client.fake_messages.requests[0]
+        
+        assert result == {"answer": "42", "confidence": 0.9}
+        assert request["tool_choice"] == {"type": "tool", "name": llm_client.STRUCTURED_OUTPUT_TOOL}
+        assert request["tools"][0]["input_schema"] == schema
+        assert "JSON" not in request["system"][0]["text"]
+    
+    def test_json_structured_output_mode(self, claude_client):
+        """Test structured_output="json" keeps the schema-in-prompt path."""
+        claude_client.structured_output = "json"
+        result = claude_client.generate_structured("What?", {"type": "object"}, system="S")
+        request = claude_client.fake_messages.requests[0]
+        
+        assert result == {"answer": "42", "confidence": 0.9}
+        assert "tool_choice" not in request
+        assert "JSON" in request["system"][0]["text"]
+    
+    def test_cache_usage_is_reported(self, claude_client):
+        """Test cache read/write token counts accumulate."""
+        claude_client.generate("one", cached_context="doc")
+        claude_client.generate("two", cached_context="doc")
+        usage = claude_client.get_usage()
+        
+        assert usage["cache_creation_input_tokens"] == 1000
+        assert usage["cache_read_input_tokens"] == 1000
+        assert usage["input_tokens"] == 20
+
+
+class TestStreaming:
+    """Tests for streaming responses and incremental JSON parsing."""
+    
+    def test_parser_emits_fields_as_they_complete(self):
+        """Test each top-level field is emitted once its value is complete."""
+        payload = {
+            "answer": "The total is \"$1,500\"",
+            "confidence": 0.9,
+            "evidence": ["Total: $1,500", {"nested": "}"}],
+            "reasoning": "Read it off the form"
+        }
+        text = "```json\n" + json.dumps(payload) + "\n```"
+        parser = IncrementalJSONParser()
+        emitted = []
+        for i, char in enumerate(text):
+            emitted.extend((i, name) for name, _ in parser.feed(char))
+        
+        assert [name for _, name in emitted] == list(payload)
+        assert emitted[0][0] == text.index(', "confidence"') - 1
+        assert parser.fields == payload
+        assert parser.done
+    
+    def test_stream_structured_yields_answer_first(self, claude_client):
+        """Test the answer field streams out before the final result."""
+        claude_client.fake_messages.text = '{"answer": "42", "evidence": ["x"], "reasoning": "because"}'
+        events = list(claude_client.stream_structured("What?", {"type": "object"}, system="S"))
+        
+        assert events[0] == {"type": "field", "name": "answer", "value": "42"}
+        assert events[-1]["type"] == "result"
+        assert events[-1]["result"]["reasoning"] == "because"
+        assert claude_client.get_usage()["output_tokens"] == 5
+    
+    def test_agent_ask_stream(self):
+        """Test ask_stream ends with a QAResult and counts the LLM call."""
+        agent = IntelligentFormAgent(llm_client=MockLLMClient(), form_store=MemoryFormStore())
+        form = ProcessedForm(
+            file_path="form.txt",
+            file_type="text",
+            raw_text="Total: $1,500",
+            extracted_fields={"Total": "$1,500"},
+            form_type="invoice",
+            extraction_confidence=0.9,
+            tables=[],
+            metadata={}
+        )
+        events = list(agent.ask_stream("Is the total overdue?", form))
+        
+        assert events[0] == {"type": "field", "name": "answer", "value": "Mock answer"}
+        assert events[-1]["result"].answer == "Mock answer"
+        assert agent.total_llm_calls == 1
+
+
+class APIStatusError(Exception):
+    """Stands in for an anthropic API error carrying an HTTP status."""
+    
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class TestRateLimiter:
+    """Tests for token buckets, adaptive concurrency and retry."""
+    
+    def test_token_bucket_waits_once_empty(self):
+        """Test reservations beyond the burst return the refill wait."""
+        bucket = TokenBucket(per_minute=60)
+        
+        assert bucket.reserve(60) == 0
+        assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+        bucket.adjust(30)
+        assert bucket.available == pytest.approx(29, abs=0.1)
+    
+    def test_adaptive_concurrency_aimd(self):
+        """Test the limit grows additively and halves on throttling."""
+        limiter = AdaptiveConcurrency(initial=4, max_limit=8)
+        for _ in range(8):
+            limiter.acquire()
+            limiter.release()
+        assert int(limiter.limit) == 5
+        
+        limiter.acquire()
+        limiter.release(throttled=True)
+        assert int(limiter.limit) == 2
+        assert limiter.try_acquire() and limiter.try_acquire()
+        assert not limiter.try_acquire()
+    
+    def test_async_waiters_are_woken_by_release(self):
+        """Test coroutines queue for slots in order and cancelled waiters do not leak slots."""
+        limiter = AdaptiveConcurrency(initial=2, max_limit=2)
+        order = []
+        peak = 0
+        
+        async def work(i):
+            nonlocal peak
+            await limiter.aacquire()
+            peak = max(peak, limiter.in_flight)
+            order.append(i)
+            await asyncio.sleep(0.001)
+            limiter.release()
+        
+        async def main():
+            await asyncio.gather(*(work(i) for i in range(20)))
+            
+            limiter.acquire()
+            limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            limiter.release()
+            limiter.release()
+            await asyncio.sleep(0)
+        
+        asyncio.run(main())
+        assert order == list(range(20))
+        assert peak == 2
+        assert limiter.in_flight == 0
+    
+    def test_request_slots_cap_threads_and_coroutines_together(self):
+        """Test sync and async holders of RequestSlots share one limit."""
+        slots = RequestSlots(2)
+        peak = 0
+        lock = threading.Lock()
+        
+        def note_peak():
+            nonlocal peak
+            with lock:
+                peak = max(peak, slots.in_flight)
+        
+        def sync_work():
+            with slots:
+                note_peak()
+                time.sleep(0.005)
+        
+        async def async_work():
+            async with slots:
+                note_peak()
+                await asyncio.sleep(0.005)
+        
+        async def main():
+            await asyncio.gather(*(async_work() for _ in range(8)))
+        
+        threads = [threading.Thread(target=sync_work) for _ in range(8)]
+        threads.append(threading.Thread(target=asyncio.run, args=(main(),)))
+        for thread in threads:
+            thread.start()
+        asyncio.run(main())
+        for thread in threads:
+            thread.join()
+        
+        assert peak == 2
+        assert slots.in_flight == 0
+    
+    def test_agent_clients_share_one_limiter(self, monkeypatch):
+        """Test the agent's sync and async clients draw on the same rate limits."""
+        monkeypatch.setattr(llm_client, "ANTHROPIC_AVAILABLE", True)
+        monkeypatch.setattr(llm_client, "Anthropic", lambda **kwargs: SimpleNamespace(), raising=False)
+        monkeypatch.setattr(llm_client, "AsyncAnthropic", lambda **kwargs: SimpleNamespace(), raising=False)
+        agent = IntelligentFormAgent(api_key="test-key", form_store=MemoryFormStore())
+        
+        assert agent.llm.rate_limiter is agent.async_llm.rate_limiter
+    
+    def test_call_retries_throttled_requests(self):
+        """Test 429s are retried with backoff and non-transient errors are not."""
+        limiter = RateLimiter(base_delay=0, max_delay=0, initial_concurrency=8)
+        attempts = []
+        
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise APIStatusError(429)
+            return "ok"
+        
+        assert limiter.call(flaky) == "ok"
+        stats = limiter.get_stats()
+        assert stats["retries"] == 2
+        assert stats["throttled"] == 2
+        assert stats["concurrency_limit"] == 2
+        
+        with pytest.raises(APIStatusError):
+            limiter.call(lambda: (_ for _ in ()).throw(APIStatusError(400)))
+        assert limiter.get_stats()["retries"] == 2
+    
+    def test_cancelled_calls_release_their_slots(self):
+        """Test a timed-out acall frees its concurrency slot for the next call."""
+        limiter = RateLimiter(initial_concurrency=2)
+        
+        async def hang():
+            await asyncio.sleep(10)
+        
+        async def ok():
+            return "ok"
+        
+        async def main():
+            for _ in range(2):
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(limiter.acall(hang), timeout=0.01)
+            return await asyncio.wait_for(limiter.acall(ok), timeout=1)
+        
+        assert asyncio.run(main()) == "ok"
+        assert limiter.get_stats()["in_flight"] == 0
+    
+    def test_backoff_honours_retry_after(self):
+        """Test a retry-after header sets the minimum delay."""
+        limiter = RateLimiter(base_delay=0.001, max_delay=0.001)
+        
+        assert limiter.backoff(0, APIStatusError(429, retry_after=7)) == 7
+        assert limiter.backoff(5) <= 0.001
+    
+    def test_client_retries_through_limiter(self, claude_client):
+        """Test ClaudeClient recovers from an overloaded response."""
+        claude_client.rate_limiter = RateLimiter(base_delay=0, max_delay=0)
+        create = claude_client.fake_messages.create
+        failures = [APIStatusError(529)]
+        
+        def overloaded_once(**params):
+            if failures:
+                raise failures.pop()
+            return create(**params)
+        
+        claude_client.fake_messages.create = overloaded_once
+        result = claude_client.generate_structured("What?", {"type": "object"})
+        
+        assert result["answer"] == "42"
+        assert claude_client.rate_limiter.get_stats()["retries"] == 1
+
+
+class TestResponseCache:
+    """Tests for the deterministic LLM response cache."""
+    
+    SCHEMA = {"type": "object", "properties": {"answer": {"type": "string"}}}
+    
+    def test_identical_structured_requests_hit_cache(self, claude_client):
+        """Test a repeated temperature-0 request is served without an API call."""
+        claude_client.response_cache = ResponseCache()
+        
+        first = claude_client.generate_structured("What?", self.SCHEMA, system="S")
+        second = claude_client.generate_structured("What?", self.SCHEMA, system="S")
+        claude_client.generate_structured("What?", self.SCHEMA, system="S", temperature=0.7)
+        
+        assert first == second
+        assert len(claude_client.fake_messages.requests) == 2
+        stats = claude_client.response_cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    def test_cached_result_is_isolated_from_callers(self, claude_client):
+        """Test mutating a returned result does not change later cache hits."""
+        claude_client.response_cache = ResponseCache()
+        
+        first = claude_client.generate_structured("What?", self.SCHEMA)
+        first["answer"] = "POISONED"
+        
+        assert claude_client.generate_structured("What?", self.SCHEMA)["answer"] == "42"
+    
+    def test_disk_tier_survives_new_cache_instance(self):
+        """Test entries persist on disk across cache instances."""
+        with tempfile.TemporaryDirectory() as tmp:
+            ResponseCache(cache_dir=tmp).set("k", {"answer": "42"})
+            fresh = ResponseCache(cache_dir=tmp)
+            
+            assert fresh.get("k") == {"answer": "42"}
+            assert fresh.get_stats()["disk_hits"] == 1
+            assert fresh.get("k") == {"answer": "42"}
+            assert fresh.get_stats()["memory_hits"] == 1
+    
+    def test_ttl_expires_entries(self):
+        """Test expired entries are treated as misses."""
+        cache = ResponseCache(ttl_seconds=0)
+        cache.set("k", {"answer": "42"})
+        time.sleep(0.01)
+        
+        assert cache.get("k") is None
+
+
 class TestTools:
     """Tests for LLM-powered tools with mock client."""
     
@@ -144,6 +762,89 @@ class TestTools:
         assert result.fields is not None
         assert len(self.mock_llm.call_history) == 1
     
+    def test_long_document_extracted_in_chunks(self):
+        """Test long documents are split by page and every page is covered."""
+        class PageLLM(MockLLMClient):
+            def generate_structured(self, prompt, schema, system=None, **kwargs):
+                super().generate_structured(prompt, schema, system, **kwargs)
+                fields = {f"Page {p.split(']')[0]} total": p.split("]")[0] for p in prompt.split("[Page ")[1:]}
+                fields["Claim ID"] = "C-1"
+                return {"fields": fields, "form_type": "claim", "confidence": 0.8, "reasoning": ""}
+        
+        llm = PageLLM()
+        pages = [f"Line item {n}\n" + "x" * 3000 for n in range(6)]
+        doc = ExtractedDocument("claim.pdf", "pdf", "\n\n".join(pages), pages=pages)
+        result = FieldExtractionTool(llm).run(doc)
+        
+        assert result.chunks == len(llm.call_history) == 3
+        assert result.fields["Page 6 total"] == "6"
+        assert result.fields["Claim ID"] == "C-1"
+        assert result.form_type == "claim"
+        assert not result.conflicts
+    
+    def test_merge_extractions_resolves_conflicts(self):
+        """Test majority vote, then chunk confidence, decides conflicting values."""
+        merged = merge_extractions([
+            ExtractionResult({"Total": "$10", "Name": "Ann"}, "invoice", 0.6, ""),
+            ExtractionResult({"total": "$12", "name": "ann "}, "invoice", 0.9, ""),
+            ExtractionResult({"TOTAL": "$10", "Date": ""}, "unknown", 0.7, "")
+        ])
+        
+        assert merged.fields == {"Total": "$10", "Name": "Ann"}
+        assert merged.conflicts == {"Total": ["$10", "$12"]}
+        assert merged.form_type == "invoice"
+        assert merged.chunks == 3
+    
+    def test_chunk_document_packs_pages_and_tables(self):
+        """Test pages are packed within budget and tables get their own chunk."""
+        doc = ExtractedDocument(
+            "f.pdf", "pdf", "", pages=["a" * 40, "b" * 40, "c" * 150, ""],
+            tables=[[["k", "v"]]] * 5
+        )
+        chunks = chunk_document(doc, max_chars=100)
+        
+        assert [c.pages for c in chunks if c.kind == "text"] == [[1, 2], [3], [3]]
+        assert all(len(c.text) <= 100 for c in chunks)
+        assert chunks[-1].kind == "tables"
+        assert split_text("p1\n\n" + "l" * 12, 10) == ["p1", "l" * 10, "ll"]
+    
+    def test_bm25_ranks_matching_passage(self):
+        """Test the index finds the passage mentioning the query terms."""
+        pages = [f"Section {n}: routine boilerplate text about policies." for n in range(8)]
+        pages[6] = "Section 6: Deductible amount is $2,500 per claim."
+        index = BM25Index.from_document(ExtractedDocument("c.pdf", "pdf", "", pages=pages), passage_chars=70)
+        
+        hits = index.search("What is the deductible amount?", k=2)
+        assert hits[0][1]["pages"] == [7]
+        
+        restored = BM25Index.from_dict(json.loads(json.dumps(index.to_dict())))
+        assert restored.search("deductible", k=1)[0][1]["pages"] == [7]
+    
+    def test_qa_tool_sends_only_top_passages(self):
+        """Test indexed QA prompts carry the relevant passages, not the whole document."""
+        pages = [f"Page {n} filler " * 40 for n in range(10)]
+        pages[8] = "Beneficiary name: Jane Roe. Relationship: spouse."
+        doc = ExtractedDocument("c.pdf", "pdf", "\n".join(pages), pages=pages)
+        index = BM25Index.from_document(doc, passage_chars=600)
+        tool = QuestionAnsweringTool(self.mock_llm)
+        
+        tool.run("Who is the beneficiary?", doc, {"Beneficiary": "Jane Roe", "Policy": "P-9"}, index=index)
+        prompt = self.mock_llm.call_history[-1]["prompt"]
+        
+        assert "Jane Roe" in prompt
+        assert prompt.count("<excerpt") <= QuestionAnsweringTool.TOP_K_PASSAGES
+        assert "P-9" not in prompt
+        assert len(prompt) < len(doc.raw_text) / 2
+    
+    def test_relevant_fields_match_whole_values(self):
+        """Test short or partial values do not pull fields into every prompt."""
+        passages = [{"text": "Box 1 wages: 50,000. Married: Y. Employer: Acme Corp"}]
+        fields = {"Dependents": "1", "Married": "Y", "Employer": "Acme Corp", "Code": "cme", "Wages": "50,000"}
+        
+        relevant = QuestionAnsweringTool._relevant_fields("Who filed?", passages, fields)
+        
+        assert relevant == {"Employer": "Acme Corp", "Wages": "50,000"}
+    
     def test_qa_tool(self):
         """Test question answering tool."""
         tool = QuestionAnsweringTool(self.mock_llm)
@@ -180,6 +881,83 @@ class TestTools:
         
         assert result.answer is not None
         assert result.insights is not None
+    
+    def test_parse_number(self):
+        """Test amount strings parse and identifiers/dates do not."""
+        assert parse_number("$1,234.56") == 1234.56
+        assert parse_number("(1,200)") == -1200
+        assert parse_number("12.5%") == 12.5
+        assert parse_number("3000 USD") == 3000
+        assert parse_number("2024-01-15") is None
+        assert parse_number("123-45-6789") is None
+        assert parse_number(True) is None
+    
+    def test_compute_statistics(self):
+        """Test exact statistics, identifier exclusion and IQR outliers."""
+        fields_list = [
+            {"Gross Pay": "$1,000", "Policy Number": "123"},
+            {"gross pay": "2000", "Policy Number": "456"},
+            {"Gross Pay": "$3,000.50"},
+            {"Gross Pay": 50000},
+            {"Gross Pay": "2500", "Name": "Eve"}
+        ]
+        stats = compute_statistics(fields_list, ["a", "b", "c", "d", "e"])
+        
+        assert list(stats["fields"]) == ["Gross Pay"]
+        pay = stats["fields"]["Gross Pay"]
+        assert pay["count"] == 5 and pay["total"] == 58500.5
+        assert pay["median"] == 2500 and pay["p25"] == 2000
+        assert pay["max_document"] == "d"
+        assert pay["outliers"] == [{"document": "d", "value": 50000.0}]
+    
+    def test_compute_statistics_skips_identifiers_not_amounts(self):
+        """Test identifiers are recognised by their last word and gaps are ignored."""
+        fields_list = [
+            {"Account Balance": "$1,200", "Account Number": "1001", "Zip Code": "10001", "Tax Year": "2024"},
+            {"Account Balance": "800", "Account Number": "1002", "Zip Code": "10002", "Tax Year": "2024"},
+            {"Account Number": "1003"}
+        ]
+        stats = compute_statistics(fields_list)
+        
+        assert list(stats["fields"]) == ["Account Balance"]
+        balance = stats["fields"]["Account Balance"]
+        assert balance["count"] == 2 and balance["missing"] == 1
+        assert balance["mean"] == 1000 and balance["std"] == 200
+    
+    def test_cross_document_statistics_computed_locally(self):
+        """Test statistics come from local computation and are given to the LLM."""
+        tool = CrossDocumentAnalysisTool(self.mock_llm)
+        result = tool.run(
+            question="What is the average salary?",
+            documents=[self.sample_doc, self.sample_doc],
+            extracted_fields_list=[{"Salary": "$110,000"}, {"Salary": "$80,000"}]
+        )
+        
+        assert result.statistics["fields"]["Salary"]["mean"] == 95000
+        prompt = self.mock_llm.call_history[-1]["prompt"]
+        assert "<computed_statistics>" in prompt and "95000" in prompt
+        assert "statistics" not in CrossDocumentAnalysisTool.OUTPUT_SCHEMA["properties"]
+    
+    def test_cross_document_map_reduce(self):
+        """Test large document sets are analyzed in groups and reduced hierarchically."""
+        tool = CrossDocumentAnalysisTool(self.mock_llm)
+        docs = [ExtractedDocument(f"form{i}.txt", "txt", f"Salary: {1000 + i}") for i in range(10)]
+        fields_list = [{"Employee": f"E{i}", "Salary": f"${1000 + i}"} for i in range(10)]
+        tool.GROUP_CHARS = 2 * len(json.dumps(tool._summarize(docs[0], fields_list[0]), indent=2))
+        tool.REDUCE_FANOUT = 2
+        
+        result = tool.run("What is the average salary?", docs, fields_list)
+        
+        assert result.groups == 5
+        # 5 groups reduce as 2+2+1 -> 2+1 -> 1; singletons pass through without a call
+        assert result.calls == len(self.mock_llm.call_history) == 5 + 2 + 1 + 1
+        assert "group 1 of 5" in self.mock_llm.call_history[0]["prompt"]
+        final_prompt = self.mock_llm.call_history[-1]["prompt"]
+        assert "<partial_analyses>" in final_prompt and "covering 10 documents" in final_prompt
+        assert result.statistics["fields"]["Salary"]["count"] == 10
+        
+        async_result = asyncio.run(tool.arun("What is the average salary?", docs, fields_list))
+        assert (async_result.groups, async_result.calls) == (5, 9)
 
 
 class TestToolDefinitions:
@@ -256,6 +1034,680 @@ class TestAgentIntegration:
             os.unlink(temp_path)
 
 
+class TestFieldLookup:
+    """Tests for answering plain field lookups without the LLM."""
+    
+    FIELDS = {
+        "Employee SSN": "XXX-XX-1234",
+        "Employee Name": "John Doe",
+        "Employer Name": "Acme Corp",
+        "Box 1 - Wages": "50,000",
+        "Box 10": "5"
+    }
+    
+    def make_document(self):
+        return ExtractedDocument("w2.txt", "text", "W-2 wage statement")
+    
+    def make_form(self):
+        return ProcessedForm(
+            file_path="w2.txt", file_type="text", raw_text="W-2", extracted_fields=dict(self.FIELDS),
+            form_type="W-2", extraction_confidence=0.9, tables=[], metadata={}
+        )
+    
+    def test_match_field(self):
+        """Test normalized, number-aware and ambiguity-aware matching."""
+        assert match_field("What is the Employee SSN?", self.FIELDS).name == "Employee SSN"
+        assert match_field("what's the employee's ssn", self.FIELDS).name == "Employee SSN"
+        assert match_field("What is Box 1?", self.FIELDS).name == "Box 1 - Wages"
+        assert match_field("What is box 10 on this form?", self.FIELDS).name == "Box 10"
+        assert match_field("What is the name?", self.FIELDS) is None
+        assert match_field("Why is Box 1 so high?", self.FIELDS) is None
+        assert match_field("What is the employee name and SSN?", self.FIELDS) is None
+    
+    def test_match_field_rejects_near_names(self):
+        """Test a one-word difference or a broader field name never matches."""
+        fields = {
+            "employee_name": "John Doe",
+            "employee_ssn": "XXX-XX-1234",
+            "employer_ein": "12-3456789",
+            "date_of_birth": "1990-01-01"
+        }
+    
+        assert match_field("What is the employer name?", fields) is None
+        assert match_field("What is the employer ssn?", fields) is None
+        assert match_field("What was the employer?", fields) is None
+        assert match_field("What is the date?", fields) is None
+        assert match_field("What is the date of birth?", fields).name == "date_of_birth"
+        assert match_field("What is the employee's SSN?", fields).name == "employee_ssn"
+    
+    def test_ask_answers_lookup_locally(self):
+        """Test ask skips the LLM for a clear lookup and falls back otherwise."""
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore())
+        form = self.make_form()
+        
+        result = agent.ask("What is the Employee SSN?", form)
+        assert result.answer == "XXX-XX-1234"
+        assert result.evidence == ["Employee SSN: XXX-XX-1234"]
+        assert llm.call_history == []
+        
+        agent.ask("What is the employer's tax situation like overall?", form)
+        assert len(llm.call_history) == 1
+        assert agent.get_stats()["local_answers"] == 1
+        assert agent.total_llm_calls == 1
+    
+    def test_ask_many_uses_one_call(self):
+        """Test ask_many answers lookups locally and the rest in one call, in order."""
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore())
+        questions = ["Is this form complete?", "What is the Employee SSN?", "Who signed it?", "Is it dated?"]
+        
+        results = agent.ask_many(questions, self.make_form())
+        
+        assert [r.answer for r in results] == ["Mock answer 1", "XXX-XX-1234", "Mock answer 2", "Mock answer 3"]
+        assert len(llm.call_history) == 1
+        assert agent.total_llm_calls == 1
+    
+    def test_run_many_splits_when_output_is_cut_short(self):
+        """Test unanswered questions are retried in smaller groups."""
+        class TruncatingLLM(MockLLMClient):
+            max_tokens = 1500
+            
+            def generate_structured(self, prompt, schema, system=None, **kwargs):
+                result = super().generate_structured(prompt, schema, system, **kwargs)
+                if "answers" not in result:
+                    return result
+                if len(result["answers"]) > 3:
+                    raise ValueError("Failed to parse JSON response")
+                result["answers"] = result["answers"][:2]
+                return result
+        
+        llm = TruncatingLLM()
+        tool = QuestionAnsweringTool(llm)
+        questions = [f"Question {n}?" for n in range(6)]
+        
+        results, calls = tool.run_many(questions, self.make_document())
+        
+        assert tool._questions_per_call() == 4
+        assert len(results) == 6 and all(r.answer.startswith("Mock answer") for r in results)
+        assert calls == len(llm.call_history)
+        assert calls < 6 * 2
+    
+    def test_lookup_can_be_disabled(self):
+        """Test field_lookup_threshold=None always calls the LLM."""
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore(), field_lookup_threshold=None)
+        
+        agent.ask("What is the Employee SSN?", self.make_form())
+        assert len(llm.call_history) == 1
+
+
+
+class TestTemplates:
+    """Tests for learned form templates."""
+    
+    SAMPLES = Path(__file__).parent.parent / "data" / "sample_forms"
+    
+    class LabelLLM(MockLLMClient):
+        """Extracts "Label: value" lines, returning amounts as numbers."""
+        
+        def generate_structured(self, prompt, schema, system=None, **kwargs):
+            super().generate_structured(prompt, schema, system, **kwargs)
+            document = prompt.split("<document>")[1].split("</document>")[0]
+            fields = {}
+            for line in document.splitlines():
+                label, sep, value = line.partition(":")
+                if sep and value.strip():
+                    fields[label.strip()] = value.strip()
+            if "Annual Salary" in fields:
+                fields["Annual Salary"] = float(fields["Annual Salary"].strip("$").replace(",", ""))
+            form_type = "W-2" if "W-2" in document else "Employee Onboarding"
+            return {"fields": fields, "form_type": form_type, "confidence": 0.9, "reasoning": ""}
+    
+    def test_label_values_numbers_repeated_labels(self):
+        """Test repeated labels keep their position in the layout."""
+        pairs = label_values("Date: 01/02/2024\nName: A\nDate: 03/04/2024\n10:30 meeting")
+        assert pairs == {"date": "01/02/2024", "name": "A", "date #2": "03/04/2024"}
+    
+    def test_learned_template_skips_llm(self, tmp_path):
+        """Test forms of a learned layout are extracted locally and others use the LLM."""
+        llm = self.LabelLLM()
+        library = TemplateLibrary(str(tmp_path / "templates.json"))
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore(), template_library=library)
+        
+        agent.process_form(str(self.SAMPLES / "onboarding_1.txt"))
+        agent.process_form(str(self.SAMPLES / "onboarding_2.txt"))
+        form = agent.process_form(str(self.SAMPLES / "onboarding_3.txt"))
+        assert agent.total_llm_calls == len(llm.call_history) == 2
+        
+        expected = llm.generate_structured(FieldExtractionTool(llm)._build_prompt(
+            DocumentProcessor().process(str(self.SAMPLES / "onboarding_3.txt"))), {})
+        assert form.extracted_fields == expected["fields"]
+        assert isinstance(form.extracted_fields["Annual Salary"], float)
+        assert form.form_type == "Employee Onboarding"
+        assert form.metadata["extraction_template"] == "employee onboarding"
+        
+        agent.process_form(str(self.SAMPLES / "sample_w2.txt"))
+        assert agent.total_llm_calls == 3
+        assert agent.get_stats()["templates"]["hits"] == 1
+        
+        # Templates persist, and are dropped when the prompt version changes
+        assert len(TemplateLibrary(str(tmp_path / "templates.json"))) == 2
+        assert len(TemplateLibrary(str(tmp_path / "templates.json"), version="other")) == 0
+    
+    def test_validation_failure_falls_back_to_llm(self, tmp_path):
+        """Test a value that breaks the learned kind sends the form to the LLM."""
+        llm = self.LabelLLM()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore(),
+                                     template_library=TemplateLibrary())
+        agent.process_form(str(self.SAMPLES / "onboarding_1.txt"))
+        agent.process_form(str(self.SAMPLES / "onboarding_2.txt"))
+        
+        text = (self.SAMPLES / "onboarding_3.txt").read_text().replace("Start Date: ", "Start Date: pending ")
+        path = tmp_path / "onboarding_4.txt"
+        path.write_text(text)
+        form = agent.process_form(str(path))
+        
+        assert agent.total_llm_calls == 3
+        assert form.metadata["extraction_template"] is None
+    
+    def test_field_without_rule_falls_back_to_llm(self):
+        """Test a template is not used when the LLM always returns a field it cannot fill."""
+        class DerivingLLM(self.LabelLLM):
+            def generate_structured(self, prompt, schema, system=None, **kwargs):
+                result = super().generate_structured(prompt, schema, system, **kwargs)
+                result["fields"]["Risk Tier"] = "derived"
+                return result
+        
+        llm = DerivingLLM()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore(),
+                                     template_library=TemplateLibrary())
+        for name in ("onboarding_1.txt", "onboarding_2.txt", "onboarding_3.txt"):
+            form = agent.process_form(str(self.SAMPLES / name))
+        
+        assert agent.total_llm_calls == 3
+        assert form.extracted_fields["Risk Tier"] == "derived"
+        assert form.metadata["extraction_template"] is None
+
+
+
+class TestClassifier:
+    """Tests for the local form-type classifier."""
+    
+    TEXTS = {
+        "W-2": "Wage and Tax Statement Form W-2 Employee SSN: {n} Box 1 Wages: ${n}",
+        "Insurance Claim": "INSURANCE CLAIM FORM Policy Number: {n} Claim Amount: ${n} Date of Loss",
+        "Employee Onboarding": "EMPLOYEE ONBOARDING FORM Full Name: {n} Start Date Benefits Enrollment"
+    }
+    
+    def test_predicts_trained_types(self):
+        """Test held-out documents are classified and the model round-trips."""
+        texts = [t.format(n=n) for t in self.TEXTS.values() for n in range(3)]
+        labels = [label for label in self.TEXTS for _ in range(3)]
+        classifier = FormTypeClassifier().fit(texts, labels)
+        
+        assert classifier.classify("Form W-2 Wage and Tax Statement Box 1 Wages: $999") == "W-2"
+        assert classifier.predict("claim form, policy number 77")[0] == "Insurance Claim"
+        
+        restored = FormTypeClassifier.from_dict(json.loads(json.dumps(classifier.to_dict())))
+        assert restored.predict_proba("onboarding form") == classifier.predict_proba("onboarding form")
+    
+    def test_needs_two_types(self):
+        """Test training on a single form type is rejected."""
+        with pytest.raises(ValueError):
+            FormTypeClassifier().fit(["a", "b"], ["W-2", "w-2"])
+    
+    def test_agent_trains_from_store_and_hints_extraction(self, tmp_path):
+        """Test the agent trains on stored forms and passes its prediction to the prompt."""
+        store = SQLiteFormStore(str(tmp_path / "forms.db"))
+        for i, (label, text) in enumerate((l, t) for l, t in self.TEXTS.items() for _ in range(2)):
+            store.put(str(i), {"file_path": f"{i}.txt", "form_type": label, "raw_text": text.format(n=i)})
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=store)
+        
+        classifier = agent.train_classifier()
+        assert classifier.labels == sorted(self.TEXTS)
+        
+        path = tmp_path / "claim.txt"
+        path.write_text("INSURANCE CLAIM FORM\nPolicy Number: 123\nClaim Amount: $500")
+        form = agent.process_form(str(path))
+        
+        assert form.metadata["predicted_form_type"] == "Insurance Claim"
+        assert "Predicted form type: Insurance Claim" in llm.call_history[0]["prompt"]
+        store.close()
+
+
+
+class TestIntentRouter:
+    """Tests for local workflow task routing."""
+    
+    @pytest.mark.parametrize("task,question,num_docs,intent", [
+        ("Extract the fields", None, 3, "extract"),
+        ("Summarize these forms", None, 2, "summarize"),
+        ("Compare salaries", None, 3, "analyze"),
+        ("What is the average salary across all forms?", None, 3, "analyze"),
+        ("Answer this", "What is the total amount?", 1, "qa"),
+        ("Which employee has the highest salary?", None, 5, "analyze"),
+        ("How many forms have a salary above 50000?", None, 5, "analyze"),
+        ("What is the employee name?", None, 5, "qa")
+    ])
+    def test_routes_clear_tasks_locally(self, task, question, num_docs, intent):
+        """Test clear tasks are routed without the LLM."""
+        assert IntentRouter().route(task, question, num_docs).intent == intent
+    
+    def test_unclear_task_is_left_to_llm(self):
+        """Test an ambiguous task returns no local decision."""
+        assert IntentRouter().route("Do something with these", num_docs=2) is None
+    
+    def test_fallbacks_retrain_in_batches(self):
+        """Test the classifier is only retrained every retrain_every LLM answers."""
+        router = IntentRouter(retrain_every=2)
+        original = router.classifier
+        router.record_fallback("Do something with these", None, "extract")
+        assert router.classifier is original
+        router.record_fallback("Handle these please", None, "extract")
+        assert router.classifier is not original
+        assert router.get_stats()["llm_fallbacks"] == 2
+    
+    def test_workflow_routes_locally_and_falls_back(self):
+        """Test run_workflow skips the task LLM call when confident and learns from fallbacks."""
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore())
+        paths = []
+        for i in range(2):
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                f.write(f"Employee {i}\nSalary: ${i + 5},000")
+                paths.append(f.name)
+        
+        def task_calls():
+            return sum(1 for call in llm.call_history if "task_type" in str(call.get("schema")))
+        
+        try:
+            assert agent.run_workflow("Compare salaries", paths)["type"] == "analysis"
+            assert task_calls() == 0
+            
+            assert agent.run_workflow("Do something with these", paths)["type"] == "extraction"
+            assert task_calls() == 1
+            assert agent.intent_router.examples[-1] == ("Do something with these", "extract")
+            
+            stats = agent.get_stats()["intent_router"]
+            assert (stats["routed_locally"], stats["llm_fallbacks"], stats["hit_rate"]) == (1, 1, 0.5)
+        finally:
+            for p in paths:
+                os.unlink(p)
+
+
+class TestModelRouter:
+    """Tests for per-tool model tiering and extraction escalation."""
+    
+    def router(self, **kwargs):
+        return ModelRouter(fast_model="fast", standard_model="standard", strong_model="strong", **kwargs)
+    
+    def test_select_by_tool_and_size(self):
+        """Test short inputs and brief summaries use the fast model and long extractions the strong one."""
+        router = self.router(short_chars=100, long_chars=1000)
+        assert router.select("extract_fields", 50) == "fast"
+        assert router.select("extract_fields", 500) == "standard"
+        assert router.select("extract_fields", 5000) == "strong"
+        assert router.select("summarize_document", 5000, "brief") == "fast"
+        assert router.select("summarize_document", 5000, "detailed") == "standard"
+        assert router.select("answer_question", 50) == "standard"
+        assert router.select("route_task") == "fast"
+        assert router.escalate("fast") == "standard"
+        assert router.escalate("strong") is None
+    
+    def test_low_confidence_extraction_escalates(self):
+        """Test an extraction below the threshold is retried one tier up and counted."""
+        llm = MockLLMClient()  # field extractions come back with confidence 0
+        agent = IntelligentFormAgent(
+            llm_client=llm, form_store=MemoryFormStore(), model_router=self.router()
+        )
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write("Name: John Doe\nAmount: $1,000")
+        try:
+            form = agent.process_form(f.name)
+        finally:
+            os.unlink(f.name)
+        
+        assert [call["model"] for call in llm.call_history] == ["fast", "standard"]
+        assert form.metadata["extraction_model"] == "standard"
+        assert agent.total_llm_calls == 2
+        assert agent.get_stats()["model_router"] == {
+            "selections": {"fast": 1, "standard": 1}, "escalations": 1
+        }
+    
+    def test_confident_extraction_keeps_model(self):
+        """Test an extraction above the threshold makes a single call."""
+        llm = MockLLMClient()
+        tool = FieldExtractionTool(llm, model_router=self.router(escalation_threshold=0.0))
+        document = ExtractedDocument("form.txt", "txt", "Name: John Doe")
+        
+        result = tool.run(document)
+        assert (result.model, result.escalated_from, result.llm_calls) == ("fast", None, 1)
+        assert len(llm.call_history) == 1
+    
+    def test_brief_summary_uses_fast_model(self):
+        """Test summary style picks the model for a long document."""
+        llm = MockLLMClient()
+        tools = get_all_tools(llm, model_router=self.router(short_chars=10))
+        document = ExtractedDocument("form.txt", "txt", "x" * 100)
+        
+        tools["summarize_document"].run(document, style="brief")
+        tools["summarize_document"].run(document, style="detailed")
+        assert [call["model"] for call in llm.call_history] == ["fast", "standard"]
+    
+    def test_analysis_groups_routed_by_prompt_size(self):
+        """Test each map/reduce call is routed by its own prompt, not the whole document set."""
+        llm = MockLLMClient()
+        router = self.router(short_chars=1000, tool_tiers={"analyze_documents": ("fast", "strong")})
+        tool = CrossDocumentAnalysisTool(llm, model_router=router)
+        docs = [ExtractedDocument(f"form{i}.txt", "txt", f"Salary: {1000 + i}\n" + "x" * 5000) for i in range(10)]
+        fields_list = [{"Salary": f"${1000 + i}"} for i in range(10)]
+        tool.GROUP_CHARS = 2 * len(json.dumps(tool._summarize(docs[0], fields_list[0]), indent=2))
+        
+        tool.run("What is the average salary?", docs, fields_list)
+        
+        assert sum(len(doc.raw_text) for doc in docs) > router.long_chars
+        assert {call["model"] for call in llm.call_history} == {"standard"}
+
+
+class TestFormStore:
+    """Tests for processed form persistence."""
+    
+    def write_form(self, content="Employee: John\nSalary: $50,000"):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write(content)
+            return f.name
+    
+    def test_sqlite_store_lru_cap(self):
+        """Test the SQLite store evicts least recently used forms beyond its cap."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteFormStore(os.path.join(tmp, "forms.db"), max_entries=2)
+            store.put("a", {"file_path": "a.txt"})
+            store.put("b", {"file_path": "b.txt"})
+            store.get("a")
+            store.put("c", {"file_path": "c.txt"})
+            
+            assert len(store) == 2
+            assert store.get("b") is None
+            assert store.get("a") == {"file_path": "a.txt"}
+            assert store.file_paths(limit=1) == ["a.txt"]
+            assert store.file_paths() == ["a.txt", "c.txt"]
+            store.close()
+    
+    def test_memory_store_ttl(self):
+        """Test expired forms are not returned."""
+        store = MemoryFormStore(ttl_seconds=0)
+        store.put("a", {"file_path": "a.txt"})
+        
+        assert store.get("a") is None
+    
+    def test_process_form_served_from_store_across_agents(self):
+        """Test a second agent reuses a stored form without calling the LLM."""
+        path = self.write_form()
+        copy = self.write_form()
+        
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                db = os.path.join(tmp, "forms.db")
+                first_llm = MockLLMClient()
+                first = IntelligentFormAgent(llm_client=first_llm, form_store=SQLiteFormStore(db))
+                form = first.process_form(path)
+                
+                second_llm = MockLLMClient()
+                second = IntelligentFormAgent(llm_client=second_llm, form_store=SQLiteFormStore(db))
+                cached = second.process_form(copy)
+                
+                assert len(first_llm.call_history) == 1
+                assert len(second_llm.call_history) == 0
+                assert cached.extracted_fields == form.extracted_fields
+                assert cached.file_path == copy
+                assert cached.chunk_index == form.chunk_index
+                assert cached.chunk_index["passages"]
+                assert "chunk_index" not in form.to_dict()
+        finally:
+            os.unlink(path)
+            os.unlink(copy)
+
+
+class TestConcurrentProcessing:
+    """Tests for concurrent batch processing."""
+    
+    class SlowMockLLMClient(MockLLMClient):
+        """Mock client that records peak in-flight requests."""
+        
+        def __init__(self):
+            super().__init__()
+            self.lock = threading.Lock()
+            self.in_flight = 0
+            self.peak = 0
+        
+        def generate_structured(self, prompt, schema, system=None, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            time.sleep(0.02)
+            with self.lock:
+                self.in_flight -= 1
+            return super().generate_structured(prompt, schema, system, **kwargs)
+    
+    def test_process_forms_bounded_and_ordered(self):
+        """Test batch results keep input order and respect the LLM cap."""
+        llm = self.SlowMockLLMClient()
+        agent = IntelligentFormAgent(
+            llm_client=llm,
+            form_store=MemoryFormStore(),
+            max_workers=8,
+            max_concurrent_llm_calls=2
+        )
+        paths = []
+        for i in range(6):
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                f.write(f"Form number {i}")
+                paths.append(f.name)
+        
+        try:
+            forms = agent.process_forms(paths)
+            
+            assert [f.file_path for f in forms] == paths
+            assert llm.peak <= 2
+            assert agent.total_llm_calls == 6
+        finally:
+            for p in paths:
+                os.unlink(p)
+    
+    def test_chunked_extraction_respects_llm_cap(self):
+        """Test every chunk request takes its own slot, sync and async."""
+        llm = self.SlowMockLLMClient()
+        agent = IntelligentFormAgent(
+            llm_client=llm,
+            form_store=MemoryFormStore(),
+            max_workers=4,
+            max_concurrent_llm_calls=2
+        )
+        agent.extraction_tool.CHUNK_CHARS = 100
+        paths = []
+        for i in range(4):
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                f.write("\n\n".join(f"Section {j} of form {i}: " + "x" * 70 for j in range(4)))
+                paths.append(f.name)
+        
+        try:
+            agent.process_forms(paths)
+            assert len(llm.call_history) > len(paths)
+            assert llm.peak <= 2
+            
+            async def reprocess():
+                await asyncio.gather(*(agent.aprocess_form(p, force_reprocess=True) for p in paths))
+            
+            llm.peak = 0
+            asyncio.run(reprocess())
+            assert llm.peak <= 2
+            assert agent.total_llm_calls == len(llm.call_history)
+        finally:
+            for p in paths:
+                os.unlink(p)
+    
+    def test_process_forms_reports_failures(self):
+        """Test one bad file does not abort the rest of the batch."""
+        agent = IntelligentFormAgent(llm_client=MockLLMClient(), form_store=MemoryFormStore())
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write("Name: Alice")
+            good = f.name
+        
+        try:
+            results = agent.process_forms([good, "missing.txt"], return_exceptions=True)
+            
+            assert isinstance(results[0], ProcessedForm)
+            assert isinstance(results[1], FileNotFoundError)
+            
+            with pytest.raises(FormProcessingError) as raised:
+                agent.process_forms([good, "missing.txt"])
+            assert isinstance(raised.value.results[0], ProcessedForm)
+            assert list(raised.value.failures) == ["missing.txt"]
+            assert isinstance(raised.value.__cause__, FileNotFoundError)
+        finally:
+            os.unlink(good)
+
+
+class TestBatchProcessing:
+    """Tests for Message Batches extraction against the local batch server."""
+    
+    def test_process_forms_batch_maps_results_back(self):
+        """Test batch results map to forms in input order, with per-form failures."""
+        def responder(params):
+            prompt = params["messages"][0]["content"]
+            if "BROKEN" in prompt:
+                raise RuntimeError("overloaded")
+            name = "Alice" if "Alice" in prompt else "Bob"
+            return json.dumps({
+                "fields": {"Name": name},
+                "form_type": "onboarding",
+                "confidence": 0.9,
+                "reasoning": "batch"
+            })
+        
+        server = LocalBatchServer(responder, polls_until_done=2)
+        batch = BatchClient(server, model="local-model", poll_interval=0, max_batch_size=2)
+        agent = IntelligentFormAgent(llm_client=MockLLMClient(), form_store=MemoryFormStore())
+        
+        paths = []
+        for content in ["Name: Alice", "Name: Bob", "BROKEN"]:
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                f.write(content)
+                paths.append(f.name)
+        
+        try:
+            results = agent.process_forms_batch(paths, batch_client=batch, return_exceptions=True)
+            
+            assert results[0].extracted_fields == {"Name": "Alice"}
+            assert results[1].extracted_fields == {"Name": "Bob"}
+            assert isinstance(results[2], RuntimeError)
+            assert len(server._batches) == 2
+            
+            # Stored forms are not resubmitted
+            again = agent.process_forms_batch(paths[:2], batch_client=batch)
+            assert [f.form_type for f in again] == ["onboarding", "onboarding"]
+            assert len(server._batches) == 2
+        finally:
+            for p in paths:
+                os.unlink(p)
+    
+    def test_process_forms_batch_needs_batch_support(self):
+        """Test a client without batch support is rejected before any work."""
+        llm = MockLLMClient()
+        agent = IntelligentFormAgent(llm_client=llm, form_store=MemoryFormStore())
+        
+        with pytest.raises(ValueError, match="does not support batches"):
+            agent.process_forms_batch(["missing.txt"])
+        assert llm.call_history == []
+    
+    def test_concurrent_polls_run_requests_once(self):
+        """Test threads polling the same batch do not run its requests twice."""
+        calls = []
+        
+        def responder(params):
+            calls.append(params)
+            time.sleep(0.01)
+            return "{}"
+        
+        server = LocalBatchServer(responder, polls_until_done=0)
+        batch_id = server.create([{"custom_id": f"r{i}", "params": {}} for i in range(3)]).id
+        threads = [threading.Thread(target=server.retrieve, args=(batch_id,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(calls) == 3
+        assert len(list(server.results(batch_id))) == 3
+
+
+class TestAsyncAgent:
+    """Tests for the asyncio API."""
+    
+    def test_async_tool_uses_async_client(self):
+        """Test arun goes through the async client."""
+        async_llm = AsyncMockLLMClient()
+        tool = QuestionAnsweringTool(MockLLMClient(), async_llm)
+        doc = ExtractedDocument(file_path="t.txt", file_type="txt", raw_text="Total: $5")
+        
+        result = asyncio.run(tool.arun(question="What is the total?", document=doc))
+        
+        assert result.answer == "Mock answer"
+        assert len(async_llm.call_history) == 1
+    
+    def test_async_tool_falls_back_to_sync_client(self):
+        """Test arun works with only a sync client."""
+        llm = MockLLMClient()
+        tool = SummarizationTool(llm)
+        doc = ExtractedDocument(file_path="t.txt", file_type="txt", raw_text="Total: $5")
+        
+        result = asyncio.run(tool.arun(document=doc))
+        
+        assert result.summary == "Mock summary"
+        assert len(llm.call_history) == 1
+    
+    def test_async_process_and_workflow(self):
+        """Test async processing, Q&A and workflow share one event loop."""
+        async_llm = AsyncMockLLMClient()
+        agent = IntelligentFormAgent(
+            llm_client=MockLLMClient(),
+            async_llm_client=async_llm,
+            form_store=MemoryFormStore(),
+            max_concurrent_llm_calls=1
+        )
+        paths = []
+        for i in range(3):
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+                f.write(f"Employee {i}\nSalary: ${i},000")
+                paths.append(f.name)
+        
+        async def scenario():
+            forms = await agent.aprocess_forms(paths)
+            answer = await agent.aask("What is the salary?", forms[0])
+            workflow = await agent.arun_workflow("Extract the fields", paths)
+            return forms, answer, workflow
+        
+        try:
+            forms, answer, workflow = asyncio.run(scenario())
+            
+            assert [f.file_path for f in forms] == paths
+            assert answer.answer == "Mock answer"
+            assert workflow["type"] == "extraction"
+            assert len(workflow["forms"]) == 3
+            
+            # A second event loop can take the shared LLM slots, even under contention
+            async def reprocess():
+                return await asyncio.gather(*(agent.aprocess_form(p, force_reprocess=True) for p in paths))
+            
+            again = asyncio.run(reprocess())
+            assert [f.extracted_fields for f in again] == [f.extracted_fields for f in forms]
+        finally:
+            for p in paths:
+                os.unlink(p)
+
+
 class TestExampleScenarios:
     """Test the three required example scenarios."""
     